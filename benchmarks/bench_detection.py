@@ -0,0 +1,98 @@
+import math
+import random
+import time
+
+from src.detection import DroneSnapshot
+from src.settings import settings
+from src.zones import ZoneIndex, default_zone, detect_violations, detect_zone_violations
+
+"""
+Benchmark of the NFZ detection on the built-in NFZ at 1k / 10k / 100k drones:
+	- legacy: the per-drone loop of the old check_for_violations,
+	- circle: `zones.detect_violations`, the path the pipeline takes for a single circle zone
+	  (one scalar loop over the drone dicts, strict validation of the drones inside),
+	- engine: the vectorized engine used for zone sets (`DroneSnapshot.from_records` +
+	  `zones.detect_zone_violations`), split into `load` (building the column arrays from the
+	  decoded JSON) and `detect` (the zone pass itself).
+
+All implementations are run on the same random snapshot and their results are checked for
+equality before timings are reported. `speedup` is legacy / circle.
+
+Usage:
+	poetry run python -m benchmarks.bench_detection
+"""
+
+NFZ_RADIUS = 1000.0
+SIZES = (1_000, 10_000, 100_000)
+REPEATS = 5
+
+
+def make_snapshot(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"drone-{i}",
+            "owner_id": rng.randint(1, n // 2 or 1),
+            "x": rng.randint(-10_000, 10_000),
+            "y": rng.randint(-10_000, 10_000),
+            "z": rng.randint(0, 1_000),
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_detect(drones: list) -> list:
+    """ The per-drone detection loop of the old check_for_violations, every drone inside the NFZ """
+    violators = []
+    for drone in drones:
+        try:
+            x, y = drone['x'], drone['y']
+            distance = math.sqrt(x**2 + y**2)
+            if distance <= NFZ_RADIUS:
+                violators.append((drone['id'], drone['owner_id']))
+        except (ValueError, TypeError, KeyError):
+            continue
+    return violators
+
+
+def circle_detect(drones: list, index: ZoneIndex) -> list:
+    return [(d['id'], d['owner_id']) for d in detect_violations(drones, index)]
+
+
+def engine_detect(drones: list, index: ZoneIndex) -> list:
+    snapshot = DroneSnapshot.from_records(drones)
+    return [(d['id'], d['owner_id']) for d in detect_zone_violations(snapshot, index)]
+
+
+def best_of(fn, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    index = ZoneIndex([default_zone(NFZ_RADIUS)], settings.ZONE_GRID_CELL)
+    print(f"{'drones':>8} {'violators':>10} {'legacy ms':>10} {'circle ms':>10} {'speedup':>8} "
+          f"{'load ms':>9} {'detect ms':>10} {'engine ms':>10}")
+    for n in SIZES:
+        drones = make_snapshot(n)
+
+        expected = legacy_detect(drones)
+        assert circle_detect(drones, index) == expected, "circle path diverged from legacy loop"
+        assert engine_detect(drones, index) == expected, "vectorized engine diverged from legacy loop"
+
+        snapshot = DroneSnapshot.from_records(drones)
+        legacy = best_of(legacy_detect, drones)
+        circle = best_of(detect_violations, drones, index)
+        load = best_of(DroneSnapshot.from_records, drones)
+        detect = best_of(detect_zone_violations, snapshot, index)
+        engine = best_of(engine_detect, drones, index)
+        print(f"{n:>8} {len(expected):>10} {legacy * 1000:>10.2f} {circle * 1000:>10.2f} {legacy / circle:>7.1f}x "
+              f"{load * 1000:>9.2f} {detect * 1000:>10.2f} {engine * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+
+import httpx
+import uvicorn
+
+from benchmarks.simulator import add_arguments, config_from_args, create_app
+
+"""
+End-to-end benchmark suite, run against the local upstream simulator (benchmarks.simulator).
+
+Starts the simulator and the FastAPI app on free local ports, points the backend at them
+and at a scratch database (SQLite by default, or a local Postgres via --database-url),
+then measures:
+	check_for_violations: full Celery task body (fetch, detect, enrich, persist) per tick,
+	GET /drones:          concurrent clients against the API,
+	GET /nfz:             concurrent clients against the API, with the X-Secret header.
+
+Every scenario reports request count, errors, throughput and p50/p95/p99 latency. The
+results are printed and written as JSON (--output) together with the commit and the
+configuration, so runs can be compared across commits.
+
+Usage:
+	poetry run python -m benchmarks.bench_e2e --drones 10000 --hit-rate 0.01 --output bench_results.json
+"""
+
+SECRET = "bench-secret"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else None
+    return {
+        "count": len(latencies) + errors,
+        "errors": errors,
+        "throughput_per_s": (len(latencies) + errors) / elapsed if elapsed else None,
+        "p50_ms": pick(0.50),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+    }
+
+
+def bench_ticks(ticks: int, fresh_episodes: bool) -> dict:
+    from src import pipeline
+    from src.episodes import InMemoryEpisodeStore
+    from src.tasks import check_for_violations
+
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(ticks):
+        if fresh_episodes:
+            # every tick has to enrich and persist all violators again
+            pipeline.episode_store = InMemoryEpisodeStore()
+        tick_started = time.perf_counter()
+        result = check_for_violations()
+        if result.startswith("Error"):
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - tick_started)
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def bench_http(base_url: str, path: str, requests: int, concurrency: int, headers: dict | None = None) -> dict:
+    latencies, errors = [], 0
+    queue = iter(range(requests))
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal errors
+        for _ in queue:
+            request_started = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - request_started)
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def prepare_database():
+    from src import worker_runtime
+    from src.database import Base
+
+    async with worker_runtime.get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark against the upstream simulator")
+    add_arguments(parser)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./bench_e2e.db")
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--keep-episodes", action="store_true", help="do not reset the open episodes between ticks")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    simulator_port, api_port = free_port(), free_port()
+    os.makedirs("logs", exist_ok=True)
+    # the backend reads its configuration at import time, so configure it before importing it
+    os.environ.update({
+        "BASE_URL": f"http://127.0.0.1:{simulator_port}/",
+        "DATABASE_URL": args.database_url,
+        "NFZ_SECRET_KEY": SECRET,
+        "EPISODE_BACKEND": "memory",
+        "OWNER_CACHE_REDIS": "false",
+    })
+    os.environ.setdefault("CELERY_BROKER_URL", "redis://localhost:6379/0")
+
+    from src import worker_runtime
+    from src.main import app
+
+    simulator = start_server(create_app(config_from_args(args)), simulator_port)
+    worker_runtime.run(prepare_database())
+    api = start_server(app, api_port)
+    api_url = f"http://127.0.0.1:{api_port}"
+
+    results = {}
+    try:
+        results["check_for_violations"] = bench_ticks(args.ticks, not args.keep_episodes)
+        results["GET /drones"] = asyncio.run(bench_http(api_url, "/drones", args.requests, args.concurrency))
+        results["GET /nfz"] = asyncio.run(bench_http(api_url, "/nfz", args.requests, args.concurrency, {"X-Secret": SECRET}))
+    finally:
+        worker_runtime.shutdown()
+        api.should_exit = True
+        simulator.should_exit = True
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+    print(f"{'scenario':<22} {'count':>6} {'errors':>6} {'per s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, r in results.items():
+        fmt = lambda v: f"{v:>8.1f}" if v is not None else f"{'-':>8}"
+        print(f"{name:<22} {r['count']:>6} {r['errors']:>6} {r['throughput_per_s']:>9.1f} "
+              f"{fmt(r['p50_ms'])} {fmt(r['p95_ms'])} {fmt(r['p99_ms'])}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.database import Base
+from src.model import Violation
+from src.persistence import bulk_insert_violations
+from src.settings import settings
+
+"""
+Benchmark for violation persistence, reported in rows per second at batch sizes 1 to 10k.
+
+Compared paths:
+	legacy: the old save_violations_to_db (fresh engine per call, one ORM object per row).
+	insert: persistent engine, multi-row INSERT (forced by a huge COPY threshold).
+	bulk:   persistent engine, default bulk path (COPY from BULK_COPY_THRESHOLD rows on asyncpg).
+
+The violations table is created if needed; every row written by the benchmark uses a
+`bench-` drone id and is deleted again afterwards.
+
+Usage:
+	poetry run python -m benchmarks.bench_persist [--database-url URL]
+"""
+
+BATCH_SIZES = (1, 10, 100, 1_000, 10_000)
+BENCH_PREFIX = "bench-"
+
+
+def make_rows(n: int) -> list:
+    now = datetime.now()
+    return [
+        {
+            "id": str(i),
+            "drone_id": f"{BENCH_PREFIX}{i}",
+            "timestamp": now,
+            "position_x": float(i % 1000),
+            "position_y": 0.0,
+            "position_z": 100.0,
+            "owner_first_name": "Bench",
+            "owner_last_name": "Mark",
+            "owner_ssn": "000-00-0000",
+            "owner_phone": "+000000000",
+            "last_seen": now,
+            "ended_at": None,
+            "closest_distance": float(i % 1000),
+            "sample_count": 1,
+            "zone_id": None,
+        }
+        for i in range(n)
+    ]
+
+
+async def legacy_save(database_url: str, rows: list):
+    engine = create_async_engine(database_url)
+    SessionLocal = async_sessionmaker(bind=engine)
+    async with SessionLocal() as db:
+        for v_data in rows:
+            db.add(Violation(**v_data))
+        await db.commit()
+    await engine.dispose()
+
+
+async def bulk_save(engine, rows: list):
+    async with engine.begin() as conn:
+        await bulk_insert_violations(conn, rows)
+
+
+async def timed(coro_fn, *args) -> float:
+    start = time.perf_counter()
+    await coro_fn(*args)
+    return time.perf_counter() - start
+
+
+async def main(database_url: str):
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    copy_threshold = settings.BULK_COPY_THRESHOLD
+    print(f"driver: {engine.dialect.driver}, COPY threshold: {copy_threshold}")
+    print(f"{'batch':>7} {'legacy rows/s':>14} {'insert rows/s':>14} {'bulk rows/s':>12}")
+    try:
+        for size in BATCH_SIZES:
+            rows = make_rows(size)
+            legacy = await timed(legacy_save, database_url, rows)
+
+            settings.BULK_COPY_THRESHOLD = 10**9
+            insert_only = await timed(bulk_save, engine, rows)
+            settings.BULK_COPY_THRESHOLD = copy_threshold
+            bulk = await timed(bulk_save, engine, rows)
+
+            print(f"{size:>7} {size / legacy:>14.0f} {size / insert_only:>14.0f} {size / bulk:>12.0f}")
+    finally:
+        settings.BULK_COPY_THRESHOLD = copy_threshold
+        async with engine.begin() as conn:
+            await conn.execute(delete(Violation).where(Violation.drone_id.startswith(BENCH_PREFIX)))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Violation persistence benchmark")
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    args = parser.parse_args()
+    asyncio.run(main(args.database_url))
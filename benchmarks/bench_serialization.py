@@ -0,0 +1,149 @@
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from src import model, schemas
+from src.database import Base
+from src.serialization import decode_drones, encode_drones, encode_violations, violation_columns
+
+"""
+Microbenchmark of the API response serialization, previous path vs. the fast path in
+`src.serialization`, for 10k item responses.
+
+	drones:          upstream body -> response bytes
+	                 previous: response.json() + schemas.Drone(**item) per item, then FastAPI's
+	                           response_model validation, jsonable_encoder and json.dumps
+	                 fast:     validate_json on the raw body + pydantic-core dump_json
+	violations:      already loaded rows -> response bytes
+	                 previous: ORM instances -> response_model validation (from_attributes),
+	                           jsonable_encoder and json.dumps
+	                 fast:     column tuples -> orjson
+	violations+db:   the same, including the query on an in-memory SQLite database
+	                 (ORM entity select vs. column select)
+
+Both paths are checked to produce the same JSON document before timings are reported.
+
+Usage:
+	poetry run python -m benchmarks.bench_serialization
+"""
+
+ITEMS = 10_000
+REPEATS = 5
+
+_drone_list = TypeAdapter(List[schemas.Drone])
+_violation_list = TypeAdapter(List[schemas.Violation])
+
+
+def best_of(fn, repeats: int = REPEATS) -> float:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def make_drones_body(n: int, seed: int = 42) -> bytes:
+    rng = random.Random(seed)
+    return json.dumps([
+        {"id": f"drone-{i}", "owner_id": rng.randint(1, n), "x": rng.randint(-10_000, 10_000),
+         "y": rng.randint(-10_000, 10_000), "z": rng.randint(0, 1_000)}
+        for i in range(n)
+    ]).encode()
+
+
+def make_violation_rows(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    return [
+        {"index": i + 1, "id": str(rng.randint(1, n)), "drone_id": f"drone-{i}",
+         "timestamp": start + timedelta(seconds=i, microseconds=rng.randint(0, 999_999)),
+         "position_x": rng.uniform(-1000, 1000), "position_y": rng.uniform(-1000, 1000),
+         "position_z": float(rng.randint(0, 1000)), "owner_first_name": f"First{i}",
+         "owner_last_name": f"Last{i}", "owner_ssn": f"{i:06d}-123X", "owner_phone": f"+358{i:09d}",
+         "last_seen": start + timedelta(seconds=i + 30), "ended_at": None,
+         "closest_distance": rng.uniform(0, 1000), "sample_count": rng.randint(1, 20),
+         "zone_id": rng.choice((None, 1, 2))}
+        for i in range(n)
+    ]
+
+
+def previous_drones(body: bytes) -> bytes:
+    drones = [schemas.Drone(**item) for item in json.loads(body)]
+    validated = _drone_list.validate_python(drones, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def fast_drones(body: bytes) -> bytes:
+    return encode_drones(decode_drones(body))
+
+
+def previous_violations(instances: list) -> bytes:
+    validated = _violation_list.validate_python(instances, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def same_document(a: bytes, b: bytes) -> bool:
+    return json.loads(a) == json.loads(b)
+
+
+async def bench_with_db(rows: list) -> tuple:
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(model.Violation.__table__), rows)
+
+    async def previous():
+        async with AsyncSession(engine) as session:
+            instances = (await session.execute(select(model.Violation).order_by(model.Violation.index))).scalars().all()
+            return previous_violations(instances)
+
+    async def fast():
+        async with engine.connect() as conn:
+            result = await conn.execute(violation_columns().order_by(model.Violation.index))
+            return encode_violations(result.all())
+
+    assert same_document(await previous(), await fast()), "violation outputs differ"
+    timings = []
+    for fn in (previous, fast):
+        best = float("inf")
+        for _ in range(REPEATS):
+            started = time.perf_counter()
+            await fn()
+            best = min(best, time.perf_counter() - started)
+        timings.append(best)
+    await engine.dispose()
+    return tuple(timings)
+
+
+def main():
+    body = make_drones_body(ITEMS)
+    assert same_document(previous_drones(body), fast_drones(body)), "drone outputs differ"
+
+    rows = make_violation_rows(ITEMS)
+    instances = [model.Violation(**row) for row in rows]
+    tuples = [tuple(row[column.name] for column in model.Violation.__table__.columns) for row in rows]
+    assert same_document(previous_violations(instances), encode_violations(tuples)), "violation outputs differ"
+
+    results = {
+        "drones": (best_of(lambda: previous_drones(body)), best_of(lambda: fast_drones(body))),
+        "violations": (best_of(lambda: previous_violations(instances)), best_of(lambda: encode_violations(tuples))),
+        "violations+db": asyncio.run(bench_with_db(rows)),
+    }
+
+    print(f"{ITEMS} items, best of {REPEATS}")
+    print(f"{'response':<14} {'previous ms':>12} {'fast ms':>9} {'speedup':>8}")
+    for name, (previous, fast) in results.items():
+        print(f"{name:<14} {previous * 1000:>12.1f} {fast * 1000:>9.1f} {previous / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import random
+import time
+
+import numpy as np
+
+from src.detection import DroneSnapshot
+from src.zones import CIRCLE, POLYGON, ZoneIndex, ZoneShape, _inside_polygon
+
+"""
+Benchmark of the zone lookup: brute force (every drone against every zone, one vectorized
+pass per zone) vs. the uniform grid index in `src.zones`, for 100k drones and 10 / 100 / 1000
+zones (half circles, half polygons, some with altitude bands) spread over a 40 x 40 km area.
+
+Both are checked to find the same (drone, zone) pairs before timings are reported.
+
+Usage:
+	poetry run python -m benchmarks.bench_zones
+"""
+
+DRONES = 100_000
+ZONE_COUNTS = (10, 100, 1_000)
+EXTENT = 20_000.0
+CELL_SIZE = 1000.0
+REPEATS = 5
+
+
+def make_snapshot(n: int, seed: int = 42) -> DroneSnapshot:
+    rng = random.Random(seed)
+    return DroneSnapshot.from_records([
+        {"id": f"drone-{i}", "owner_id": i, "x": rng.uniform(-EXTENT, EXTENT),
+         "y": rng.uniform(-EXTENT, EXTENT), "z": rng.uniform(0, 1_000)}
+        for i in range(n)
+    ])
+
+
+def make_zones(n: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    zones = []
+    for i in range(n):
+        cx, cy = rng.uniform(-EXTENT, EXTENT), rng.uniform(-EXTENT, EXTENT)
+        min_z, max_z = (rng.uniform(0, 300), rng.uniform(500, 1_000)) if rng.random() < 0.3 else (None, None)
+        if i % 2:
+            zones.append(ZoneShape(i, f"circle-{i}", CIRCLE, cx, cy, rng.uniform(100, 1_500), min_z=min_z, max_z=max_z))
+        else:
+            vertices = [(cx + rng.uniform(-1_500, 1_500), cy + rng.uniform(-1_500, 1_500)) for _ in range(rng.randint(3, 8))]
+            center_x = sum(x for x, _ in vertices) / len(vertices)
+            center_y = sum(y for _, y in vertices) / len(vertices)
+            zones.append(ZoneShape(i, f"polygon-{i}", POLYGON, center_x, center_y, vertices=vertices,
+                                   min_z=min_z, max_z=max_z))
+    return zones
+
+
+def brute_force(snapshot: DroneSnapshot, zones: list) -> list:
+    pairs = []
+    for zone in zones:
+        inside = (snapshot.z >= zone.min_z) & (snapshot.z <= zone.max_z)
+        if zone.kind == CIRCLE:
+            inside &= (snapshot.x - zone.center_x) ** 2 + (snapshot.y - zone.center_y) ** 2 <= zone.radius ** 2
+        else:
+            inside &= _inside_polygon(snapshot.x, snapshot.y, np.array(zone.vertices))
+        pairs.extend((int(drone), zone.id) for drone in np.flatnonzero(inside))
+    return pairs
+
+
+def indexed(snapshot: DroneSnapshot, index: ZoneIndex) -> list:
+    drones, zones, _ = index.locate(snapshot.x, snapshot.y, snapshot.z)
+    return [(int(drone), index.ids[zone]) for drone, zone in zip(drones, zones)]
+
+
+def best_of(fn, *args) -> float:
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    snapshot = make_snapshot(DRONES)
+    print(f"{DRONES} drones, grid cell {CELL_SIZE:.0f} m, best of {REPEATS}")
+    print(f"{'zones':>6} {'hits':>7} {'brute ms':>9} {'build ms':>9} {'index ms':>9} {'speedup':>8}")
+    for count in ZONE_COUNTS:
+        zones = make_zones(count)
+        started = time.perf_counter()
+        index = ZoneIndex(zones, CELL_SIZE)
+        build = time.perf_counter() - started
+
+        hits = sorted(indexed(snapshot, index))
+        assert hits == sorted(brute_force(snapshot, zones)), f"results differ for {count} zones"
+
+        brute = best_of(brute_force, snapshot, zones)
+        lookup = best_of(indexed, snapshot, index)
+        print(f"{count:>6} {len(hits):>7} {brute * 1000:>9.1f} {build * 1000:>9.1f} {lookup * 1000:>9.1f} {brute / lookup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import math
+import random
+import time
+
+import uvicorn
+from fastapi import FastAPI, HTTPException
+
+"""
+Local stand-in for the external drone/owner API, for benchmarks and local runs without the
+real upstream.
+
+Serves the two endpoints the backend uses:
+	GET /drones       -> list of {id, owner_id, x, y, z}, drones circle around the origin and
+	                     move a little on every request
+	GET /users/{id}   -> owner record with the fields of `schemas.Owner_data`
+
+Configurable behaviour (SimulatorConfig / command line flags):
+	drones:          number of drones in every snapshot
+	hit_rate:        fraction of drones flying inside the 1000 unit NFZ
+	latency_ms:      median response latency, drawn from a log-normal distribution
+	latency_sigma:   spread of that distribution (0 = constant latency)
+	error_rate:      fraction of requests answered with HTTP 503
+	missing_owner_rate: fraction of owners answered with HTTP 404
+
+Usage:
+	poetry run python -m benchmarks.simulator --drones 10000 --hit-rate 0.01 --port 9000
+	then point BASE_URL at http://localhost:9000/
+"""
+
+NFZ_RADIUS = 1000.0
+
+
+class SimulatorConfig:
+    def __init__(self, drones: int = 1000, hit_rate: float = 0.01, latency_ms: float = 0.0,
+                 latency_sigma: float = 0.5, error_rate: float = 0.0, missing_owner_rate: float = 0.0,
+                 seed: int = 42):
+        self.drones = drones
+        self.hit_rate = hit_rate
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.missing_owner_rate = missing_owner_rate
+        self.seed = seed
+
+
+def create_app(config: SimulatorConfig) -> FastAPI:
+    rng = random.Random(config.seed)
+    # fixed orbit per drone: radius inside the NFZ for `hit_rate` of the fleet
+    orbits = []
+    for i in range(config.drones):
+        inside = rng.random() < config.hit_rate
+        radius = rng.uniform(0, NFZ_RADIUS * 0.95) if inside else rng.uniform(NFZ_RADIUS * 1.05, 20_000)
+        orbits.append((f"drone-{i}", i + 1, radius, rng.uniform(0, 2 * math.pi), rng.uniform(50, 500)))
+    missing_owners = {owner for _, owner, _, _, _ in orbits if rng.random() < config.missing_owner_rate}
+
+    app = FastAPI(title="Air Guardian upstream simulator")
+
+    async def simulate_upstream():
+        if config.latency_ms > 0:
+            delay = random.lognormvariate(math.log(config.latency_ms), config.latency_sigma) if config.latency_sigma else config.latency_ms
+            await asyncio.sleep(delay / 1000)
+        if config.error_rate and random.random() < config.error_rate:
+            raise HTTPException(status_code=503, detail="Injected upstream error")
+
+    @app.get("/drones")
+    async def drones():
+        await simulate_upstream()
+        angle_step = time.monotonic() * 0.01
+        return [
+            {
+                "id": drone_id,
+                "owner_id": owner_id,
+                "x": int(radius * math.cos(phase + angle_step)),
+                "y": int(radius * math.sin(phase + angle_step)),
+                "z": int(z),
+            }
+            for drone_id, owner_id, radius, phase, z in orbits
+        ]
+
+    @app.get("/users/{owner_id}")
+    async def user(owner_id: int):
+        await simulate_upstream()
+        if owner_id in missing_owners or not 1 <= owner_id <= config.drones:
+            raise HTTPException(status_code=404, detail="User not found")
+        return {
+            "id": owner_id,
+            "first_name": f"First{owner_id}",
+            "last_name": f"Last{owner_id}",
+            "email": f"owner{owner_id}@example.com",
+            "phone_number": f"+358{owner_id:09d}",
+            "social_security_number": f"{owner_id:06d}-{owner_id % 1000:03d}X",
+            "purchased_at": "2024-01-01T00:00:00",
+        }
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--drones", type=int, default=1000)
+    parser.add_argument("--hit-rate", type=float, default=0.01)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--missing-owner-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def config_from_args(args) -> SimulatorConfig:
+    return SimulatorConfig(args.drones, args.hit_rate, args.latency_ms, args.latency_sigma,
+                           args.error_rate, args.missing_owner_rate, args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drone/owner API simulator")
+    add_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
@@ -5,15 +5,19 @@ from src.settings import settings
 This module configures and initializes a Celery application instance for the Air Guardian app.
 
 - Imports the Celery class and project settings.
-- Creates a Celery app named "air_guardian_worker" using the broker URL from settings.
+- Creates a Celery app named "air_guardian_worker" using the broker URL from settings, and a result
+  backend (CELERY_RESULT_BACKEND, defaults to the broker) for the chord of the sharded violation check.
+  Task results are only stored for the tasks that opt in (the shard tasks).
 - Includes the "src.tasks" module for task discovery.
-- Configures a periodic task schedule (beat) to run 'src.tasks.check_for_violations' every 10 seconds.
+- Configures a periodic task schedule (beat) to run 'src.tasks.check_for_violations' every 10 seconds,
+  and 'src.tasks.maintain_partitions' (daily violations partitions, retention) every hour.
 - Sets the Celery timezone to UTC.
 """
 
 celery = Celery(
     "air_guardian_worker",
     broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND or settings.CELERY_BROKER_URL,
     include=["src.tasks"]
 )
 
@@ -22,5 +26,11 @@ celery.conf.beat_schedule = {
         'task': 'src.tasks.check_for_violations',
         'schedule': 10,
     },
+    'maintainPartitions': {
+        'task': 'src.tasks.maintain_partitions',
+        'schedule': 3600,
+    },
 }
-celery.conf.timezone = 'UTC'
\ No newline at end of file
+celery.conf.timezone = 'UTC'
+celery.conf.task_ignore_result = True
+celery.conf.result_expires = 3600
\ No newline at end of file
@@ -1,28 +1,70 @@
+import argparse
 import asyncio
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
 from src.database import async_engine, Base
 from src.model import Violation
+from src import partitions
 import logging
 
 """
-This script handles the creation and dropping of all database tables defined in the SQLAlchemy models.
+This script creates the database tables defined in the SQLAlchemy models.
+Existing tables and their rows are kept, unless --reset is given.
+
+On PostgreSQL the violations table is partitioned by day (see src.partitions): the script
+creates the partitioned table, converts a plain violations table left by an older version
+(keeping its rows), and creates the upcoming daily partitions.
+Columns added to the models since a table was created are added to it (ALTER TABLE ADD COLUMN).
+
 Functions:
-	create_all_tables():
-		Asynchronously drops all existing tables and recreates them based on the SQLAlchemy model metadata.
+	create_all_tables(reset):
+		Asynchronously creates the missing tables (dropping all existing tables first when
+		`reset` is set), then runs the partition maintenance.
 		Logs a message upon successful creation.
+	add_missing_columns(conn, table):
+		Adds the model columns an existing table does not have yet.
 
 Usage:
-	Run this script directly to reset and create all tables in the database using the async SQLAlchemy engine.
+	Run this script directly to create all tables in the database using the async SQLAlchemy engine:
+		poetry run python -m src.create_tables [--reset]
 """
 
 logging.basicConfig(level=logging.INFO)
 
-async def create_all_tables():
+async def add_missing_columns(conn, table):
+    existing = await conn.run_sync(lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns(table.name)})
+    for column in table.columns:
+        if column.name not in existing:
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            await conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+            logging.info(f"Added column {table.name}.{column.name}")
+
+
+async def create_all_tables(reset: bool = False):
     async with async_engine.begin() as conn:
-        # drop all tables (if they exist) before creating new ones
-        await conn.run_sync(Base.metadata.drop_all)
-        # create the violations tables based on the model class .
-        await conn.run_sync(Base.metadata.create_all)
+        if reset:
+            # drop all tables (if they exist) before creating new ones
+            await conn.run_sync(Base.metadata.drop_all)
+
+        if partitions.is_partitioned_backend(conn):
+            kind = await partitions.table_kind(conn, Violation.__tablename__)
+            if kind is None:
+                await partitions.create_partitioned_table(conn)
+            else:
+                await add_missing_columns(conn, Violation.__table__)
+                if kind == "r":
+                    await partitions.convert_to_partitioned(conn)
+            other_tables = [table for table in Base.metadata.sorted_tables if table is not Violation.__table__]
+            await conn.run_sync(Base.metadata.create_all, tables=other_tables)
+            await partitions.maintain(conn)
+        else:
+            # create the violations tables based on the model class .
+            await conn.run_sync(Base.metadata.create_all)
+            await add_missing_columns(conn, Violation.__table__)
     logging.info("Database tables created successfully.")
 
 if __name__ == "__main__":
-    asyncio.run(create_all_tables())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create the database tables")
+    parser.add_argument("--reset", action="store_true", help="drop all existing tables and their rows first")
+    args = parser.parse_args()
+    asyncio.run(create_all_tables(args.reset))
@@ -0,0 +1,102 @@
+import numpy as np
+import logging
+from operator import itemgetter
+
+"""
+Column-oriented loading of drone snapshots for the vectorized detection.
+
+Instead of walking the drone list in Python, a snapshot from the drones API is loaded once
+into position columns (x, y, z), which `src.zones.detect_zone_violations` checks against the
+no-fly zones in a few NumPy passes. Loading is the bulk of the cost (one dict lookup per drone
+and column), so only the positions are read for every drone: ids and owners are only looked
+up, and validated, for the few drones found inside a zone. Malformed items are skipped
+instead of aborting the snapshot.
+
+Validation is as strict as the original detection loop: positions must be JSON numbers (ints
+or floats, not numeric strings or booleans) and owner_id an integer. The column fast path lets
+NumPy convert anything it can, so a drone found inside a zone is validated again from its dict
+before it is reported.
+
+Classes:
+	DroneSnapshot: Column-oriented view of one drones payload.
+Functions:
+	validated_row(drone): The id, owner and position of a drone dict, None when malformed.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class DroneSnapshot:
+    __slots__ = ("records", "x", "y", "z")
+
+    def __init__(self, records, x, y, z):
+        # the source dicts are kept as-is, ids are only looked up for the (few) violating rows
+        self.records = records
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def from_records(cls, drones: list) -> "DroneSnapshot":
+        """ Builds the position columns from the raw drone dicts, skipping malformed items """
+        try:
+            # fast path: one C-level pass per column straight into a float array
+            columns = [np.fromiter(map(itemgetter(key), drones), dtype=np.float64, count=len(drones))
+                       for key in ("x", "y", "z")]
+            # numpy reads None as NaN, leave those to the item by item path
+            if not any(np.isnan(column).any() for column in columns):
+                return cls(drones, *columns)
+        except (ValueError, TypeError, KeyError, OverflowError):
+            pass
+
+        # slow path: validate item by item so one bad record does not drop the whole snapshot
+        records, xs, ys, zs = [], [], [], []
+        skipped = 0
+        for drone in drones:
+            try:
+                x, y, z = drone['x'], drone['y'], drone['z']
+                if not (_is_number(x) and _is_number(y) and _is_number(z)):
+                    raise TypeError("position is not a number")
+                x, y, z = float(x), float(y), float(z)
+            except (TypeError, KeyError, OverflowError):
+                skipped += 1
+                continue
+            records.append(drone)
+            xs.append(x)
+            ys.append(y)
+            zs.append(z)
+
+        if skipped:
+            logger.error(f"Skipped {skipped} malformed drone record(s) in snapshot")
+
+        return cls(
+            records,
+            np.array(xs, dtype=np.float64),
+            np.array(ys, dtype=np.float64),
+            np.array(zs, dtype=np.float64),
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def row(self, i: int) -> dict | None:
+        """ The drone dict of row i, None when its id, owner_id or position is malformed """
+        return validated_row(self.records[i])
+
+
+def _is_number(value) -> bool:
+    # exact types: bool is an int subclass, and numeric strings would convert fine in NumPy
+    return type(value) is float or type(value) is int
+
+
+def validated_row(drone) -> dict | None:
+    """ The id, owner and position of a drone dict, None when one of them is malformed """
+    try:
+        drone_id, owner_id, x, y, z = drone['id'], drone['owner_id'], drone['x'], drone['y'], drone['z']
+    except (TypeError, KeyError):
+        return None
+    if drone_id is None or type(owner_id) is not int:
+        return None
+    if not (_is_number(x) and _is_number(y) and _is_number(z)):
+        return None
+    return {"id": str(drone_id), "owner_id": owner_id, "x": float(x), "y": float(y), "z": float(z)}
@@ -0,0 +1,78 @@
+import logging
+
+import httpx
+import ijson
+
+from src.settings import settings
+
+"""
+Streaming, bounded-memory parsing of the upstream drones feed.
+
+The violation workers never hold the whole `drones` document: the response body is read as a
+byte stream and parsed incrementally (ijson, C backend), and the drone items are handed on in
+lists of `DRONE_CHUNK_SIZE`, so each chunk can be detected and dropped before the next one is
+parsed. Peak memory per tick then follows the chunk size instead of the fleet size (plus the
+drones found inside a zone).
+
+Items are handed on as parsed; each chunk is validated item by item when it is loaded into a
+`detection.DroneSnapshot`, so a malformed item is skipped on its own. Only a body that is not
+a JSON array, or whose JSON syntax is broken, fails the whole snapshot with InvalidDroneData.
+
+Classes:
+	InvalidDroneData: The drones API returned something that is not a JSON list.
+Functions:
+	iter_drone_chunks(response, chunk_size): Yields the items of a streamed response in lists.
+	iter_drone_items(body): Parses the items of an already read body one by one.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidDroneData(ValueError):
+    pass
+
+
+class _StreamReader:
+    """ File-like adapter of a streamed response for ijson, checking the body is a JSON array """
+
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+        self._checked = False
+
+    async def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            # ijson probes the reader with read(0) to tell bytes from text
+            return b""
+        chunk = b""
+        while not chunk:
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                return b""
+            if not self._checked and chunk.strip():
+                if not chunk.lstrip().startswith(b"["):
+                    raise InvalidDroneData("Invalid data format from drone API: expected list")
+                self._checked = True
+        return chunk
+
+
+async def iter_drone_chunks(response: httpx.Response, chunk_size: int | None = None):
+    chunk_size = chunk_size or settings.DRONE_CHUNK_SIZE
+    chunk = []
+    try:
+        async for item in ijson.items(_StreamReader(response), "item", use_float=True):
+            chunk.append(item)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    except ijson.JSONError as e:
+        raise InvalidDroneData(f"Malformed JSON from drone API: {e}") from e
+    if chunk:
+        yield chunk
+
+
+def iter_drone_items(body: bytes):
+    try:
+        yield from ijson.items(body, "item", use_float=True)
+    except ijson.JSONError as e:
+        raise InvalidDroneData(f"Malformed JSON from drone API: {e}") from e
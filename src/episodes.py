@@ -0,0 +1,339 @@
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime
+
+from redis.exceptions import RedisError
+
+from src.redis_client import get_redis
+from src.settings import settings
+
+"""
+Violation episodes: one violation row per stay of a drone inside a no-fly zone.
+
+Episodes are per (drone, zone), so a drone inside two overlapping zones has two of them. An
+episode is opened when a drone enters the zone, kept up to date while it stays inside (last
+seen, closest approach, sample count) and closed once it has been outside (or unreported) for
+`EPISODE_EXIT_GRACE` seconds, so a drone hovering on the boundary does not open a new episode
+on every tick. Each tick is diffed against the open episodes:
+	entered: drones inside without an open episode -> owner lookup + one INSERT,
+	stayed:  drones inside with an open episode    -> updated in the store only, written to
+	         their row at most every `EPISODE_FLUSH_INTERVAL` seconds,
+	closed:  open episodes past the exit grace     -> one UPDATE setting `ended_at`.
+So a drone staying inside for an hour costs one owner lookup, one INSERT, a few batched UPDATEs
+and one closing UPDATE, instead of a new row and lookup every cooldown period. Rows are
+addressed by (drone_id, zone_id, timestamp), timestamp being the entry time (and the partition
+key). Open episodes are keyed by `episode_key`: the drone id for the built-in NFZ (zone None),
+"<drone id>@<zone id>" for configured zones.
+
+A tick never reads every open episode: it asks the store for the episodes of the drones inside
+(they may be updated) and for those last seen more than `EPISODE_EXIT_GRACE` seconds ago (they
+may close). Both backends keep the open episodes ordered by last seen, so the second set is a
+range read instead of a sweep, and the cost of a tick follows the drones inside plus the exits
+instead of the number of open episodes.
+
+Backends (selected with the EPISODE_BACKEND setting):
+	memory: In-process dict, for a single worker process (e.g. the ingestion service). Episodes
+	        are kept in last-seen order, so the ones due to close are taken from its front.
+	redis:  One hash of open episodes shared by all workers, plus a sorted set of their last
+	        seen times. A tick's changes are applied by one Lua script, atomically: entries are
+	        claimed with HSETNX, and updates and closes only apply while the hash still holds
+	        the same episode (same `opened_at`), so a worker can neither resurrect an episode
+	        that another worker just closed nor close or overwrite one it reopened.
+
+Classes:
+	EpisodeChanges: Result of diffing one tick against the open episodes.
+	EpisodeStore: Interface of the backends.
+	InMemoryEpisodeStore / RedisEpisodeStore: The two implementations.
+Functions:
+	episode_key(drone_id, zone_id): Key of a (drone, zone) episode in the stores.
+	diff_episodes(open_episodes, inside, now): Computes the changes of one tick.
+	get_episode_store(): Builds the configured backend.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _parse(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def episode_key(drone_id: str, zone_id=None) -> str:
+    return drone_id if zone_id is None else f"{drone_id}@{zone_id}"
+
+
+def _key(episode: dict) -> str:
+    return episode_key(episode["drone_id"], episode.get("zone_id"))
+
+
+def new_episode(drone: dict, now: datetime) -> dict:
+    stamp = now.isoformat()
+    return {
+        "drone_id": drone["id"],
+        "zone_id": drone.get("zone_id"),
+        "owner_id": drone["owner_id"],
+        "opened_at": stamp,
+        "last_seen": stamp,
+        "flushed_at": stamp,
+        "closest": drone["distance"],
+        "x": drone["x"],
+        "y": drone["y"],
+        "z": drone["z"],
+        "samples": 1,
+    }
+
+
+def observe(episode: dict, drone: dict, now: datetime) -> dict:
+    """ The episode after one more sample of its drone inside the zone """
+    episode = dict(episode, last_seen=now.isoformat(), samples=episode["samples"] + 1)
+    if drone["distance"] < episode["closest"]:
+        episode.update(closest=drone["distance"], x=drone["x"], y=drone["y"], z=drone["z"])
+    return episode
+
+
+class EpisodeChanges:
+    __slots__ = ("entered", "updated", "closed", "flush")
+
+    def __init__(self, entered: list, updated: list, closed: list, flush: list):
+        self.entered = entered  # new episodes, to be enriched and inserted
+        self.updated = updated  # open episodes with a new sample, store only
+        self.closed = closed    # episodes past the exit grace, to be closed in the database
+        self.flush = flush      # updated episodes due for an in-place database update
+
+
+def diff_episodes(open_episodes: dict, inside: list, now: datetime,
+                  exit_grace: float | None = None, flush_interval: float | None = None) -> EpisodeChanges:
+    """ Diffs the drones inside a zone (detection dicts with `distance` and `zone_id`) against the open episodes """
+    exit_grace = settings.EPISODE_EXIT_GRACE if exit_grace is None else exit_grace
+    flush_interval = settings.EPISODE_FLUSH_INTERVAL if flush_interval is None else flush_interval
+
+    entered, updated, flush = [], [], []
+    seen = set()
+    for drone in inside:
+        key = episode_key(drone["id"], drone.get("zone_id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        episode = open_episodes.get(key)
+        if episode is None:
+            entered.append(new_episode(drone, now))
+            continue
+        episode = observe(episode, drone, now)
+        if (now - _parse(episode["flushed_at"])).total_seconds() >= flush_interval:
+            episode["flushed_at"] = now.isoformat()
+            flush.append(episode)
+        updated.append(episode)
+
+    closed = [episode for key, episode in open_episodes.items()
+              if key not in seen and (now - _parse(episode["last_seen"])).total_seconds() >= exit_grace]
+    return EpisodeChanges(entered, updated, closed, flush)
+
+
+def row_values(episode: dict, closed: bool) -> dict:
+    """ Column values of an episode's row, for the in-place UPDATE """
+    last_seen = _parse(episode["last_seen"])
+    return {
+        "b_drone_id": episode["drone_id"],
+        "b_zone_id": episode.get("zone_id"),
+        "b_timestamp": _parse(episode["opened_at"]),
+        "last_seen": last_seen,
+        "ended_at": last_seen if closed else None,
+        "closest_distance": episode["closest"],
+        "sample_count": episode["samples"],
+        "position_x": episode["x"],
+        "position_y": episode["y"],
+        "position_z": episode["z"],
+    }
+
+
+class EpisodeStore:
+    async def candidates(self, keys, seen_before: datetime) -> dict:
+        """
+        episode_key -> episode of the open episodes a tick is diffed against: those of `keys`
+        (the drones inside) and those last seen at or before `seen_before` (the ones that may close)
+        """
+        raise NotImplementedError
+
+    async def apply(self, changes: EpisodeChanges) -> EpisodeChanges:
+        """
+        Stores the changes of a tick. Returns them reduced to the episodes this caller won:
+        another worker may have opened, updated away or closed them first.
+        """
+        raise NotImplementedError
+
+    async def discard(self, keys):
+        """ Drops open episodes, e.g. entries that could not be stored; they are retried next tick """
+        raise NotImplementedError
+
+    async def restore(self, episodes: list):
+        """ Puts closed episodes back whose closing could not be stored """
+        raise NotImplementedError
+
+
+def _won(changes: EpisodeChanges, entered: list, updated: list, closed: list) -> EpisodeChanges:
+    updated_keys = {_key(episode) for episode in updated}
+    return EpisodeChanges(entered, updated, closed,
+                          [episode for episode in changes.flush if _key(episode) in updated_keys])
+
+
+class InMemoryEpisodeStore(EpisodeStore):
+    def __init__(self):
+        self._open = OrderedDict()  # -> episode_key: episode, least recently seen first
+
+    def _same(self, episode: dict) -> bool:
+        current = self._open.get(_key(episode))
+        return current is not None and current["opened_at"] == episode["opened_at"]
+
+    async def candidates(self, keys, seen_before: datetime) -> dict:
+        found = {key: self._open[key] for key in keys if key in self._open}
+        for key, episode in self._open.items():
+            if _parse(episode["last_seen"]) > seen_before:
+                break
+            found[key] = episode
+        return found
+
+    async def apply(self, changes: EpisodeChanges) -> EpisodeChanges:
+        entered = [episode for episode in changes.entered if _key(episode) not in self._open]
+        updated = [episode for episode in changes.updated if self._same(episode)]
+        for episode in entered + updated:
+            self._open[_key(episode)] = episode
+            self._open.move_to_end(_key(episode))
+        closed = [episode for episode in changes.closed if self._same(episode)]
+        for episode in closed:
+            del self._open[_key(episode)]
+        return _won(changes, entered, updated, closed)
+
+    async def discard(self, keys):
+        for key in keys:
+            self._open.pop(key, None)
+
+    async def restore(self, episodes: list):
+        for episode in episodes:
+            if _key(episode) not in self._open:
+                self._open[_key(episode)] = episode
+                # it was last seen before every other open episode was
+                self._open.move_to_end(_key(episode), last=False)
+
+
+# KEYS: open episodes hash, last seen sorted set
+# ARGV: counts of entered, updated and closed episodes, then their fields:
+#       entered (key, episode, last seen), updated (key, episode, last seen, opened_at), closed (key, opened_at)
+_APPLY_SCRIPT = """
+local function same_episode(key, opened_at)
+    local current = redis.call('HGET', KEYS[1], key)
+    return current and cjson.decode(current).opened_at == opened_at
+end
+local results, i = {}, 4
+for _ = 1, tonumber(ARGV[1]) do
+    local won = redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 1])
+    if won == 1 then redis.call('ZADD', KEYS[2], ARGV[i + 2], ARGV[i]) end
+    results[#results + 1] = won
+    i = i + 3
+end
+for _ = 1, tonumber(ARGV[2]) do
+    local won = 0
+    if same_episode(ARGV[i], ARGV[i + 3]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+        redis.call('ZADD', KEYS[2], ARGV[i + 2], ARGV[i])
+        won = 1
+    end
+    results[#results + 1] = won
+    i = i + 4
+end
+for _ = 1, tonumber(ARGV[3]) do
+    local won = 0
+    if same_episode(ARGV[i], ARGV[i + 1]) then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+        redis.call('ZREM', KEYS[2], ARGV[i])
+        won = 1
+    end
+    results[#results + 1] = won
+    i = i + 2
+end
+return results
+"""
+
+
+def _seen_score(episode: dict) -> float:
+    return _parse(episode["last_seen"]).timestamp()
+
+
+class RedisEpisodeStore(EpisodeStore):
+    KEY = "episodes:open"
+    SEEN_KEY = "episodes:last_seen"
+
+    def __init__(self, url: str | None = None):
+        self.url = url
+        self._indexed = False
+
+    async def _run_apply(self, entered: list, updated: list, closed: list) -> list:
+        args = [len(entered), len(updated), len(closed)]
+        for episode in entered:
+            args += [_key(episode), json.dumps(episode), _seen_score(episode)]
+        for episode in updated:
+            args += [_key(episode), json.dumps(episode), _seen_score(episode), episode["opened_at"]]
+        for episode in closed:
+            args += [_key(episode), episode["opened_at"]]
+        redis = get_redis(self.url)
+        return await redis.eval(_APPLY_SCRIPT, 2, self.KEY, self.SEEN_KEY, *args)
+
+    async def _index_existing(self):
+        """ Adds the episodes opened before the last seen index existed to it, once per process """
+        redis = get_redis(self.url)
+        raw = await redis.hgetall(self.KEY)
+        if raw:
+            await redis.zadd(self.SEEN_KEY, {key: _seen_score(json.loads(value)) for key, value in raw.items()}, nx=True)
+        self._indexed = True
+
+    async def candidates(self, keys, seen_before: datetime) -> dict:
+        if not self._indexed:
+            await self._index_existing()
+        redis = get_redis(self.url)
+        keys = list(keys)
+        inside = set(keys)
+        expired = await redis.zrangebyscore(self.SEEN_KEY, "-inf", seen_before.timestamp())
+        wanted = keys + [key for key in expired if key not in inside]
+        if not wanted:
+            return {}
+        values = await redis.hmget(self.KEY, wanted)
+        return {key: json.loads(value) for key, value in zip(wanted, values) if value is not None}
+
+    async def apply(self, changes: EpisodeChanges) -> EpisodeChanges:
+        if not (changes.entered or changes.updated or changes.closed):
+            return changes
+        results = await self._run_apply(changes.entered, changes.updated, changes.closed)
+        entered_won = results[:len(changes.entered)]
+        updated_won = results[len(changes.entered):len(changes.entered) + len(changes.updated)]
+        closed_won = results[len(changes.entered) + len(changes.updated):]
+        return _won(
+            changes,
+            [episode for episode, won in zip(changes.entered, entered_won) if won],
+            [episode for episode, won in zip(changes.updated, updated_won) if won],
+            [episode for episode, won in zip(changes.closed, closed_won) if won],
+        )
+
+    async def discard(self, keys):
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            async with get_redis(self.url).pipeline(transaction=True) as pipe:
+                pipe.hdel(self.KEY, *keys)
+                pipe.zrem(self.SEEN_KEY, *keys)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not discard {len(keys)} episode(s): {e}")
+
+    async def restore(self, episodes: list):
+        if not episodes:
+            return
+        try:
+            await self._run_apply(episodes, [], [])
+        except RedisError as e:
+            logger.warning(f"Could not restore {len(episodes)} closed episode(s): {e}")
+
+
+def get_episode_store() -> EpisodeStore:
+    if settings.EPISODE_BACKEND == "redis":
+        return RedisEpisodeStore()
+    return InMemoryEpisodeStore()
@@ -1,6 +1,7 @@
 import httpx
 from fastapi import HTTPException
 from src.settings import settings
+from src.upstream import CircuitOpenError
 import logging
 
 """
@@ -44,6 +45,9 @@ class Errors(Exception):
                 raise HTTPException(status_code=502, detail="External API server error")
             else:
                 raise HTTPException(status_code=e.response.status_code, detail=f"External API error: {str(e)}")
+        elif isinstance(e, CircuitOpenError):
+            logger.error(f"Drone API unavailable: {str(e)}")
+            raise HTTPException(status_code=503, detail="Service unavailable: Drone API is failing, retry later")
         elif isinstance(e, httpx.RequestError):
             logger.error(f"Network error connecting to drones API: {str(e)}")
             raise HTTPException(status_code=503, detail="Service unavailable: Cannot connect to drone API")
@@ -0,0 +1,114 @@
+import asyncio
+import httpx
+import logging
+import signal
+import time
+from collections import deque
+
+from src import metrics, worker_runtime
+from src.pipeline import InvalidDroneData, run_tick
+from src.settings import settings
+from src.upstream import UpstreamClient
+
+"""
+Continuous ingestion service, a sub-second alternative to the 10 second Celery beat schedule.
+
+Runs the same pipeline as `src.tasks.check_for_violations` (see src.pipeline) in an async loop
+with a configurable tick (`INGEST_TICK_INTERVAL`, e.g. 0.25 s), reusing one pooled http client
+(with the timeouts, retries and circuit breakers of src.upstream) and the long-lived database engine for its whole lifetime. A new tick never starts while the
+previous one is still running: an overrunning tick simply delays the next one.
+
+The detection lag of every tick that stored violations (positions received -> violations
+committed) is recorded and its percentiles are logged periodically, so this mode can be
+compared with the Celery path (which logs the same lag per task).
+
+It runs either as a dedicated process:
+	poetry run python -m src.ingest
+or inside the FastAPI lifespan when `INGEST_IN_API` is enabled.
+
+Classes:
+	LagTracker: Bounded window of detection lag samples with percentiles.
+	IngestionService: The tick loop.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class LagTracker:
+    def __init__(self, window: int = 1000):
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentiles(self) -> dict:
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1]}
+
+
+class IngestionService:
+    def __init__(self, client: UpstreamClient, tick_interval: float, report_every: int = 100):
+        self.client = client
+        self.tick_interval = tick_interval
+        self.report_every = report_every
+        self.lag = LagTracker()
+        self.ticks = 0
+        self.overruns = 0
+        self._stopped = asyncio.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    async def tick(self):
+        try:
+            result = await run_tick(self.client)
+            if result.detection_lag is not None:
+                self.lag.add(result.detection_lag)
+        except InvalidDroneData:
+            pass
+        except httpx.HTTPError as e:
+            logger.error(f"Ingestion tick failed on external API: {e!r}")
+        except Exception as e:
+            logger.error(f"Unexpected error in ingestion tick: {e}")
+
+    async def run(self):
+        logger.info(f"Ingestion service started, tick every {self.tick_interval}s")
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            await self.tick()
+            self.ticks += 1
+
+            elapsed = time.monotonic() - started
+            if elapsed > self.tick_interval:
+                self.overruns += 1
+            if self.ticks % self.report_every == 0:
+                lag = {k: f"{v * 1000:.0f}ms" for k, v in self.lag.percentiles().items()}
+                logger.info(f"Ingestion: {self.ticks} ticks, {self.overruns} overrun(s), detection lag {lag}")
+
+            # sleep out the rest of the tick, or not at all if this tick overran
+            try:
+                await asyncio.wait_for(self._stopped.wait(), timeout=max(0.0, self.tick_interval - elapsed))
+            except asyncio.TimeoutError:
+                pass
+        logger.info("Ingestion service stopped")
+
+
+async def main():
+    metrics.register_pool_gauges("worker", worker_runtime.get_engine, worker_runtime.get_http_client)
+    service = IngestionService(worker_runtime.get_upstream(), settings.INGEST_TICK_INTERVAL)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, service.stop)
+    try:
+        await service.run()
+    finally:
+        await worker_runtime.aclose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
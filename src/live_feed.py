@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from datetime import datetime
+
+from redis.exceptions import RedisError
+
+from src.redis_client import get_redis
+
+"""
+Push-based live feed of drone positions and newly detected violations.
+
+One producer per API worker turns drone snapshots into frames, and every frame is serialized
+once and fanned out to all connected subscribers (WebSocket or Server-Sent Events clients):
+	- "snapshot": the full drone list, sent when a client connects or has to resync,
+	- "delta": drones that appeared/moved (`changed`) and disappeared (`removed`) since the
+	  previous snapshot,
+	- "violations": violations stored by the workers, received over redis pub/sub and only
+	  delivered to subscribers that authenticated with the NFZ secret.
+
+Backpressure: each subscriber holds at most `max_pending` drone frames and, in a separate
+queue, `max_pending` violations frames. When a slow client falls behind on drone frames, they
+are dropped and it is resynced with the latest full snapshot instead of buffering without limit.
+Violations cannot be rebuilt from a snapshot, so they are never dropped silently: when their
+queue overflows the backlog is replaced by a "violations_dropped" frame (`{"dropped": n}`, the
+number of lost violations frames) telling the client to refetch GET /nfz. Violations frames are
+sent ahead of drone frames.
+
+Classes:
+	Frame: One pre-serialized message.
+	Subscriber: Bounded per-client queues.
+	Broadcaster: Keeps the latest drone state and fans frames out to subscribers.
+Functions:
+	run_drone_producer(broadcaster, load_snapshot, interval): Publishes drone frames while clients listen.
+	run_violation_listener(broadcaster): Relays violations published by the workers.
+	publish_violations(violations): Worker side, publishes freshly stored violations.
+"""
+
+logger = logging.getLogger(__name__)
+
+VIOLATIONS_CHANNEL = "air_guardian:violations"
+
+
+class Frame:
+    __slots__ = ("kind", "seq", "text", "_sse")
+
+    def __init__(self, kind: str, seq: int, text: str):
+        self.kind = kind
+        self.seq = seq
+        self.text = text
+        self._sse = None
+
+    @property
+    def sse(self) -> bytes:
+        """ Server-Sent Events encoding, built once and shared by all SSE clients """
+        if self._sse is None:
+            self._sse = f"event: {self.kind}\nid: {self.seq}\ndata: {self.text}\n\n".encode()
+        return self._sse
+
+
+class Subscriber:
+    def __init__(self, broadcaster: "Broadcaster", with_violations: bool, max_pending: int):
+        self.broadcaster = broadcaster
+        self.with_violations = with_violations
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.violations = deque()
+        self.resync = True  # the first frame a client gets is always the full snapshot
+        self.dropped = 0
+        self.violations_dropped = 0  # violations frames lost since the client was last told
+        self._ready = asyncio.Event()
+        self._ready.set()
+
+    def offer(self, frame: Frame):
+        if frame.kind == "violations":
+            if not self.with_violations:
+                return
+            if len(self.violations) >= self.max_pending:
+                # too slow: the client is told how many it lost and has to refetch /nfz
+                self.violations_dropped += len(self.violations)
+                self.violations.clear()
+            self.violations.append(frame)
+        else:
+            if len(self.pending) >= self.max_pending:
+                # too slow: forget the backlog, the next frame will be a full snapshot
+                self.dropped += len(self.pending)
+                self.pending.clear()
+                self.resync = True
+            self.pending.append(frame)
+        self._ready.set()
+
+    async def next(self) -> Frame:
+        while True:
+            if self.violations_dropped:
+                dropped, self.violations_dropped = self.violations_dropped, 0
+                return Frame("violations_dropped", self.broadcaster.seq, f'{{"dropped":{dropped}}}')
+            if self.violations:
+                return self.violations.popleft()
+            snapshot = self.broadcaster.snapshot_frame
+            if self.resync and snapshot is not None:
+                self.resync = False
+                # deltas up to the snapshot are already contained in it
+                self.pending = deque(f for f in self.pending if f.seq > snapshot.seq)
+                return snapshot
+            if self.pending:
+                return self.pending.popleft()
+            self._ready.clear()
+            await self._ready.wait()
+
+
+class Broadcaster:
+    def __init__(self, max_pending: int = 16):
+        self.max_pending = max_pending
+        self.subscribers = set()
+        self.snapshot_frame = None
+        self.seq = 0
+        self._positions = {}  # -> drone id: (owner_id, x, y, z)
+
+    def subscribe(self, with_violations: bool = False) -> Subscriber:
+        subscriber = Subscriber(self, with_violations, self.max_pending)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def _broadcast(self, frame: Frame):
+        for subscriber in self.subscribers:
+            subscriber.offer(frame)
+
+    def publish_drones(self, drones: list, body: bytes):
+        """ Updates the drone state from a snapshot and broadcasts the delta """
+        positions = {drone.id: (drone.owner_id, drone.x, drone.y, drone.z) for drone in drones}
+        changed = [
+            {"id": drone_id, "owner_id": p[0], "x": p[1], "y": p[2], "z": p[3]}
+            for drone_id, p in positions.items() if self._positions.get(drone_id) != p
+        ]
+        removed = [drone_id for drone_id in self._positions if drone_id not in positions]
+        self._positions = positions
+
+        self.seq += 1
+        self.snapshot_frame = Frame("snapshot", self.seq, f'{{"seq":{self.seq},"drones":{body.decode()}}}')
+        if changed or removed:
+            delta = json.dumps({"seq": self.seq, "changed": changed, "removed": removed}, separators=(",", ":"))
+            self._broadcast(Frame("delta", self.seq, delta))
+
+    def publish_violations(self, payload: str):
+        self._broadcast(Frame("violations", self.seq, payload))
+
+
+async def run_drone_producer(broadcaster: Broadcaster, load_snapshot, interval: float):
+    """ Polls the shared drone snapshot while at least one client is connected """
+    last_etag = None
+    while True:
+        if broadcaster.subscribers:
+            try:
+                snapshot = await load_snapshot()
+                if snapshot.etag != last_etag:
+                    last_etag = snapshot.etag
+                    broadcaster.publish_drones(snapshot.items, snapshot.body)
+            except Exception as e:
+                logger.warning(f"Live feed: could not load drone snapshot: {e!r}")
+        await asyncio.sleep(interval)
+
+
+async def run_violation_listener(broadcaster: Broadcaster):
+    """ Relays the violations published by the workers, reconnecting when redis goes away """
+    while True:
+        try:
+            async with get_redis().pubsub() as pubsub:
+                await pubsub.subscribe(VIOLATIONS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        broadcaster.publish_violations(message["data"])
+        except RedisError as e:
+            logger.warning(f"Live feed: violation listener lost redis, retrying: {e}")
+            await asyncio.sleep(5)
+
+
+async def publish_violations(violations: list):
+    """ Publishes freshly stored violations to the API workers, never fails the caller """
+    if not violations:
+        return
+    payload = json.dumps(violations, default=_encode_datetime, separators=(",", ":"))
+    try:
+        await get_redis().publish(VIOLATIONS_CHANNEL, payload)
+    except RedisError as e:
+        logger.warning(f"Could not publish {len(violations)} violation(s) to the live feed: {e}")
+
+
+def _encode_datetime(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
@@ -1,21 +1,67 @@
+import asyncio
 import httpx
-from fastapi import FastAPI, HTTPException, Header, Depends
+import json
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Header, Depends, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
+from sqlalchemy import select, tuple_
 from datetime import datetime, timedelta
 from pydantic import ValidationError
-from typing import List
+from typing import List, Literal
 import logging
 
 from src.settings import Settings
 from src import model, schemas
-from src.database import get_db
+from src.database import get_db, async_engine
 from src.errors import Errors
+from src import metrics, worker_runtime
+from src.ingest import IngestionService
+from src.live_feed import Broadcaster, run_drone_producer, run_violation_listener
+from src.nfz_cache import NfzCache
+from src.pagination import encode_cursor, decode_cursor
+from src.rollups import violation_stats
+from src.serialization import (decode_drones, encode_drones, violation_columns, encode_violations,
+                               encode_violation_line)
+from src.snapshot_cache import SnapshotCache
+from src.tracks import TrackStore, run_track_sampler
+from src.upstream import UpstreamClient
 
 # Initialize FastAPI app and settings 
 settings = Settings()
-app = FastAPI()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one pooled client for all upstream calls of this worker, with timeouts, retries,
+    # hedging and circuit breakers per endpoint
+    app.state.http_client = httpx.AsyncClient(base_url=settings.BASE_URL, timeout=settings.UPSTREAM_TIMEOUT)
+    app.state.upstream = UpstreamClient(app.state.http_client)
+    # live feed producers, idle while nobody is connected
+    background = [
+        asyncio.create_task(run_drone_producer(live_feed, drone_snapshots.get, settings.LIVE_FEED_INTERVAL)),
+        asyncio.create_task(run_violation_listener(live_feed)),
+    ]
+    # keeps the trajectory store filled while nobody polls /drones
+    if settings.TRACK_SAMPLE_INTERVAL > 0:
+        background.append(asyncio.create_task(run_track_sampler(drone_snapshots.get, settings.TRACK_SAMPLE_INTERVAL)))
+    # optional sub-second violation detection instead of (or next to) the Celery beat
+    ingestion = None
+    if settings.INGEST_IN_API:
+        ingestion = IngestionService(app.state.upstream, settings.INGEST_TICK_INTERVAL)
+        background.append(asyncio.create_task(ingestion.run()))
+    yield
+    if ingestion is not None:
+        ingestion.stop()
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await worker_runtime.aclose()
+    await app.state.http_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -32,6 +78,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.register_pool_gauges("api", lambda: async_engine, lambda: getattr(app.state, "http_client", None))
 
 ## --- API Endpoints --- ## 
 
@@ -42,37 +90,223 @@ def health():
     return {"success": "ok"}
 
 
+## --- Drone snapshot cache --- ##
+
+async def load_drones():
+    """ Fetches and validates one drone snapshot from the external API, and records it in the tracks """
+    response = await app.state.upstream.get("drones")
+    response.raise_for_status()
+    # parsed and validated in one pass from the raw body
+    drones = decode_drones(response.content)
+    tracks.record([d.id for d in drones], [d.x for d in drones], [d.y for d in drones], [d.z for d in drones])
+    return drones
+
+
+tracks = TrackStore(settings.TRACK_SAMPLES, settings.TRACK_MEMORY_MB, settings.TRACK_IDLE_TTL)
+
+
+drone_snapshots = SnapshotCache(
+    loader=load_drones,
+    encode=encode_drones,
+    max_age=settings.DRONES_CACHE_MAX_AGE,
+    stale_while_revalidate=settings.DRONES_CACHE_STALE_WHILE_REVALIDATE,
+)
+
+
+# Prometheus metrics of this API worker plus the ones pushed by the violation workers
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(await metrics.render_all(), media_type="text/plain; version=0.0.4")
+
+
 # Endpoint to fetch drone data
 @app.get("/drones", response_model=List[schemas.Drone])
-async def get_drones():
+async def get_drones(if_none_match: str | None = Header(None, alias="If-None-Match")):
     """
-    Fetches current drone data from the external API.
+    Returns the current drone snapshot, shared by all concurrent callers and cached briefly.
+    Answers 304 when the client's If-None-Match still matches the snapshot's ETag.
     Handles timeouts, HTTP errors, and network errors gracefully.
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(settings.BASE_URL + "drones")
-            response.raise_for_status()
-            data = response.json()
-        try:
-            response = [schemas.Drone(**item) for item in data]
-        except ValidationError as e:
-            Errors.handle_validation_error(e)
-        return response
-    
+        snapshot = await drone_snapshots.get()
+    except ValidationError as e:
+        Errors.handle_validation_error(e)
     except Exception as e:
         Errors.handle_httpx_error(e)
 
+    headers = {"ETag": snapshot.etag, "Cache-Control": f"max-age={int(settings.DRONES_CACHE_MAX_AGE)}"}
+    if snapshot.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+
+# Recent trajectory of one drone, from the in-memory track store
+@app.get("/drones/{drone_id}/track", response_model=schemas.DroneTrack)
+async def get_drone_track(drone_id: str, limit: int = Query(60, ge=1, le=10_000)):
+    """
+    Returns the last `limit` positions of a drone (oldest first) with speed and heading derived
+    from consecutive samples. Served from memory, no database round-trip.
+    Tracks are only recorded from snapshots this worker loads: with the default
+    TRACK_SAMPLE_INTERVAL=0 they stay empty (404) until clients poll GET /drones or the live feed.
+    """
+    track = tracks.track(drone_id, limit)
+    if track is None:
+        raise HTTPException(status_code=404, detail="Drone not tracked: no recent snapshot of this drone was "
+                                                    "loaded (poll GET /drones or set TRACK_SAMPLE_INTERVAL)")
+    return track
+
+
+## --- Live feed --- ##
+
+live_feed = Broadcaster(max_pending=settings.LIVE_FEED_MAX_PENDING)
+
+
+def is_authorized(secret: str | None) -> bool:
+    return bool(secret) and secret == settings.NFZ_SECRET_KEY
+
+
+@app.websocket("/live/ws")
+async def live_feed_ws(websocket: WebSocket):
+    """
+    Pushes drone snapshots/deltas, plus new violations once the client authenticated with the
+    NFZ secret: in the X-Secret header of the handshake or, for browsers that cannot set it, in
+    a {"secret": "..."} message sent at any time. Never in the URL, which ends up in access logs.
+    """
+    await websocket.accept()
+    subscriber = live_feed.subscribe(is_authorized(websocket.headers.get("x-secret")))
+
+    async def send_frames():
+        while True:
+            frame = await subscriber.next()
+            await websocket.send_text(f'{{"type":"{frame.kind}","data":{frame.text}}}')
+
+    # frames are sent in the background, this loop reads the client's messages until it leaves
+    sender = asyncio.create_task(send_frames())
+    try:
+        while True:
+            try:
+                secret = json.loads(await websocket.receive_text()).get("secret")
+            except (ValueError, KeyError, AttributeError):
+                continue  # not a JSON object (or a binary message), nothing to authenticate
+            subscriber.with_violations = is_authorized(secret)
+            if not subscriber.with_violations:
+                logger.warning("Unauthorized live feed subscription attempt")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        live_feed.unsubscribe(subscriber)
+
+
+@app.get("/live/sse")
+async def live_feed_sse(x_secret: str | None = Header(None, alias="X-Secret")):
+    """ Server-Sent Events variant of /live/ws, one event per frame (violations need the X-Secret header) """
+    subscriber = live_feed.subscribe(is_authorized(x_secret))
+
+    async def events():
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.next(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield frame.sse
+        finally:
+            live_feed.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def violations_query(since: datetime, after: tuple | None = None, limit: int | None = None):
+    """ Violations (as column tuples) newer than `since`, ordered by the (timestamp, index) keyset """
+    query = (violation_columns()
+             .where(model.Violation.timestamp >= since)
+             .order_by(model.Violation.timestamp, model.Violation.index))
+    if after is not None:
+        query = query.where(tuple_(model.Violation.timestamp, model.Violation.index) > tuple_(*after))
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+nfz_cache = NfzCache()
+
+
+async def next_page_cursor(db: AsyncSession, since: datetime, after: tuple | None, limit: int) -> str | None:
+    """ Cursor of the page after `limit` rows from `after`, None when no row is left (reads only the keys) """
+    query = (select(model.Violation.timestamp, model.Violation.index)
+             .where(model.Violation.timestamp >= since)
+             .order_by(model.Violation.timestamp, model.Violation.index)
+             .offset(limit - 1)
+             .limit(2))
+    if after is not None:
+        query = query.where(tuple_(model.Violation.timestamp, model.Violation.index) > tuple_(*after))
+    keys = (await db.execute(query)).all()
+    return encode_cursor(*keys[0]) if len(keys) == 2 else None
+
+
+def next_page_headers(limit: int, next_cursor: str, format: str) -> dict:
+    query = f"limit={limit}&format=ndjson" if format == "ndjson" else f"limit={limit}"
+    return {"X-Next-Cursor": next_cursor, "Link": f'</nfz?{query}&cursor={next_cursor}>; rel="next"'}
+
+
+async def stream_violations_ndjson(db: AsyncSession, query):
+    """ Streams rows from a server-side cursor as newline-delimited JSON """
+    # the session dependency may already be finished when the body is streamed: a closed
+    # session starts over on its next use, so it is closed again once the stream is done
+    try:
+        result = await db.stream(query.execution_options(yield_per=500))
+        async for row in result:
+            yield encode_violation_line(row)
+    finally:
+        await db.close()
+
+
+# Aggregated NFZ violation counts, served from the hourly rollups
+# Requires a secret key in the header for security
+@app.get("/nfz/stats", response_model=schemas.ViolationStats)
+async def get_nfz_stats(
+    x_secret: str | None = Header(None, alias="X-Secret"),
+    hours: int = Query(24, ge=1, le=24 * 365),
+    top: int = Query(10, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)):
+    """
+    Returns violation counts per hour and the `top` owners and drones of the last `hours` hours
+    (whole hours: the window starts at the beginning of the oldest hour).
+    Requires X-Secret header for authentication.
+    """
+    if not is_authorized(x_secret):
+        logger.warning(f"Unauthorized access attempt with secret: {x_secret}")
+        raise HTTPException(status_code=401, detail="Unauthorized: Invalid or missing X-Secret header")
+
+    try:
+        return await violation_stats(db, datetime.now() - timedelta(hours=hours), top)
+    except Exception as e:
+        logger.error(f"Database error in get_nfz_stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Database error occurred")
+
 
 # Endpoint to fetch NFZ violations
 # Requires a secret key in the header for security
 @app.get("/nfz", response_model=List[schemas.Violation])
 async def get_nfz_violations(
     x_secret: str | None = Header(None, alias="X-Secret"),
+    limit: int | None = Query(None, ge=1, le=10_000),
+    cursor: str | None = None,
+    format: Literal["json", "ndjson"] = "json",
     db: AsyncSession = Depends(get_db)):
     """
-    Returns violations from the last 24 hours.
+    Returns violations from the last 24 hours, oldest first.
     Requires X-Secret header for authentication.
+    - `limit` enables keyset pagination, the next page's cursor is returned in the
+      X-Next-Cursor header (and a Link rel="next" header) while more rows are left.
+    - `format=ndjson` streams the rows as newline-delimited JSON from a server-side cursor,
+      with the same pagination headers (looked up before the stream starts).
+    Rows are read as column tuples and encoded straight to JSON bytes (see src.serialization).
+    The full list (no `limit` / `cursor`) is served from the version-keyed cache of the
+    encoded response while no new violations were committed (see src.nfz_cache).
     """
     logger.info("Fetching NFZ violations from the database")
     
@@ -81,16 +315,54 @@ async def get_nfz_violations(
         raise HTTPException(status_code=401, detail="Unauthorized: Invalid or missing X-Secret header")
 
     try:
-        time_24_hours_ago = datetime.now() - timedelta(hours=24)
-        query = select(model.Violation).where(model.Violation.timestamp >= time_24_hours_ago)
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if format == "json" and limit is None and after is None and nfz_cache.enabled:
+        async def load_rows(since):
+            return (await db.execute(violations_query(since))).all()
+
+        try:
+            body = await nfz_cache.get(load_rows)
+        except Exception as e:
+            logger.error(f"Database error in get_nfz_violations: {str(e)}")
+            raise HTTPException(status_code=500, detail="Database error occurred")
+        return Response(content=body, media_type="application/json")
+
+    time_24_hours_ago = datetime.now() - timedelta(hours=24)
+    if format == "ndjson":
+        headers = {}
+        if limit:
+            # headers go out before the body: look up the end of the page first
+            try:
+                next_cursor = await next_page_cursor(db, time_24_hours_ago, after, limit)
+            except Exception as e:
+                logger.error(f"Database error in get_nfz_violations: {str(e)}")
+                raise HTTPException(status_code=500, detail="Database error occurred")
+            if next_cursor:
+                headers = next_page_headers(limit, next_cursor, format)
+        query = violations_query(time_24_hours_ago, after, limit)
+        return StreamingResponse(stream_violations_ndjson(db, query), media_type="application/x-ndjson",
+                                 headers=headers)
+
+    try:
+        # one extra row tells whether another page follows
+        query = violations_query(time_24_hours_ago, after, limit + 1 if limit else None)
         result = await db.execute(query)
-        violations = result.scalars().all()
+        violations = result.all()
         if not violations:
             logger.info("No violations found in the last 24 hours")
-            return []
-        
+            return Response(content=b"[]", media_type="application/json")
+
+        headers = {}
+        if limit and len(violations) > limit:
+            violations = violations[:limit]
+            last = violations[-1]._mapping
+            headers = next_page_headers(limit, encode_cursor(last["timestamp"], last["index"]), format)
+
         logger.info(f"Successfully fetched {len(violations)} violations")
-        return violations
+        return Response(content=encode_violations(violations), media_type="application/json", headers=headers)
     except Exception as e:
         logger.error(f"Database error in get_nfz_violations: {str(e)}")
-        raise HTTPException(status_code=500, detail="Database error occurred")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Database error occurred")
@@ -0,0 +1,347 @@
+import json
+import logging
+import os
+import socket
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from redis.exceptions import RedisError
+
+from src.redis_client import get_redis
+from src.settings import settings
+
+"""
+Lightweight metrics with Prometheus text exposition, served by GET /metrics.
+
+Instruments:
+	- per-stage durations and item counts of the violation pipeline (fetch, detect, enrich,
+	  persist) and whole-tick durations,
+	- request latency of the FastAPI handlers (MetricsMiddleware) and GET /nfz cache results,
+	- latency, retries, hedges and circuit breaker state per upstream endpoint (see src.upstream),
+	- pool utilization gauges (database pool, upstream http pool), read at scrape time.
+
+Workers (Celery or the ingestion service) run in other processes, so they push a snapshot of
+their metrics to redis at most once per `METRICS_PUSH_INTERVAL` seconds (key with a TTL, one per
+process), and /metrics merges those snapshots in with a `worker` label.
+
+Modes (METRICS_MODE):
+	full: histograms with buckets.
+	lite: histograms keep only _sum and _count (a few float additions per observation), the
+	      low-overhead mode that is safe to leave on in production.
+	off:  every instrument is a no-op.
+
+Classes:
+	Counter, Gauge, Histogram: The instruments, with label support.
+	Registry: Holds instruments and renders them.
+	MetricsMiddleware: ASGI middleware timing HTTP requests per route.
+Functions:
+	stage(name): Context manager timing one pipeline stage, returns a handle to set the item count.
+	observe_stage(name, seconds, items): Records a stage the caller timed itself.
+	worker_id(): "<host>:<pid>" of the current process, the key of its pushed snapshot.
+	push_worker_metrics(): Pushes this process's snapshot to redis (rate limited).
+	render_all(): Local metrics plus all worker snapshots, in Prometheus text format.
+"""
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WORKER_KEY_PREFIX = "metrics:worker:"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def _labels(self, key: tuple, extra: dict) -> dict:
+        return {**extra, **dict(zip(self.labelnames, key))}
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if settings.METRICS_MODE == "off":
+            return
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self, extra: dict) -> list:
+        return [f"{self.name}{_format_labels(self._labels(k, extra))} {_format_value(v)}"
+                for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), callback=None):
+        super().__init__(name, help, labelnames)
+        self.callback = callback  # -> returns {label values tuple: value}, evaluated at scrape time
+
+    def set(self, value: float, **labels):
+        if settings.METRICS_MODE == "off":
+            return
+        self._values[self._key(labels)] = value
+
+    def samples(self, extra: dict) -> list:
+        values = dict(self._values)
+        if self.callback is not None and settings.METRICS_MODE != "off":
+            try:
+                values.update(self.callback())
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e!r}")
+        return [f"{self.name}{_format_labels(self._labels(k, extra))} {_format_value(v)}"
+                for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, **labels):
+        mode = settings.METRICS_MODE
+        if mode == "off":
+            return
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        if mode == "full":
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state[0][index] += 1
+        state[1] += value
+        state[2] += 1
+
+    def samples(self, extra: dict) -> list:
+        lines = []
+        full = settings.METRICS_MODE == "full"
+        for key, (counts, total, count) in self._values.items():
+            labels = self._labels(key, extra)
+            if full:
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def collect(self, extra_labels: dict | None = None) -> dict:
+        """ name -> {type, help, samples}, the format pushed to redis """
+        extra = extra_labels or {}
+        return {name: {"type": m.type, "help": m.help, "samples": m.samples(extra)}
+                for name, m in self.metrics.items()}
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric._values.clear()
+
+
+def render(families: list) -> str:
+    """ Merges collected families (local and pushed by workers) into Prometheus text format """
+    merged = {}
+    for collected in families:
+        for name, family in collected.items():
+            entry = merged.setdefault(name, {"type": family["type"], "help": family["help"], "samples": []})
+            entry["samples"].extend(family["samples"])
+    lines = []
+    for name, family in merged.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        lines.extend(family["samples"])
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_duration = registry.register(Histogram(
+    "air_guardian_stage_duration_seconds", "Duration of one violation pipeline stage", ("stage",)))
+stage_items = registry.register(Counter(
+    "air_guardian_stage_items_total", "Items handled by a violation pipeline stage", ("stage",)))
+tick_duration = registry.register(Histogram(
+    "air_guardian_tick_duration_seconds", "Duration of a whole violation check tick", ("outcome",)))
+request_duration = registry.register(Histogram(
+    "air_guardian_http_request_duration_seconds", "Latency of API requests", ("method", "route", "status")))
+nfz_cache_requests = registry.register(Counter(
+    "air_guardian_nfz_cache_requests_total", "GET /nfz responses by cache result", ("result",)))
+upstream_duration = registry.register(Histogram(
+    "air_guardian_upstream_request_duration_seconds", "Latency of upstream API calls", ("endpoint", "outcome")))
+upstream_events = registry.register(Counter(
+    "air_guardian_upstream_events_total", "Retries, hedges and circuit breaker rejections of upstream calls",
+    ("endpoint", "event")))
+upstream_circuit_open = registry.register(Gauge(
+    "air_guardian_upstream_circuit_open", "1 while the circuit breaker of an upstream endpoint is open", ("endpoint",)))
+
+
+class _StageHandle:
+    __slots__ = ("items",)
+
+    def __init__(self):
+        self.items = 0
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times one pipeline stage:
+        with metrics.stage("fetch") as s:
+            ...
+            s.items = len(drones)
+    """
+    handle = _StageHandle()
+    started = time.perf_counter()
+    try:
+        yield handle
+    finally:
+        observe_stage(name, time.perf_counter() - started, handle.items)
+
+
+def observe_stage(name: str, seconds: float, items: int = 0):
+    """ Records a stage timed by the caller, e.g. one spread over interleaved chunks """
+    stage_duration.observe(seconds, stage=name)
+    if items:
+        stage_items.inc(items, stage=name)
+
+
+def register_pool_gauges(prefix: str, get_engine, get_http_client):
+    """ Scrape-time gauges for the database pool and the upstream http pool of this process """
+    def db_pool():
+        engine = get_engine()
+        if engine is None:
+            return {}
+        pool = engine.pool
+        return {("checked_out",): pool.checkedout(), ("size",): pool.size(), ("overflow",): pool.overflow()}
+
+    def http_pool():
+        client = get_http_client()
+        if client is None:
+            return {}
+        # httpx does not expose pool stats, read them from httpcore's pool (best effort)
+        connections = client._transport._pool.connections
+        active = sum(1 for connection in connections if not connection.is_idle())
+        return {("open",): len(connections), ("active",): active}
+
+    registry.register(Gauge(f"air_guardian_{prefix}_db_pool_connections",
+                            "Database pool connections by state", ("state",), callback=db_pool))
+    registry.register(Gauge(f"air_guardian_{prefix}_upstream_pool_connections",
+                            "Upstream http pool connections by state", ("state",), callback=http_pool))
+
+
+# the process that imported the module, compared against the current pid to detect a fork
+_pid = os.getpid()
+_worker_id = f"{socket.gethostname()}:{_pid}"
+_last_push = 0.0
+
+
+def worker_id() -> str:
+    """
+    The id of the current process, computed per pid: Celery's prefork children import this module
+    in the parent, so a forked child gets its own id (and push schedule) and starts from empty
+    metrics instead of re-reporting what it inherited from the parent.
+    """
+    global _pid, _worker_id, _last_push
+    pid = os.getpid()
+    if _pid != pid:
+        registry.reset()
+        _pid = pid
+        _worker_id = f"{socket.gethostname()}:{pid}"
+        _last_push = 0.0
+    return _worker_id
+
+
+async def push_worker_metrics(force: bool = False):
+    """ Pushes this process's metrics to redis for /metrics, at most once per push interval """
+    global _last_push
+    if settings.METRICS_MODE == "off":
+        return
+    worker = worker_id()
+    now = time.monotonic()
+    if not force and now - _last_push < settings.METRICS_PUSH_INTERVAL:
+        return
+    _last_push = now
+    payload = json.dumps(registry.collect({"worker": worker}))
+    ttl = max(60, int(settings.METRICS_PUSH_INTERVAL * 10))
+    try:
+        await get_redis().set(WORKER_KEY_PREFIX + worker, payload, ex=ttl)
+    except RedisError as e:
+        logger.debug(f"Could not push worker metrics: {e}")
+
+
+async def render_all() -> str:
+    families = [registry.collect()]
+    if settings.METRICS_MODE != "off":
+        try:
+            client = get_redis()
+            keys = [key async for key in client.scan_iter(match=WORKER_KEY_PREFIX + "*", count=100)
+                    if key != WORKER_KEY_PREFIX + worker_id()]
+            if keys:
+                families.extend(json.loads(raw) for raw in await client.mget(keys) if raw)
+        except RedisError as e:
+            logger.warning(f"Could not read worker metrics from redis: {e}")
+    return render(families)
+
+
+class MetricsMiddleware:
+    """ Pure ASGI middleware recording request latency per route template and status """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or settings.METRICS_MODE == "off":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            request_duration.observe(time.perf_counter() - started, method=scope["method"],
+                                     route=getattr(route, "path", "unmatched"), status=status)
@@ -1,5 +1,5 @@
 from src.database import Base
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, Boolean, JSON, true
 
 """
 SQLAlchemy ORM model for the 'violations' table.
@@ -11,14 +11,46 @@ Attributes:
 	index (int): Primary key for the violation record.
 	id (str): Unique identifier for the violation.
 	drone_id (str): Identifier for the drone involved in the violation.
-	timestamp (datetime): Date and time when the violation occurred.
-	position_x (float): X coordinate of the drone's position.
-	position_y (float): Y coordinate of the drone's position.
-	position_z (float): Z coordinate of the drone's position.
+	timestamp (datetime): Date and time when the drone entered the NFZ (start of the episode).
+	position_x (float): X coordinate of the drone's closest approach.
+	position_y (float): Y coordinate of the drone's closest approach.
+	position_z (float): Z coordinate of the drone's closest approach.
 	owner_first_name (str): First name of the drone's owner.
 	owner_last_name (str): Last name of the drone's owner.
 	owner_ssn (str): Social security number of the drone's owner.
 	owner_phone (str): Phone number of the drone's owner.
+	last_seen (datetime): Last time the drone was seen inside the NFZ.
+	ended_at (datetime): When the drone left the NFZ, None while the episode is open.
+	closest_distance (float): Closest distance of the drone to the zone center.
+	sample_count (int): Snapshots the drone was seen inside the NFZ during the episode.
+	zone_id (int): The zone that was breached, None for the built-in NFZ.
+
+One row is one episode (see src.episodes): opened when the drone enters a zone, updated in
+place while it stays inside and closed when it leaves.
+
+Indexes:
+	ix_violations_timestamp_index (timestamp, index): Backs the 24 hour time-range filter and
+		the keyset pagination order of GET /nfz.
+
+On PostgreSQL the table is created partitioned by day on `timestamp`, with the primary key
+(index, timestamp), see src.partitions and src.create_tables.
+
+ViolationRollup ('violation_rollups_hourly') holds the violation count per hour, owner and
+drone, maintained in the same transaction as the violation inserts (see src.rollups).
+	bucket (datetime): Start of the hour.
+	owner_id (str): Owner identifier (`Violation.id`).
+	drone_id (str): Identifier of the drone.
+	count (int): Violations of that owner and drone within the hour.
+
+Zone ('zones') is one configurable no-fly zone, loaded and indexed by src.zones:
+	id (int): Primary key, stored on the violations as `zone_id`.
+	name (str): Display name of the zone.
+	kind (str): "circle" or "polygon".
+	center_x, center_y (float): Center of a circle zone.
+	radius (float): Radius of a circle zone in meters.
+	vertices (list): [[x, y], ...] corners of a polygon zone.
+	min_z, max_z (float): Altitude band of the zone, open-ended when None.
+	active (bool): Inactive zones are kept but not enforced.
 """
 
 class Violation(Base):
@@ -33,4 +65,35 @@ class Violation(Base):
     owner_first_name = Column(String, nullable=False) 
     owner_last_name = Column(String, nullable=False)
     owner_ssn = Column(String, nullable=False)
-    owner_phone = Column(String, nullable=False)
\ No newline at end of file
+    owner_phone = Column(String, nullable=False)
+    last_seen = Column(DateTime)
+    ended_at = Column(DateTime)
+    closest_distance = Column(Float)
+    sample_count = Column(Integer, nullable=False, default=1, server_default="1")
+    zone_id = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_violations_timestamp_index", "timestamp", "index"),
+    )
+
+
+class ViolationRollup(Base):
+    __tablename__ = "violation_rollups_hourly"
+    bucket = Column(DateTime, primary_key=True)
+    owner_id = Column(String, primary_key=True)
+    drone_id = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class Zone(Base):
+    __tablename__ = "zones"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    center_x = Column(Float)
+    center_y = Column(Float)
+    radius = Column(Float)
+    vertices = Column(JSON)
+    min_z = Column(Float)
+    max_z = Column(Float)
+    active = Column(Boolean, nullable=False, default=True, server_default=true())
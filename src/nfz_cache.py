@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+import orjson
+from redis.exceptions import RedisError
+
+from src import metrics
+from src.redis_client import get_redis
+from src.serialization import VIOLATION_COLUMNS, encode_violations
+from src.settings import settings
+
+"""
+Version-keyed response cache of GET /nfz (the full 24 hour list, without pagination).
+
+The violations table only changes when a detection tick commits, so the workers bump a
+"violations version" counter in redis after every commit (`bump_version`, called by
+`pipeline.save_violations_to_db`). GET /nfz reads the version (one redis GET) and serves the
+pre-serialized response of that version without touching the database:
+	1. from this API worker's memory,
+	2. else from redis, where the first worker that built it stored it for all the others,
+	3. else from the database, once per version and worker (concurrent requests wait for
+	   the same build), then stored in both tiers.
+Entries are kept for at most `NFZ_CACHE_TTL` seconds, which also bounds staleness should a
+version bump be lost (redis down at commit time).
+
+Modes (NFZ_CACHE):
+	sliding: an entry keeps the byte offset and timestamp of every row, so rows that aged out of
+	         the 24 hour window since it was built are cut off the front of the cached bytes on
+	         every read (rows are ordered by timestamp), without a new query or re-encoding.
+	version: entries are served as built; rows aging out disappear on the next version or
+	         after NFZ_CACHE_TTL at the latest.
+	off:     every request queries the database.
+When redis is unreachable the cache is bypassed, never trusted blindly.
+
+Classes:
+	CachedViolations: Encoded rows of one version, with window(since).
+	NfzCache: The two-tier cache.
+Functions:
+	bump_version(): Invalidates every cached /nfz response.
+"""
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "violations:version"
+ENTRY_KEY_PREFIX = "nfz:cache:"
+WINDOW = timedelta(hours=24)
+
+_TIMESTAMP = VIOLATION_COLUMNS.index("timestamp")
+
+
+async def bump_version():
+    try:
+        await get_redis().incr(VERSION_KEY)
+    except RedisError as e:
+        logger.warning(f"Could not bump the violations version, cached /nfz responses may lag: {e}")
+
+
+class CachedViolations:
+    __slots__ = ("version", "body", "stamps", "offsets", "built_at")
+
+    def __init__(self, version: str, body: bytes, stamps: list, offsets: list, built_at: float):
+        self.version = version
+        self.body = body          # JSON array of the rows
+        self.stamps = stamps      # timestamp of every row, ascending
+        self.offsets = offsets    # byte offset of every row in body
+        self.built_at = built_at  # wall clock time
+
+    @classmethod
+    def from_rows(cls, version: str, rows) -> "CachedViolations":
+        items = [orjson.dumps(dict(zip(VIOLATION_COLUMNS, row))) for row in rows]
+        offsets, position = [], 1
+        for item in items:
+            offsets.append(position)
+            position += len(item) + 1
+        stamps = [row[_TIMESTAMP].timestamp() for row in rows]
+        return cls(version, b"[" + b",".join(items) + b"]", stamps, offsets, time.time())
+
+    def window(self, since: float) -> bytes:
+        """ The rows with a timestamp >= `since`, sliced from the encoded bytes """
+        first = bisect_left(self.stamps, since)
+        if first == 0:
+            return self.body
+        if first == len(self.stamps):
+            return b"[]"
+        return b"[" + self.body[self.offsets[first]:]
+
+    def to_redis(self) -> dict:
+        return {"body": self.body, "stamps": json.dumps(self.stamps),
+                "offsets": json.dumps(self.offsets), "built_at": self.built_at}
+
+    @classmethod
+    def from_redis(cls, version: str, fields: dict) -> "CachedViolations":
+        return cls(version, fields["body"].encode(), json.loads(fields["stamps"]),
+                   json.loads(fields["offsets"]), float(fields["built_at"]))
+
+
+class NfzCache:
+    def __init__(self, mode: str | None = None, ttl: float | None = None):
+        self.mode = settings.NFZ_CACHE if mode is None else mode
+        self.ttl = settings.NFZ_CACHE_TTL if ttl is None else ttl
+        self._entry = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def _fresh(self, entry: CachedViolations | None, version: str) -> bool:
+        return entry is not None and entry.version == version and time.time() - entry.built_at < self.ttl
+
+    async def get(self, load_rows) -> bytes:
+        """
+        The JSON body of the violations of the last 24 hours. `load_rows(since)` queries them
+        (as column tuples ordered by timestamp) on a miss.
+        """
+        since = datetime.now() - WINDOW
+        try:
+            version = await get_redis().get(VERSION_KEY) or "0"
+        except RedisError as e:
+            logger.debug(f"Violations version unavailable, bypassing the /nfz cache: {e}")
+            metrics.nfz_cache_requests.inc(result="bypass")
+            return encode_violations(await load_rows(since))
+
+        entry = self._entry
+        if self._fresh(entry, version):
+            metrics.nfz_cache_requests.inc(result="hit_local")
+        else:
+            async with self._lock:
+                entry = self._entry
+                if self._fresh(entry, version):
+                    metrics.nfz_cache_requests.inc(result="hit_local")
+                else:
+                    entry = await self._load(version, load_rows, since)
+                    self._entry = entry
+        return entry.window(since.timestamp()) if self.mode == "sliding" else entry.body
+
+    async def _load(self, version: str, load_rows, since: datetime) -> CachedViolations:
+        key = ENTRY_KEY_PREFIX + version
+        try:
+            fields = await get_redis().hgetall(key)
+            if fields:
+                entry = CachedViolations.from_redis(version, fields)
+                if self._fresh(entry, version):
+                    metrics.nfz_cache_requests.inc(result="hit_redis")
+                    return entry
+        except (RedisError, KeyError, ValueError) as e:
+            logger.warning(f"Could not read cached /nfz response {version}: {e}")
+
+        metrics.nfz_cache_requests.inc(result="miss")
+        # built from a query that started after the version was read, so it holds at least that version
+        entry = CachedViolations.from_rows(version, await load_rows(since))
+        try:
+            async with get_redis().pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=entry.to_redis())
+                pipe.expire(key, max(1, int(self.ttl)))
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Could not store cached /nfz response {version}: {e}")
+        return entry
@@ -0,0 +1,154 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+
+from redis.exceptions import RedisError
+
+from src.redis_client import get_redis
+from src.settings import settings
+
+"""
+Two-tier cache for owner records returned by the `users/{owner_id}` endpoint.
+
+Owner records (see `schemas.Owner_data`) almost never change, so repeat offenders should not
+cost an upstream call every time they enter the zone again.
+
+Tiers:
+	1. In-process LRU with a TTL, bounded to `OWNER_CACHE_SIZE` entries (least recently used
+	   entries are evicted first).
+	2. Redis on the `CELERY_BROKER_URL` instance, so every worker process and host shares hits.
+	   Redis problems are logged and treated as misses, they never fail a tick.
+
+Owners the API answered with 404 are cached as well (negative caching) with the shorter
+`OWNER_CACHE_NEGATIVE_TTL`, and returned as the `NOT_FOUND` marker.
+
+Classes:
+	LRUCache: Size-bounded in-process LRU with per-entry expiry.
+	OwnerCache: The two-tier cache with hit/miss counters.
+Globals:
+	owner_cache (OwnerCache): Per-process instance used by `src.owners`.
+"""
+
+logger = logging.getLogger(__name__)
+
+NOT_FOUND = object()
+_REDIS_NOT_FOUND = "null"
+
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._data = OrderedDict()  # -> key: (expires_at, value)
+
+    def get(self, key):
+        """ Returns the cached value or None if it is missing or expired """
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl: float):
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+class OwnerCache:
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float, redis_url: str | None = None):
+        self.local = LRUCache(maxsize)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.redis_url = redis_url
+        self.counters = {"local_hits": 0, "redis_hits": 0, "negative_hits": 0, "misses": 0}
+
+    def _redis_client(self):
+        return get_redis(self.redis_url) if self.redis_url else None
+
+    @staticmethod
+    def _key(owner_id) -> str:
+        return f"owner:{owner_id}"
+
+    async def get_many(self, owner_ids: list) -> tuple[dict, list]:
+        """
+        Looks the owners up in both tiers.
+        Returns (cached, missing): cached maps owner_id -> owner data or NOT_FOUND,
+        missing lists the ids that must be fetched from the API.
+        """
+        cached, remote = {}, []
+        for owner_id in owner_ids:
+            value = self.local.get(owner_id)
+            if value is None:
+                remote.append(owner_id)
+            else:
+                cached[owner_id] = value
+                self.counters["local_hits"] += 1
+
+        missing = remote
+        client = self._redis_client()
+        if remote and client is not None:
+            try:
+                values = await client.mget([self._key(owner_id) for owner_id in remote])
+            except RedisError as e:
+                logger.warning(f"Owner cache: redis lookup failed, falling back to API: {e}")
+                values = [None] * len(remote)
+
+            missing = []
+            for owner_id, raw in zip(remote, values):
+                if raw is None:
+                    missing.append(owner_id)
+                    continue
+                if raw == _REDIS_NOT_FOUND:
+                    value, ttl = NOT_FOUND, self.negative_ttl
+                else:
+                    value, ttl = json.loads(raw), self.ttl
+                self.local.set(owner_id, value, ttl)
+                cached[owner_id] = value
+                self.counters["redis_hits"] += 1
+
+        self.counters["negative_hits"] += sum(1 for value in cached.values() if value is NOT_FOUND)
+        self.counters["misses"] += len(missing)
+        return cached, missing
+
+    async def set_many(self, owners: dict):
+        """ Stores fetched owners (or NOT_FOUND for 404s) in both tiers """
+        if not owners:
+            return
+        for owner_id, value in owners.items():
+            self.local.set(owner_id, value, self.negative_ttl if value is NOT_FOUND else self.ttl)
+
+        client = self._redis_client()
+        if client is None:
+            return
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for owner_id, value in owners.items():
+                    if value is NOT_FOUND:
+                        pipe.set(self._key(owner_id), _REDIS_NOT_FOUND, ex=int(self.negative_ttl))
+                    else:
+                        pipe.set(self._key(owner_id), json.dumps(value), ex=int(self.ttl))
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Owner cache: redis write failed: {e}")
+
+    def stats(self) -> dict:
+        return {**self.counters, "size": len(self.local), "evictions": self.local.evictions}
+
+
+owner_cache = OwnerCache(
+    maxsize=settings.OWNER_CACHE_SIZE,
+    ttl=settings.OWNER_CACHE_TTL,
+    negative_ttl=settings.OWNER_CACHE_NEGATIVE_TTL,
+    redis_url=settings.CELERY_BROKER_URL if settings.OWNER_CACHE_REDIS else None,
+)
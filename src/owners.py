@@ -0,0 +1,96 @@
+import asyncio
+import httpx
+import logging
+
+from src import worker_runtime
+from src.owner_cache import owner_cache, NOT_FOUND
+from src.settings import settings
+from src.upstream import UpstreamClient
+
+"""
+Owner lookup stage for a violation tick.
+
+All owners that need enrichment in one tick are fetched together from `users/{owner_id}`,
+concurrently and over the process's keep-alive connection pool, instead of one blocking request
+(and one TCP/TLS handshake) per violating drone. Lookups go through the resilient upstream
+client (see src.upstream): per-attempt timeouts, budgeted retries, hedging and the `users`
+circuit breaker, so a slow users API fails fast instead of holding up the tick.
+
+Owners are served from the two-tier owner cache (see src.owner_cache) first, only cache
+misses go upstream, and the fetched records and 404s are written back to the cache.
+
+Functions:
+	fetch_owners(owner_ids, concurrency, deadline, client):
+		Fetches the owner records for the given ids and returns a dict owner_id -> owner data.
+		- Owners known to return 404 are left out of the result without an upstream call.
+		- At most `concurrency` lookups are in flight at once, on `client` (the process's
+		  upstream client by default).
+		- The whole batch is bounded by `deadline` seconds; lookups still running when it
+		  expires are cancelled.
+		- A failed lookup (HTTP error, timeout, bad payload) is logged and left out of the
+		  result, it never aborts the rest of the batch.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+async def _fetch_owner(client: UpstreamClient, semaphore: asyncio.Semaphore, owner_id):
+    async with semaphore:
+        response = await client.get("users/" + str(owner_id))
+    if response.status_code == 404:
+        logger.warning(f"Owner {owner_id} not found (HTTP 404)")
+        return NOT_FOUND
+    if response.status_code != 200:
+        logger.warning(f"Could not fetch owner info for drone {owner_id}: HTTP {response.status_code}")
+        return None
+    owner_info = response.json()
+    if not isinstance(owner_info, dict):
+        logger.error(f"Invalid owner data format for owner {owner_id}: expected dict")
+        return None
+    return owner_info
+
+
+async def fetch_owners(owner_ids, concurrency: int | None = None, deadline: float | None = None,
+                       client: UpstreamClient | None = None) -> dict:
+    """ Fetches all owners of a tick concurrently, returns only the successful lookups """
+    owner_ids = list(dict.fromkeys(owner_ids))
+    if not owner_ids:
+        return {}
+
+    cached, missing = await owner_cache.get_many(owner_ids)
+    owners = {owner_id: info for owner_id, info in cached.items() if info is not NOT_FOUND}
+    if not missing:
+        logger.info(f"Served {len(owners)}/{len(owner_ids)} owner(s) from cache, cache stats: {owner_cache.stats()}")
+        return owners
+
+    concurrency = concurrency or settings.OWNER_LOOKUP_CONCURRENCY
+    deadline = deadline or settings.OWNER_LOOKUP_DEADLINE
+    client = client or worker_runtime.get_upstream()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    fetched = {}
+    tasks = {asyncio.create_task(_fetch_owner(client, semaphore, owner_id)): owner_id
+             for owner_id in missing}
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+        logger.warning(f"Owner lookup deadline of {deadline}s hit, {len(pending)} lookup(s) cancelled")
+
+    for task in done:
+        owner_id = tasks[task]
+        try:
+            owner_info = task.result()
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"Owner lookup failed for owner {owner_id}: {e}")
+            continue
+        if owner_info is not None:
+            fetched[owner_id] = owner_info
+
+    await owner_cache.set_many(fetched)
+    owners.update((owner_id, info) for owner_id, info in fetched.items() if info is not NOT_FOUND)
+    logger.info(f"Fetched {len(owners)}/{len(owner_ids)} owner(s), "
+                f"{len(missing)} upstream call(s), cache stats: {owner_cache.stats()}")
+    return owners
@@ -0,0 +1,28 @@
+import base64
+from datetime import datetime
+
+"""
+Opaque cursors for keyset pagination of violations.
+
+A cursor points just past the last row of a page by its sort key `(timestamp, index)`, so the
+next page is fetched with `WHERE (timestamp, index) > (:timestamp, :index)` on the composite
+index instead of an ever-growing OFFSET.
+
+Functions:
+	encode_cursor(timestamp, index): Returns the url-safe cursor string for a row.
+	decode_cursor(cursor): Returns (timestamp, index), raises ValueError on a malformed cursor.
+"""
+
+
+def encode_cursor(timestamp: datetime, index: int) -> str:
+    raw = f"{timestamp.isoformat()}|{index}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, index = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(index)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
@@ -0,0 +1,203 @@
+import logging
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from src.model import Violation
+from src.settings import settings
+
+"""
+Daily range partitions of the 'violations' table (PostgreSQL only).
+
+GET /nfz only reads the last 24 hours, so on PostgreSQL `violations` is a table partitioned by
+RANGE (timestamp) with one partition per day (`violations_pYYYYMMDD`). The time filter of
+/nfz (`timestamp >= since`) is then pruned to the one or two newest partitions, and its
+(timestamp, index) index stays small, however much history is kept.
+
+Maintenance (the `maintain_partitions` Celery beat task, and `create_tables`):
+	- creates the partitions of today and the next `VIOLATION_PARTITIONS_AHEAD` days,
+	- detaches partitions older than `VIOLATION_RETENTION_DAYS` days, then drops them or,
+	  with `VIOLATION_RETENTION_ACTION=detach`, keeps them as standalone
+	  `violations_archive_YYYYMMDD` tables to be dumped and dropped by the operator.
+A DEFAULT partition catches rows no daily partition covers, so inserts never fail when
+maintenance has not run; it stays empty as long as partitions are created ahead of time. Rows
+that landed there are moved into their day's partition once it is created. Every partition is
+created or expired in its own savepoint, so one that fails is logged and skipped while the
+rest of the run (retention included) still goes through.
+
+Other databases (SQLite for local benchmarks) keep the plain table created from the model.
+
+Functions:
+	is_partitioned_backend(conn): True when the connection's database supports partitioning.
+	create_partitioned_table(conn): Creates the partitioned parent table and its indexes.
+	convert_to_partitioned(conn): Moves a plain `violations` table into a partitioned one.
+	ensure_partitions(conn, today, days_ahead): Creates the missing daily partitions.
+	expire_partitions(conn, today, retention_days, action): Detaches and drops/archives old partitions.
+	maintain(conn): ensure_partitions + expire_partitions with the configured policy.
+"""
+
+logger = logging.getLogger(__name__)
+
+TABLE = Violation.__tablename__
+PARTITION_PREFIX = f"{TABLE}_p"
+ARCHIVE_PREFIX = f"{TABLE}_archive_"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def is_partitioned_backend(conn) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def partition_day(name: str) -> date | None:
+    if not name.startswith(PARTITION_PREFIX):
+        return None
+    try:
+        return datetime.strptime(name[len(PARTITION_PREFIX):], "%Y%m%d").date()
+    except ValueError:
+        return None
+
+
+async def table_kind(conn, name: str) -> str | None:
+    """ pg_class.relkind of a table: 'p' partitioned, 'r' plain, None if it does not exist """
+    result = await conn.execute(
+        text("SELECT relkind::text FROM pg_class WHERE relname = :name AND relnamespace = 'public'::regnamespace"),
+        {"name": name})
+    return result.scalar()
+
+
+async def create_partitioned_table(conn):
+    """
+    Creates `violations` as a table partitioned by day, with the model's columns and indexes.
+    The primary key must contain the partition key, so it is (index, timestamp) here while
+    the ORM keeps addressing rows by `index` (still unique, it comes from one sequence).
+    """
+    table = Violation.__table__
+    columns = [str(CreateColumn(column).compile(dialect=conn.dialect)) for column in table.columns]
+    await conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS {TABLE} ({", ".join(columns)}, PRIMARY KEY ("index", timestamp)) '
+        f'PARTITION BY RANGE (timestamp)'))
+    for index in table.indexes:
+        await conn.execute(CreateIndex(index, if_not_exists=True))
+    await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+
+
+async def convert_to_partitioned(conn):
+    """ Rebuilds a plain (pre-partitioning) `violations` table as a partitioned one, keeping its rows """
+    legacy = f"{TABLE}_unpartitioned"
+    logger.info(f"Converting {TABLE} to a partitioned table")
+    await conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+    for index in Violation.__table__.indexes:
+        await conn.execute(text(f'DROP INDEX IF EXISTS "{index.name}"'))
+    await create_partitioned_table(conn)
+
+    days = (await conn.execute(text(f"SELECT DISTINCT timestamp::date FROM {legacy}"))).scalars().all()
+    for day in days:
+        await create_partition(conn, day)
+
+    columns = ", ".join(f'"{column.name}"' for column in Violation.__table__.columns)
+    await conn.execute(text(f"INSERT INTO {TABLE} ({columns}) SELECT {columns} FROM {legacy}"))
+    await conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'index'), "
+        f"(SELECT COALESCE(MAX(\"index\"), 0) + 1 FROM {TABLE}), false)"))
+    await conn.execute(text(f"DROP TABLE {legacy}"))
+    logger.info(f"Moved the rows of {len(days)} day(s) into daily partitions")
+
+
+async def create_partition(conn, day: date):
+    """
+    Creates the partition of `day`. PostgreSQL refuses a new partition while the DEFAULT
+    partition holds rows of its range, so such rows (inserted while maintenance had not run)
+    are moved into the new table first and the table is then attached.
+    """
+    name = partition_name(day)
+    start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    in_range = f"timestamp >= '{start}' AND timestamp < '{end}'"
+    stray = await conn.execute(text(f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range} LIMIT 1"))
+    if stray.scalar() is None:
+        await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} {bounds}"))
+        return
+
+    await conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = await conn.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_range} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"))
+    # attaching creates the partition's indexes and checks the DEFAULT partition is clear of the range
+    await conn.execute(text(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} {bounds}"))
+    logger.warning(f"Moved {moved.rowcount} row(s) of {day} out of {DEFAULT_PARTITION} into {name}")
+
+
+async def list_partitions(conn) -> list:
+    result = await conn.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table"), {"table": TABLE})
+    return result.scalars().all()
+
+
+async def _isolated(conn, description: str, step, *args) -> bool:
+    """
+    Runs one maintenance step in a savepoint, so a failing partition is logged and rolled back
+    alone instead of aborting the transaction, and with it the rest of the maintenance run.
+    """
+    try:
+        async with conn.begin_nested():
+            await step(conn, *args)
+        return True
+    except Exception as e:
+        logger.error(f"Could not {description}: {e}")
+        return False
+
+
+async def ensure_partitions(conn, today: date, days_ahead: int) -> list:
+    """ Creates the partitions of today and the next `days_ahead` days, returns the created ones """
+    existing = set(await list_partitions(conn))
+    created = []
+    for offset in range(days_ahead + 1):
+        day = today + timedelta(days=offset)
+        if partition_name(day) not in existing:
+            if await _isolated(conn, f"create partition {partition_name(day)}", create_partition, day):
+                created.append(partition_name(day))
+    if created:
+        logger.info(f"Created partition(s) {', '.join(created)}")
+    return created
+
+
+async def _expire_partition(conn, name: str, day: date, action: str):
+    await conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+    if action == "drop":
+        await conn.execute(text(f"DROP TABLE {name}"))
+    else:
+        await conn.execute(text(f"ALTER TABLE {name} RENAME TO {ARCHIVE_PREFIX}{day:%Y%m%d}"))
+
+
+async def expire_partitions(conn, today: date, retention_days: int, action: str) -> list:
+    """ Detaches the partitions older than the retention, then drops or archives them """
+    cutoff = today - timedelta(days=retention_days)
+    expired = []
+    for name in await list_partitions(conn):
+        day = partition_day(name)
+        if day is None or day >= cutoff:
+            continue
+        if await _isolated(conn, f"expire partition {name}", _expire_partition, name, day, action):
+            expired.append(name)
+    if expired:
+        logger.info(f"Expired partition(s) {', '.join(expired)} ({action})")
+    return expired
+
+
+async def maintain(conn, today: date | None = None) -> dict:
+    """ Runs the configured partition policy, a no-op on databases without partitioning """
+    if not is_partitioned_backend(conn):
+        return {"created": [], "expired": []}
+    today = today or datetime.now().date()
+    created = await ensure_partitions(conn, today, settings.VIOLATION_PARTITIONS_AHEAD)
+    expired = await expire_partitions(conn, today, settings.VIOLATION_RETENTION_DAYS,
+                                      settings.VIOLATION_RETENTION_ACTION)
+    return {"created": created, "expired": expired}
@@ -0,0 +1,89 @@
+import logging
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.model import Violation
+from src.settings import settings
+
+"""
+Bulk write path for violation records.
+
+Violations of a tick are written in as few round-trips as possible instead of one ORM object
+per row:
+	- small batches use multi-row `INSERT ... VALUES (...), (...)` statements,
+	- batches of at least `BULK_COPY_THRESHOLD` rows use asyncpg `COPY` when the database is
+	  PostgreSQL (any other driver falls back to multi-row INSERTs).
+
+Open violation episodes are updated in place with one executemany UPDATE per batch, matched
+on (drone_id, zone_id, timestamp) so PostgreSQL only touches the partition of the episode's
+start. zone_id is compared with IS NOT DISTINCT FROM, it is NULL for the built-in NFZ.
+
+All paths run on the caller's connection and inside the caller's transaction.
+
+Functions:
+	bulk_insert_violations(conn, rows):
+		Inserts a list of violation dicts (keys = `model.Violation` columns) and returns the count.
+	bulk_update_episodes(conn, values):
+		Updates episode rows from dicts made by `episodes.row_values` and returns the count.
+"""
+
+logger = logging.getLogger(__name__)
+
+# asyncpg caps a statement at 32767 bind parameters, keep multi-row INSERTs well under it
+INSERT_CHUNK_SIZE = 1000
+
+
+def _insert_columns() -> list:
+    return [column.name for column in Violation.__table__.columns if not column.primary_key]
+
+
+def _column_defaults() -> dict:
+    """ Value of every insert column when a row leaves it out, as the INSERT path would apply it """
+    return {column.name: column.default.arg if column.default is not None and column.default.is_scalar else None
+            for column in Violation.__table__.columns if not column.primary_key}
+
+
+async def _insert_values(conn: AsyncConnection, rows: list):
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        await conn.execute(insert(Violation.__table__).values(rows[start:start + INSERT_CHUNK_SIZE]))
+
+
+async def _copy_records(conn: AsyncConnection, rows: list):
+    columns = _insert_columns()
+    defaults = _column_defaults()
+    # COPY takes every column of every record, fill the ones a row leaves out
+    records = [tuple(row.get(column, defaults[column]) for column in columns) for row in rows]
+
+    # run one statement through SQLAlchemy first so its transaction is open and COPY joins it
+    await conn.exec_driver_sql("SELECT 1")
+    raw = await conn.get_raw_connection()
+    await raw.driver_connection.copy_records_to_table(
+        Violation.__tablename__, records=records, columns=columns
+    )
+
+
+async def bulk_insert_violations(conn: AsyncConnection, rows: list) -> int:
+    if not rows:
+        return 0
+    if len(rows) >= settings.BULK_COPY_THRESHOLD and conn.dialect.driver == "asyncpg":
+        await _copy_records(conn, rows)
+        logger.debug(f"Copied {len(rows)} violation(s) with COPY")
+    else:
+        await _insert_values(conn, rows)
+        logger.debug(f"Inserted {len(rows)} violation(s) with multi-row INSERT")
+    return len(rows)
+
+
+async def bulk_update_episodes(conn: AsyncConnection, values: list) -> int:
+    if not values:
+        return 0
+    table = Violation.__table__
+    statement = (update(table)
+                 .where(table.c.drone_id == bindparam("b_drone_id"),
+                        table.c.zone_id.is_not_distinct_from(bindparam("b_zone_id")),
+                        table.c.timestamp == bindparam("b_timestamp"))
+                 .values({key: bindparam(key) for key in values[0] if not key.startswith("b_")}))
+    await conn.execute(statement, values)
+    logger.debug(f"Updated {len(values)} violation episode(s)")
+    return len(values)
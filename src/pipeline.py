@@ -0,0 +1,256 @@
+import logging
+import time
+from datetime import datetime, timedelta
+
+from src import metrics, worker_runtime
+from src.drone_feed import InvalidDroneData, iter_drone_chunks
+from src.episodes import diff_episodes, episode_key, get_episode_store, row_values
+from src.live_feed import publish_violations
+from src.nfz_cache import bump_version
+from src.owners import fetch_owners
+from src.persistence import bulk_insert_violations, bulk_update_episodes
+from src.rollups import upsert_rollups
+from src.settings import settings
+from src.sharding import shard_of
+from src.upstream import UpstreamClient
+from src.zones import ZoneRegistry, detect_violations
+
+"""
+The violation check pipeline, shared by the Celery task (`src.tasks`) and the continuous
+ingestion service (`src.ingest`).
+
+One tick runs these stages on a pooled, resilient http client (see src.upstream) and the
+process's long-lived engine:
+	1. stream the drone snapshot from the external API, parsed incrementally in chunks of
+	   `DRONE_CHUNK_SIZE` drones (see src.drone_feed),
+	2. detect the drones inside the no-fly zones per chunk as it arrives: one scalar loop for a
+	   single circle zone, otherwise one vectorized pass over the zones' spatial index (see
+	   src.zones, hot-reloaded from the zones table), so only the current chunk and the drones
+	   inside a zone are held in memory,
+	3. diff them against the open violation episodes (see src.episodes): only drones that
+	   entered or left the zone (plus periodic flushes of long stays) touch the database,
+	4. fetch the owners of the entering drones concurrently (see src.owners),
+	5. store the new episodes in one bulk write (see src.persistence), together with their
+	   hourly rollups (see src.rollups), update the changed ones in place, and publish the new
+	   ones to the API live feed (see src.live_feed), and invalidate the cached GET /nfz
+	   responses (see src.nfz_cache).
+
+Every tick reports its detection lag: the time from when the drone positions were received
+from the API (the response headers of the snapshot, so parsing and detecting the streamed
+body count as lag) to when their violations were committed. Stage durations and item counts are
+recorded in src.metrics and pushed to redis for the API's /metrics endpoint.
+
+Classes:
+	TickResult: Counts and timings of one tick.
+Functions:
+	stream_drones(client): Streams one drone snapshot in chunks.
+	fetch_drones(client): Fetches one whole drone snapshot, returns (drones, observed_at).
+	detect_chunk(drones, zones): Detects the drones of a list that are inside a zone.
+	build_violation(episode, owner_info): Prepares the row of a new episode.
+	save_violations_to_db(violations_data, episode_updates): Stores one tick in one transaction.
+	record_violations(inside, shard): Diffs, enriches and stores the episodes of one tick.
+	process_snapshot(drones, observed_at, shard): Runs the stages after the fetch on a snapshot
+		(or on one shard of it, see src.sharding).
+	run_tick(client): Runs one full violation check on a streamed snapshot.
+Globals:
+	episode_store (EpisodeStore): Open episodes, in-process or shared through redis.
+	zone_registry (ZoneRegistry): The process's no-fly zones.
+	NFZ_RADIUS (float): Radius of the built-in NFZ in meters, used while no zones are configured.
+"""
+
+NFZ_RADIUS = 1000.0
+episode_store = get_episode_store()
+zone_registry = ZoneRegistry(worker_runtime.get_engine, NFZ_RADIUS)
+
+logger = logging.getLogger(__name__)
+
+
+class TickResult:
+    __slots__ = ("drones", "violators", "recorded", "closed", "observed_at", "committed_at")
+
+    def __init__(self, drones: int, violators: int, recorded: int, closed: int, observed_at: float,
+                 committed_at: float | None):
+        self.drones = drones
+        self.violators = violators
+        self.recorded = recorded
+        self.closed = closed
+        self.observed_at = observed_at
+        self.committed_at = committed_at
+
+    @property
+    def detection_lag(self) -> float | None:
+        """ Seconds from receiving the positions to committing their violations """
+        if self.committed_at is None:
+            return None
+        return self.committed_at - self.observed_at
+
+
+async def stream_drones(client: UpstreamClient, chunk_size: int | None = None, on_response=None):
+    """
+    Yields the current drone positions in lists of `chunk_size` raw items while they are
+    received. `on_response()` is called once the response headers arrived.
+    """
+    logger.info("Fetching drone data from external API")
+    try:
+        async with client.stream("drones") as response:
+            response.raise_for_status()
+            if on_response is not None:
+                on_response()
+            async for chunk in iter_drone_chunks(response, chunk_size):
+                yield chunk
+    except InvalidDroneData as e:
+        logger.error(f"Invalid drone data: {e}")
+        raise
+
+
+async def fetch_drones(client: UpstreamClient) -> tuple[list, float]:
+    """ Fetches all current drone positions, returns them with the monotonic receive time of the headers """
+    drones, received = [], []
+    async for chunk in stream_drones(client, on_response=lambda: received.append(time.monotonic())):
+        drones.extend(chunk)
+    observed_at = received[0]
+
+    logger.info(f"Successfully fetched {len(drones)} drones")
+    return drones, observed_at
+
+
+def build_violation(episode: dict, owner_info: dict) -> dict:
+    """ Prepares the violation record of a new episode and its owner """
+    opened_at = datetime.fromisoformat(episode['opened_at'])
+    return {
+        "id": str(episode['owner_id']),
+        "drone_id": episode['drone_id'],
+        "timestamp": opened_at,
+        "position_x": episode['x'],
+        "position_y": episode['y'],
+        "position_z": episode['z'],
+        "owner_first_name": owner_info['first_name'],
+        "owner_last_name": owner_info['last_name'],
+        "owner_ssn": owner_info['social_security_number'],
+        "owner_phone": owner_info['phone_number'],
+        "last_seen": opened_at,
+        "ended_at": None,
+        "closest_distance": episode['closest'],
+        "sample_count": episode['samples'],
+        "zone_id": episode.get('zone_id'),
+    }
+
+
+async def save_violations_to_db(violations_data: list, episode_updates: list = ()):
+    """ Saves new episodes, their rollups and episode updates in one transaction on the process's long-lived engine """
+    try:
+        async with worker_runtime.get_engine().begin() as conn:
+            await bulk_insert_violations(conn, violations_data)
+            await upsert_rollups(conn, violations_data)
+            await bulk_update_episodes(conn, list(episode_updates))
+        # committed: every cached GET /nfz response is outdated now
+        await bump_version()
+
+        logger.info(f"Successfully stored {len(violations_data)} new and {len(episode_updates)} updated violation(s) in the database.")
+    except Exception as e:
+        logger.error(f"Database error: {e}")
+        logger.debug(f"Database URL: {settings.DATABASE_URL}")
+        raise
+
+
+async def record_violations(inside: list, shard: tuple[int, int] | None = None) -> tuple[list, list]:
+    """
+    Diffs the drones inside a zone against the open episodes, then enriches and stores the
+    entering drones and updates the changed episodes in place. Entries that did not end up
+    stored are dropped again (retried next tick), closes that failed are put back.
+    With `shard` = (index, count), only the open episodes of that owner shard are considered.
+    Returns (new violation rows, closed episodes).
+    """
+    now = datetime.now()
+    open_episodes = await episode_store.candidates({episode_key(drone['id'], drone.get('zone_id')) for drone in inside},
+                                                   now - timedelta(seconds=settings.EPISODE_EXIT_GRACE))
+    if shard is not None:
+        open_episodes = {key: episode for key, episode in open_episodes.items()
+                         if shard_of(episode['owner_id'], shard[1]) == shard[0]}
+    changes = diff_episodes(open_episodes, inside, now)
+    changes = await episode_store.apply(changes)
+
+    new_violators_to_save = []
+    if changes.entered:
+        # fetch all owners of this tick concurrently over one connection pool
+        with metrics.stage("enrich") as stage:
+            owners = await fetch_owners([episode['owner_id'] for episode in changes.entered])
+            stage.items = len(owners)
+
+        for episode in changes.entered:
+            try:
+                logger.warning(f"Violation detected! Drone ID: {episode['drone_id']}, Owner ID: {episode['owner_id']}, Zone: {episode.get('zone_id')}, Distance: {episode['closest']:.2f}")
+                owner_info = owners.get(episode['owner_id'])
+                if owner_info is None:
+                    continue
+                new_violators_to_save.append(build_violation(episode, owner_info))
+                logger.info(f"Violation recorded for drone {episode['drone_id']}")
+            except (ValueError, TypeError, KeyError) as e:
+                logger.error(f"Data validation error for drone {episode.get('drone_id', 'unknown')}: {e}")
+
+    recorded = {episode_key(row['drone_id'], row['zone_id']) for row in new_violators_to_save}
+    await episode_store.discard([key for key in (episode_key(e['drone_id'], e.get('zone_id')) for e in changes.entered)
+                                 if key not in recorded])
+
+    closed_keys = {episode_key(e['drone_id'], e.get('zone_id')) for e in changes.closed}
+    episode_updates = ([row_values(episode, closed=True) for episode in changes.closed] +
+                       [row_values(episode, closed=False) for episode in changes.flush
+                        if episode_key(episode['drone_id'], episode.get('zone_id')) not in closed_keys])
+    if new_violators_to_save or episode_updates:
+        try:
+            with metrics.stage("persist") as stage:
+                await save_violations_to_db(new_violators_to_save, episode_updates)
+                stage.items = len(new_violators_to_save) + len(episode_updates)
+        except Exception:
+            await episode_store.discard(recorded)
+            await episode_store.restore(changes.closed)
+            raise
+        await publish_violations(new_violators_to_save)
+    return new_violators_to_save, changes.closed
+
+
+def detect_chunk(drones: list, zones) -> list:
+    """ Every drone of the list inside a zone (malformed items are skipped) """
+    return detect_violations(drones, zones)
+
+
+async def _record_tick(drones: int, inside: list, observed_at: float, shard: tuple[int, int] | None) -> TickResult:
+    recorded, closed = await record_violations(inside, shard)
+    committed_at = time.monotonic() if recorded else None
+    return TickResult(drones, len(inside), len(recorded), len(closed), observed_at, committed_at)
+
+
+async def process_snapshot(drones: list, observed_at: float, shard: tuple[int, int] | None = None) -> TickResult:
+    """ Detects, enriches and stores the violations of a fetched snapshot (or of one shard of it) """
+    zones = await zone_registry.current()
+    with metrics.stage("detect") as stage:
+        inside = detect_chunk(drones, zones)
+        stage.items = len(inside)
+    return await _record_tick(len(drones), inside, observed_at, shard)
+
+
+async def run_tick(client: UpstreamClient) -> TickResult:
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        zones = await zone_registry.current()
+        # detect chunk by chunk while the snapshot streams in, each chunk is dropped afterwards
+        drones, inside, detect_seconds, received = 0, [], 0.0, []
+        fetch_started = time.perf_counter()
+        # the positions are as of the response, parsing and detecting the body is part of the lag
+        async for chunk in stream_drones(client, on_response=lambda: received.append(time.monotonic())):
+            detect_started = time.perf_counter()
+            inside.extend(detect_chunk(chunk, zones))
+            detect_seconds += time.perf_counter() - detect_started
+            drones += len(chunk)
+        observed_at = received[0]
+        logger.info(f"Successfully fetched {drones} drones")
+        metrics.observe_stage("fetch", time.perf_counter() - fetch_started - detect_seconds, drones)
+        metrics.observe_stage("detect", detect_seconds, len(inside))
+
+        result = await _record_tick(drones, inside, observed_at, None)
+        outcome = "ok"
+        return result
+    finally:
+        metrics.tick_duration.observe(time.perf_counter() - started, outcome=outcome)
+        await metrics.push_worker_metrics()
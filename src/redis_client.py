@@ -0,0 +1,31 @@
+import asyncio
+
+import redis.asyncio as aioredis
+
+from src.settings import settings
+
+"""
+Shared asyncio redis clients.
+
+A `redis.asyncio` client (and its connection pool) is bound to the event loop it was first used
+on, so clients are cached per running loop and per URL. All helpers that talk to the redis
+instance on `CELERY_BROKER_URL` (owner cache, episode store, ...) share these clients.
+
+Functions:
+	get_redis(url): Returns the client for `url` (default: CELERY_BROKER_URL) on the running loop.
+"""
+
+_clients = {}  # -> (loop, url): client
+
+
+def get_redis(url: str | None = None) -> aioredis.Redis:
+    url = url or settings.CELERY_BROKER_URL
+    loop = asyncio.get_running_loop()
+    client = _clients.get((loop, url))
+    if client is None:
+        # forget clients of loops that have been closed in the meantime
+        for key in [key for key in _clients if key[0].is_closed()]:
+            del _clients[key]
+        client = aioredis.from_url(url, decode_responses=True)
+        _clients[(loop, url)] = client
+    return client
@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, desc, func, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.model import Violation, ViolationRollup
+
+"""
+Hourly violation rollups, the data behind GET /nfz/stats.
+
+`violation_rollups_hourly` holds one counter per (hour, owner, drone). The pipeline upserts
+the counters of every batch in the same transaction as its violation inserts (see
+src.pipeline.save_violations_to_db), so the rollups never disagree with the raw rows and the
+stats endpoint aggregates O(buckets) rows instead of every violation.
+
+The rollups can be rebuilt from the raw table (e.g. after a restore, or for history written
+before the rollups existed):
+	poetry run python -m src.rollups --since-hours 48    # last 48 hours
+	poetry run python -m src.rollups                     # everything
+On PostgreSQL the rebuild locks the rollup table, so concurrent inserts wait for it and are
+counted on top of the rebuilt counters instead of being lost or counted twice.
+
+Functions:
+	hour_bucket(timestamp): Start of the hour of a datetime.
+	upsert_rollups(conn, rows): Adds a batch of violation dicts to the counters.
+	violation_stats(conn, since, top): Per hour totals and the top owners and drones since a time.
+	backfill(conn, since): Rebuilds the counters from the violations table.
+"""
+
+logger = logging.getLogger(__name__)
+
+TABLE = ViolationRollup.__table__
+
+
+def hour_bucket(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _sql_hour_bucket(conn: AsyncConnection, column):
+    """ SQL expression equal to hour_bucket() of a timestamp column, as stored by the dialect """
+    if conn.dialect.name == "sqlite":
+        # SQLAlchemy stores SQLite datetimes as text in this format
+        return func.strftime("%Y-%m-%d %H:00:00.000000", column)
+    return func.date_trunc("hour", column)
+
+
+def _upsert(conn: AsyncConnection, rows: list):
+    insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+    statement = insert(TABLE).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[TABLE.c.bucket, TABLE.c.owner_id, TABLE.c.drone_id],
+        set_={"count": TABLE.c.count + statement.excluded["count"]})
+
+
+async def upsert_rollups(conn: AsyncConnection, rows: list) -> int:
+    """ Adds violation dicts (keys = `model.Violation` columns) to the hourly counters """
+    counts = Counter((hour_bucket(row["timestamp"]), row["id"], row["drone_id"]) for row in rows)
+    if not counts:
+        return 0
+    # a fixed key order keeps concurrent upserts of overlapping keys from deadlocking
+    values = [{"bucket": bucket, "owner_id": owner_id, "drone_id": drone_id, "count": count}
+              for (bucket, owner_id, drone_id), count in sorted(counts.items())]
+    await conn.execute(_upsert(conn, values))
+    return len(values)
+
+
+async def violation_stats(conn, since: datetime, top: int = 10) -> dict:
+    """ Violation counts per hour, and the `top` owners and drones, from the hour of `since` on """
+    start = hour_bucket(since)
+    in_window = TABLE.c.bucket >= start
+    total = func.sum(TABLE.c.count).label("count")
+
+    hourly = (await conn.execute(
+        select(TABLE.c.bucket, total).where(in_window).group_by(TABLE.c.bucket).order_by(TABLE.c.bucket))).all()
+    owners = (await conn.execute(
+        select(TABLE.c.owner_id, total).where(in_window).group_by(TABLE.c.owner_id)
+        .order_by(desc("count"), TABLE.c.owner_id).limit(top))).all()
+    drones = (await conn.execute(
+        select(TABLE.c.drone_id, total).where(in_window).group_by(TABLE.c.drone_id)
+        .order_by(desc("count"), TABLE.c.drone_id).limit(top))).all()
+
+    return {
+        "since": start,
+        "total": sum(row.count for row in hourly),
+        "hourly": [{"bucket": row.bucket, "count": row.count} for row in hourly],
+        "top_owners": [{"owner_id": row.owner_id, "count": row.count} for row in owners],
+        "top_drones": [{"drone_id": row.drone_id, "count": row.count} for row in drones],
+    }
+
+
+async def backfill(conn: AsyncConnection, since: datetime | None = None) -> int:
+    """ Rebuilds the counters from the raw violations (all of them, or from the hour of `since`) """
+    if conn.dialect.name == "postgresql":
+        await conn.execute(text(f"LOCK TABLE {TABLE.name} IN EXCLUSIVE MODE"))
+
+    clear = delete(TABLE)
+    source = Violation.__table__
+    bucket = _sql_hour_bucket(conn, source.c.timestamp)
+    aggregate = select(bucket, source.c.id, source.c.drone_id, func.count())
+    if since is not None:
+        start = hour_bucket(since)
+        clear = clear.where(TABLE.c.bucket >= start)
+        aggregate = aggregate.where(source.c.timestamp >= start)
+    aggregate = aggregate.group_by(bucket, source.c.id, source.c.drone_id)
+
+    await conn.execute(clear)
+    result = await conn.execute(TABLE.insert().from_select(
+        [TABLE.c.bucket, TABLE.c.owner_id, TABLE.c.drone_id, TABLE.c.count], aggregate))
+    logger.info(f"Rebuilt {result.rowcount} rollup bucket(s)")
+    return result.rowcount
+
+
+async def main(since_hours: float | None):
+    from src.database import async_engine
+
+    since = datetime.now() - timedelta(hours=since_hours) if since_hours is not None else None
+    async with async_engine.begin() as conn:
+        await backfill(conn, since)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild the hourly violation rollups from the violations table")
+    parser.add_argument("--since-hours", type=float, help="only rebuild the last N hours (default: everything)")
+    args = parser.parse_args()
+    asyncio.run(main(args.since_hours))
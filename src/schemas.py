@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List
 
 """
 Pydantic model used for data validation of violation records,
@@ -18,6 +19,11 @@ Attributes:
 	owner_last_name (str): Last name of the drone's owner.
 	owner_ssn (str): Social Security Number of the drone's owner.
 	owner_phone (str): Phone number of the drone's owner.
+	last_seen (datetime): Last time the drone was seen inside the NFZ during this episode.
+	ended_at (datetime): When the drone left the NFZ, None while it is still inside.
+	closest_distance (float): Closest distance of the drone to the zone center.
+	sample_count (int): Snapshots the drone was seen inside the NFZ during this episode.
+	zone_id (int): The zone that was breached, None for the built-in NFZ.
 Config:
 	from_attributes (bool): Enables population of the model from ORM objects SQLAlchemy models.
 """
@@ -33,6 +39,11 @@ class Violation(BaseModel):
     owner_last_name: str
     owner_ssn: str
     owner_phone: str
+    last_seen: datetime | None = None
+    ended_at: datetime | None = None
+    closest_distance: float | None = None
+    sample_count: int = 1
+    zone_id: int | None = None
 
     """ inherit attributes from the SQLAlchemy model """
     class Config:
@@ -60,3 +71,46 @@ class Owner_data(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class HourlyCount(BaseModel):
+    bucket: datetime
+    count: int
+
+
+class OwnerCount(BaseModel):
+    owner_id: str
+    count: int
+
+
+class DroneCount(BaseModel):
+    drone_id: str
+    count: int
+
+
+""" Violation counts served by GET /nfz/stats, read from the hourly rollups """
+class ViolationStats(BaseModel):
+    since: datetime
+    total: int
+    hourly: List[HourlyCount]
+    top_owners: List[OwnerCount]
+    top_drones: List[DroneCount]
+
+
+class TrackSample(BaseModel):
+    timestamp: datetime
+    x: float
+    y: float
+    z: float
+    speed: float | None
+    heading: float | None
+    vertical_speed: float | None
+
+
+""" Recent trajectory of one drone served by GET /drones/{id}/track, latest speed and heading on top """
+class DroneTrack(BaseModel):
+    drone_id: str
+    samples: List[TrackSample]
+    speed: float | None
+    heading: float | None
+    vertical_speed: float | None
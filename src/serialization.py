@@ -0,0 +1,79 @@
+import logging
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select
+
+from src import model, schemas
+from src.drone_feed import InvalidDroneData, iter_drone_items
+
+"""
+Fast serialization path of the API responses.
+
+Upstream data is validated exactly once and responses are written straight to bytes:
+	- drone snapshots are parsed and validated in one pass from the raw response body
+	  (`TypeAdapter.validate_json`, no intermediate dicts) and encoded by pydantic-core; only
+	  when that fails on some items, the body is re-parsed item by item (see src.drone_feed)
+	  and the malformed items are skipped instead of failing the whole snapshot,
+	- violation rows are selected as plain column tuples (no ORM instances, no identity map)
+	  and encoded with orjson, without a second validation against the response model.
+Handlers return the bytes in a `Response`, so FastAPI does not re-validate or re-encode them;
+the `response_model` of the routes only documents the shape.
+
+The output is identical to the pydantic encoding of `schemas.Drone` / `schemas.Violation`
+(see benchmarks/bench_serialization.py, which checks that before timing).
+
+Functions:
+	decode_drones(body): Validates a drones API response body into `schemas.Drone` items,
+		skipping malformed items.
+	encode_drones(drones): JSON bytes of a list of `schemas.Drone`.
+	violation_columns(): Select of all violation columns, for column tuple rows.
+	encode_violations(rows): JSON array bytes of violation rows.
+	encode_violation_line(row): One NDJSON line of a violation row.
+"""
+
+logger = logging.getLogger(__name__)
+
+_drone = TypeAdapter(schemas.Drone)
+_drones = TypeAdapter(List[schemas.Drone])
+
+VIOLATION_COLUMNS = tuple(column.name for column in model.Violation.__table__.columns)
+
+
+def decode_drones(body: bytes) -> list:
+    try:
+        return _drones.validate_json(body)
+    except ValidationError as e:
+        # not a list at all (or broken JSON): nothing to salvage
+        if not body.lstrip().startswith(b"["):
+            raise
+        error = e
+
+    drones, skipped = [], 0
+    try:
+        for item in iter_drone_items(body):
+            try:
+                drones.append(_drone.validate_python(item))
+            except ValidationError:
+                skipped += 1
+    except InvalidDroneData:
+        raise error
+    logger.error(f"Skipped {skipped} malformed drone record(s) in snapshot")
+    return drones
+
+
+def encode_drones(drones: list) -> bytes:
+    return _drones.dump_json(drones)
+
+
+def violation_columns():
+    return select(*model.Violation.__table__.columns)
+
+
+def encode_violations(rows) -> bytes:
+    return orjson.dumps([dict(zip(VIOLATION_COLUMNS, row)) for row in rows])
+
+
+def encode_violation_line(row) -> bytes:
+    return orjson.dumps(dict(zip(VIOLATION_COLUMNS, row)), option=orjson.OPT_APPEND_NEWLINE)
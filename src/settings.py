@@ -1,4 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Literal
 import os
 
 """
@@ -10,6 +11,54 @@ Classes:
 		- BASE_URL (str): Base URL for the drones APIA.
 		- DATABASE_URL (str): Database connection string.
 		- CELERY_BROKER_URL (str): URL for the Celery message broker (redis).
+		- CELERY_RESULT_BACKEND (str): URL of the Celery result backend, needed by the sharded
+		  check's chord (defaults to CELERY_BROKER_URL).
+		- OWNER_LOOKUP_CONCURRENCY (int): Max concurrent owner lookups per violation tick.
+		- OWNER_LOOKUP_DEADLINE (float): Time budget in seconds for all owner lookups of a tick.
+		- OWNER_CACHE_SIZE (int): Max entries in the in-process owner cache (LRU).
+		- OWNER_CACHE_TTL (float): Seconds an owner record stays cached.
+		- OWNER_CACHE_NEGATIVE_TTL (float): Seconds a 404 owner lookup stays cached.
+		- OWNER_CACHE_REDIS (bool): Share the owner cache across workers through redis.
+		- BULK_COPY_THRESHOLD (int): Batch size from which violations are written with COPY.
+		- EPISODE_BACKEND (str): Where open violation episodes live, "redis" (shared by all workers)
+		  or "memory" (single worker process only).
+		- EPISODE_EXIT_GRACE (float): Seconds a drone must be out of the NFZ before its episode closes.
+		- EPISODE_FLUSH_INTERVAL (float): Min seconds between in-place updates of an open episode's row.
+		- DETECTION_SHARDS (int): Owner shards the violation check fans out to across Celery
+		  workers (1 = single task; needs EPISODE_BACKEND=redis).
+		- DRONES_CACHE_MAX_AGE (float): Seconds a drone snapshot is served as fresh by GET /drones.
+		- DRONES_CACHE_STALE_WHILE_REVALIDATE (float): Extra seconds a stale snapshot may be served
+		  while it is refreshed in the background.
+		- LIVE_FEED_INTERVAL (float): Seconds between drone frames of the live feed.
+		- LIVE_FEED_MAX_PENDING (int): Drone frames, and separately violations frames, queued per live
+		  feed client before it is resynced (drones) or told to refetch /nfz (violations).
+		- INGEST_TICK_INTERVAL (float): Seconds between ticks of the continuous ingestion service.
+		- INGEST_IN_API (bool): Run the ingestion service inside the FastAPI lifespan.
+		- METRICS_MODE (str): "full" (histogram buckets), "lite" (sum/count only) or "off".
+		- METRICS_PUSH_INTERVAL (float): Min seconds between worker metric pushes to redis.
+		- VIOLATION_RETENTION_DAYS (int): Days of violations kept in daily partitions (PostgreSQL).
+		- VIOLATION_RETENTION_ACTION (str): What happens to expired partitions, "drop" or "detach"
+		  (kept as standalone archive tables).
+		- VIOLATION_PARTITIONS_AHEAD (int): Daily partitions created ahead of today.
+		- TRACK_SAMPLES (int): Positions kept per drone by the trajectory store.
+		- TRACK_MEMORY_MB (float): Memory budget of the trajectory store, sets how many drones fit.
+		- TRACK_IDLE_TTL (float): Seconds after which a drone that is no longer reported is evicted.
+		- TRACK_SAMPLE_INTERVAL (float): Seconds between drone snapshots polled by every API worker
+		  for the tracks (default 0 = no polling, only record the snapshots served by GET /drones
+		  and the live feed: without clients the tracks stay empty).
+		- ZONE_RELOAD_INTERVAL (float): Seconds between reloads of the no-fly zones table by the workers.
+		- ZONE_GRID_CELL (float): Cell size of the zones' spatial index grid, in meters.
+		- NFZ_CACHE (str): Cache of GET /nfz, "sliding" (rows aging out of the 24 h window are
+		  trimmed from the cached bytes), "version" (served as built) or "off".
+		- NFZ_CACHE_TTL (float): Max age in seconds of a cached GET /nfz response.
+		- DRONE_CHUNK_SIZE (int): Drones parsed and detected at a time while a snapshot streams in.
+		- UPSTREAM_TIMEOUT (float): Timeout in seconds of one attempt of an external API call.
+		- UPSTREAM_RETRIES (int): Max retries of a failed external API call.
+		- UPSTREAM_RETRY_BUDGET (float): Retries and hedges allowed per call, per endpoint (token bucket).
+		- UPSTREAM_HEDGE (bool): Send a hedged second GET when the first is slower than the recent p95.
+		- UPSTREAM_HEDGE_MIN_DELAY (float): Min seconds before a hedged request is sent.
+		- UPSTREAM_BREAKER_FAILURES (int): Consecutive failures that open an endpoint's circuit breaker.
+		- UPSTREAM_BREAKER_COOLDOWN (float): Seconds an open circuit fails fast before a probe request.
 Exceptions:
 	Raises a RuntimeError if the .env file is missing or if there is an error loading environment variables.
 """
@@ -20,6 +69,58 @@ class Settings(BaseSettings):
     BASE_URL: str
     DATABASE_URL: str
     CELERY_BROKER_URL: str
+    CELERY_RESULT_BACKEND: str | None = None
+
+    OWNER_LOOKUP_CONCURRENCY: int = 20
+    OWNER_LOOKUP_DEADLINE: float = 5.0
+
+    OWNER_CACHE_SIZE: int = 10_000
+    OWNER_CACHE_TTL: float = 3600.0
+    OWNER_CACHE_NEGATIVE_TTL: float = 300.0
+    OWNER_CACHE_REDIS: bool = True
+
+    BULK_COPY_THRESHOLD: int = 500
+    EPISODE_BACKEND: Literal["redis", "memory"] = "redis"
+    EPISODE_EXIT_GRACE: float = 30.0
+    EPISODE_FLUSH_INTERVAL: float = 60.0
+    DETECTION_SHARDS: int = 1
+
+    DRONES_CACHE_MAX_AGE: float = 2.0
+    DRONES_CACHE_STALE_WHILE_REVALIDATE: float = 10.0
+
+    LIVE_FEED_INTERVAL: float = 1.0
+    LIVE_FEED_MAX_PENDING: int = 16
+
+    INGEST_TICK_INTERVAL: float = 0.25
+    INGEST_IN_API: bool = False
+
+    METRICS_MODE: Literal["full", "lite", "off"] = "full"
+    METRICS_PUSH_INTERVAL: float = 5.0
+
+    VIOLATION_RETENTION_DAYS: int = 30
+    VIOLATION_RETENTION_ACTION: Literal["drop", "detach"] = "drop"
+    VIOLATION_PARTITIONS_AHEAD: int = 3
+
+    TRACK_SAMPLES: int = 120
+    TRACK_MEMORY_MB: float = 32.0
+    TRACK_IDLE_TTL: float = 60.0
+    TRACK_SAMPLE_INTERVAL: float = 0.0
+
+    ZONE_RELOAD_INTERVAL: float = 10.0
+    ZONE_GRID_CELL: float = 1000.0
+
+    NFZ_CACHE: Literal["sliding", "version", "off"] = "sliding"
+    NFZ_CACHE_TTL: float = 60.0
+
+    DRONE_CHUNK_SIZE: int = 5000
+
+    UPSTREAM_TIMEOUT: float = 3.0
+    UPSTREAM_RETRIES: int = 2
+    UPSTREAM_RETRY_BUDGET: float = 0.1
+    UPSTREAM_HEDGE: bool = True
+    UPSTREAM_HEDGE_MIN_DELAY: float = 0.05
+    UPSTREAM_BREAKER_FAILURES: int = 5
+    UPSTREAM_BREAKER_COOLDOWN: float = 10.0
 
 try:
     settings = Settings()
@@ -0,0 +1,33 @@
+"""
+Owner-hash sharding of drone snapshots, for the sharded violation check (see src.tasks).
+
+A snapshot is split into `DETECTION_SHARDS` slices by a stable hash of `owner_id`, so all
+drones of one owner, and therefore their open episodes and owner lookups, always land in the
+same shard. The hash is a fixed multiplicative mix (not Python's `hash`), so every worker
+process maps an owner to the same shard.
+
+Functions:
+	shard_of(owner_id, shards): Shard index of an owner.
+	split_by_owner(drones, shards): Splits a snapshot's drone dicts into `shards` lists.
+"""
+
+_MIX = 0x9E3779B97F4A7C15
+_MASK = (1 << 64) - 1
+
+
+def shard_of(owner_id, shards: int) -> int:
+    if shards <= 1:
+        return 0
+    return ((int(owner_id) * _MIX) & _MASK) % shards
+
+
+def split_by_owner(drones: list, shards: int) -> list:
+    slices = [[] for _ in range(shards)]
+    for drone in drones:
+        try:
+            index = shard_of(drone['owner_id'], shards)
+        except (KeyError, TypeError, ValueError):
+            # malformed items are skipped (and logged) by the detection of shard 0
+            index = 0
+        slices[index].append(drone)
+    return slices
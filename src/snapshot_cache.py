@@ -0,0 +1,90 @@
+import asyncio
+import hashlib
+import logging
+import time
+
+"""
+In-memory snapshot cache with single-flight request coalescing, used behind GET /drones.
+
+Instead of one upstream call per API request, the latest snapshot is kept in memory:
+	- fresh (younger than `max_age`): served straight from memory,
+	- stale (younger than `max_age + stale_while_revalidate`): served from memory while one
+	  background refresh runs,
+	- expired or missing: callers wait for a refresh.
+Concurrent callers never start more than one upstream fetch, they all share the in-flight one.
+
+Every snapshot is serialized once, and carries an ETag derived from its body so unchanged
+snapshots can be answered with 304 Not Modified without re-serializing anything.
+
+Classes:
+	Snapshot: One loaded snapshot (items, serialized body, etag, load time).
+	SnapshotCache: The cache itself, built from an async `loader` and an `encode` function.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    __slots__ = ("items", "body", "etag", "fetched_at")
+
+    def __init__(self, items, body: bytes, fetched_at: float):
+        self.items = items
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.fetched_at = fetched_at
+
+    def matches(self, if_none_match: str | None) -> bool:
+        """ True if an If-None-Match header value matches this snapshot's ETag """
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags
+
+
+class SnapshotCache:
+    def __init__(self, loader, encode, max_age: float, stale_while_revalidate: float = 0.0):
+        self.loader = loader
+        self.encode = encode
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+        self.counters = {"fresh_hits": 0, "stale_hits": 0, "loads": 0, "coalesced": 0}
+        self._snapshot = None
+        self._inflight = None
+
+    async def get(self) -> Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            age = time.monotonic() - snapshot.fetched_at
+            if age < self.max_age:
+                self.counters["fresh_hits"] += 1
+                return snapshot
+            if age < self.max_age + self.stale_while_revalidate:
+                self.counters["stale_hits"] += 1
+                self._start_refresh()
+                return snapshot
+
+        # shielded, so one client going away does not cancel the fetch other callers wait for
+        return await asyncio.shield(self._start_refresh())
+
+    def _start_refresh(self) -> asyncio.Task:
+        if self._inflight is not None and not self._inflight.done():
+            self.counters["coalesced"] += 1
+            return self._inflight
+        self._inflight = asyncio.create_task(self._load())
+        self._inflight.add_done_callback(self._log_failure)
+        return self._inflight
+
+    async def _load(self) -> Snapshot:
+        self.counters["loads"] += 1
+        items = await self.loader()
+        snapshot = Snapshot(items, self.encode(items), time.monotonic())
+        self._snapshot = snapshot
+        return snapshot
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Snapshot refresh failed: {task.exception()!r}")
+
+    def invalidate(self):
+        self._snapshot = None
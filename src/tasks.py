@@ -1,46 +1,54 @@
-import asyncio
 import httpx
-import math
-from datetime import datetime, timedelta
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import time
+from datetime import datetime
 import logging
-import src.schemas as schemas
-import src.errors as Errors
-from pydantic import ValidationError
+
+from celery import chord
 
 from src.celery_app import celery
-from src.model import Violation
+from src import metrics, partitions, worker_runtime
+from src.pipeline import InvalidDroneData, fetch_drones, process_snapshot, run_tick
 from src.settings import settings
+from src.sharding import split_by_owner
+from src.upstream import CircuitOpenError
 
 
 """
-This module defines Celery tasks and helper functions for detecting and recording drone violations
-of a no-fly zone (NFZ) in a FastAPI application. It periodically fetches drone positions from an
-external API, checks if any drones have entered the NFZ, and records violations in the database.
-To prevent duplicate entries, recent violators are cached and only re-logged after a cooldown period.
+This module defines the Celery task that detects and records drone violations of a no-fly zone (NFZ)
+in a FastAPI application. It periodically fetches drone positions from an external API, checks if
+any drones have entered the NFZ, and records violations in the database.
+A drone's stay inside the NFZ is recorded as one violation episode, opened on entry, updated
+in place while it stays and closed when it leaves (see src.episodes).
+The stages themselves live in src.pipeline, which is shared with the continuous ingestion service
+(src.ingest).
 Functions:
-	save_violations_to_db(violations_data: list):
-		Asynchronously saves a list of violation records to the database using SQLAlchemy async engine.
 	check_for_violations():
-		Celery task that:
+		Celery task that runs one pipeline tick on the worker process's long-lived event loop,
+		resilient http client and database engine (see src.worker_runtime, src.upstream):
 			- Fetches current drone positions from an external API.
-			- Checks if any drones are within the NFZ radius.
-			- Fetches owner information for violating drones.
-			- Records new violations in the database, avoiding duplicates using a cooldown cache.
-			- Handles and logs errors related to API requests and database operations.
-Globals:
-	RECENT_VIOLATORS (dict): Cache mapping drone owner IDs to the timestamp of their last violation.
-	VIOLATION_COOLDOWN (timedelta): Time period before a violator can be recorded again.
-	NFZ_RADIUS (float): Radius of the no-fly zone in meters.
+			- Checks if any drones are within a no-fly zone (see src.zones).
+			- Diffs them against the open violation episodes, only changes touch the database.
+			- Fetches owner information for all entering drones concurrently (see src.owners).
+			- Records new episodes and updates changed ones in the database.
+			- Handles and logs errors related to API requests and database operations, and
+			  skips the tick right away while the drones API's circuit breaker is open.
+		With DETECTION_SHARDS > 1 it only fetches the snapshot, splits it by owner hash (see
+		src.sharding) and fans it out as a chord of detect_shard tasks, so the work spreads
+		over all Celery workers.
+	detect_shard(drones, index, shards, observed_wall):
+		Celery task that detects, enriches and stores the violations of one owner shard.
+		Every shard only sees the drones and open episodes of its owners, so the union of the
+		shards records exactly what the single task records.
+	aggregate_shards(results, observed_wall):
+		Chord callback that sums up the shard counts and logs them like the single task.
+	maintain_partitions():
+		Celery task that creates the upcoming daily partitions of the violations table and
+		drops or archives the expired ones (see src.partitions).
 Logging:
 	Logs all major actions, errors, and warnings to both a file and the console.
 """
 
 
-RECENT_VIOLATORS = {} # -> drone_id + timestamp
-VIOLATION_COOLDOWN = timedelta(seconds=120)
-NFZ_RADIUS = 1000.0
-
 # Configure logging for Celery tasks
 logging.basicConfig(
     level=logging.INFO,
@@ -52,24 +60,36 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-async def save_violations_to_db(violations_data: list):
-    """ Creates DB connection, saves violations, and closes it """
-    try:
-        engine = create_async_engine(settings.DATABASE_URL)
-        SessionLocal = async_sessionmaker(bind=engine)
+metrics.register_pool_gauges("worker", worker_runtime.get_engine, worker_runtime.get_http_client)
 
-        async with SessionLocal() as db:
-            for v_data in violations_data:
-                db_violation = Violation(**v_data)
-                db.add(db_violation)
-            await db.commit()
 
-        logger.info(f"Successfully stored {len(violations_data)} new violation(s) in the database.")
-        await engine.dispose() ## <<-- close the engine connection
-    except Exception as e:
-        logger.error(f"Database error: {e}")
-        logger.debug(f"Database URL: {settings.DATABASE_URL}")
-        raise
+def sharded() -> bool:
+    if settings.DETECTION_SHARDS <= 1:
+        return False
+    if settings.EPISODE_BACKEND != "redis":
+        # shards run in different processes, they must share the open episodes
+        logger.warning("DETECTION_SHARDS needs EPISODE_BACKEND=redis, running the single task")
+        return False
+    return True
+
+
+async def _fetch_snapshot() -> tuple[list, float]:
+    with metrics.stage("fetch") as stage:
+        drones, observed_at = await fetch_drones(worker_runtime.get_upstream())
+        stage.items = len(drones)
+    return drones, observed_at
+
+
+def dispatch_shards() -> str:
+    drones, observed_at = worker_runtime.run(_fetch_snapshot())
+    # shards run in other processes, hand them the receive time as wall clock time
+    observed_wall = time.time() - (time.monotonic() - observed_at)
+    shards = settings.DETECTION_SHARDS
+    slices = split_by_owner(drones, shards)
+    chord(detect_shard.s(drones_slice, index, shards, observed_wall)
+          for index, drones_slice in enumerate(slices))(aggregate_shards.s(observed_wall))
+    logger.info(f"Dispatched {len(drones)} drones to {shards} shards")
+    return f"Dispatched {len(drones)} drones to {shards} shards."
 
 
 @celery.task
@@ -77,83 +97,23 @@ def check_for_violations():
     now = datetime.now()
     logger.info(f"Starting violation check at {now}")
 
-    # Clean up old violators from the cache to allow re-logging after cooldown
-    for drone_id, timestamp in list(RECENT_VIOLATORS.items()):
-        if now > timestamp + VIOLATION_COOLDOWN:
-            del RECENT_VIOLATORS[drone_id]
-
-
     try:
-        # Fetch all current drone positions from the external API
-        with httpx.Client(timeout=10.0) as client:
-            logger.info("Fetching drone data from external API")
-            drones_response = client.get(settings.BASE_URL + "drones")
-            drones_response.raise_for_status()
-            drones = drones_response.json()
-            
-        # Validate data format
-        if not isinstance(drones, list):
-            logger.error("Invalid drone data format: expected list")
-            return "Error: Invalid data format from drone API"
-            
-        logger.info(f"Successfully fetched {len(drones)} drones")
-
-        new_violators_to_save = []
-
-        # main loop for checking each drone for NFZ violations
-        for drone in drones:
-            try:
-                if drone['owner_id'] in RECENT_VIOLATORS:
-                    continue 
-                
-                # Using Pythagorean theorem to calculate distance from origin (0,0)
-                x, y = drone['x'], drone['y']
-                distance = math.sqrt(x**2 + y**2)
-
-                if distance <= NFZ_RADIUS:
-                    time_now = datetime.now()
-                    logger.warning(f"Violation detected! Drone ID: {drone['owner_id']}, Distance: {distance:.2f}")
-                    with httpx.Client(timeout=10.0) as client:
-                        owner_data = client.get(settings.BASE_URL + "users/" + str(drone['owner_id']))
-                    
-                    if owner_data.status_code == 200:
-                        owner_info = owner_data.json()
-                        if not isinstance(owner_info, dict):
-                            logger.error("Invalid owner data format: expected dict")
-                            return "Error: Invalid data format from users API"
-
-                        # Prepare the violation record
-                        new_violation = {
-                            "id": str(drone['owner_id']),
-                            "drone_id": drone['id'],
-                            "timestamp": time_now,
-                            "position_x": x,
-                            "position_y": y,
-                            "position_z": drone['z'],
-                            "owner_first_name": owner_info['first_name'],
-                            "owner_last_name": owner_info['last_name'],
-                            "owner_ssn": owner_info['social_security_number'],
-                            "owner_phone": owner_info['phone_number']
-                        }
-                        new_violators_to_save.append(new_violation)
-                        # Add the new violator to our cache
-                        RECENT_VIOLATORS[drone['owner_id']] = now
-                        logger.info(f"Violation recorded for drone {drone['owner_id']}")
-                    else:
-                        logger.warning(f"Could not fetch owner info for drone {drone['owner_id']}: HTTP {owner_data.status_code}")
-                        
-
-            except (ValueError, TypeError, KeyError) as e:
-                logger.error(f"Data validation error for drone {drone.get('owner_id', 'unknown')}: {e}")
-                continue
-
-        if new_violators_to_save:
-            asyncio.run(save_violations_to_db(new_violators_to_save))
-            logger.info(f"Saved {len(new_violators_to_save)} violations to database")
+        if sharded():
+            return dispatch_shards()
+        result = worker_runtime.run(run_tick(worker_runtime.get_upstream()))
+
+        if result.recorded:
+            logger.info(f"Saved {result.recorded} violations to database, detection lag {result.detection_lag * 1000:.0f} ms")
         else:
             logger.info("No new violations detected")
-
-
+        if result.closed:
+            logger.info(f"Closed {result.closed} violation episode(s)")
+
+    except InvalidDroneData:
+        return "Error: Invalid data format from drone API"
+    except CircuitOpenError as e:
+        logger.error(f"Skipping violation check: {e}")
+        return "Error: External API circuit open"
     except httpx.TimeoutException:
         logger.error("Timeout while fetching data from external API")
         return "Error: API timeout"
@@ -168,3 +128,56 @@ def check_for_violations():
         return f"Error: {str(e)}"
 
     return "Violation check complete."
+
+
+async def _process_shard(drones: list, observed_at: float, shard: tuple[int, int]):
+    try:
+        return await process_snapshot(drones, observed_at, shard)
+    finally:
+        await metrics.push_worker_metrics()
+
+
+@celery.task(ignore_result=False)
+def detect_shard(drones: list, index: int, shards: int, observed_wall: float) -> dict:
+    observed_at = time.monotonic() - (time.time() - observed_wall)
+    try:
+        result = worker_runtime.run(_process_shard(drones, observed_at, (index, shards)))
+    except Exception as e:
+        # report instead of raising, a failed header task would fail the whole chord
+        logger.error(f"Violation check of shard {index}/{shards} failed: {e}")
+        return {"shard": index, "error": str(e)}
+    return {"shard": index, "drones": result.drones, "violators": result.violators,
+            "recorded": result.recorded, "closed": result.closed, "detection_lag": result.detection_lag}
+
+
+@celery.task
+def aggregate_shards(results: list, observed_wall: float) -> str:
+    errors = [r for r in results if "error" in r]
+    totals = {key: sum(r.get(key, 0) for r in results) for key in ("drones", "violators", "recorded", "closed")}
+    lags = [r["detection_lag"] for r in results if r.get("detection_lag") is not None]
+    if totals["recorded"]:
+        logger.info(f"Saved {totals['recorded']} violations to database from {len(results)} shards, "
+                    f"detection lag {max(lags) * 1000:.0f} ms")
+    else:
+        logger.info(f"No new violations detected in {len(results)} shards")
+    if totals["closed"]:
+        logger.info(f"Closed {totals['closed']} violation episode(s)")
+    logger.info(f"Sharded violation check took {(time.time() - observed_wall) * 1000:.0f} ms end to end")
+    if errors:
+        return f"Error: {len(errors)} of {len(results)} shard(s) failed"
+    return "Violation check complete."
+
+
+async def _maintain_partitions() -> dict:
+    async with worker_runtime.get_engine().begin() as conn:
+        return await partitions.maintain(conn)
+
+
+@celery.task
+def maintain_partitions():
+    try:
+        result = worker_runtime.run(_maintain_partitions())
+    except Exception as e:
+        logger.error(f"Partition maintenance failed: {e}")
+        return f"Error: {str(e)}"
+    return f"Partitions created: {len(result['created'])}, expired: {len(result['expired'])}"
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import math
+import time
+
+import numpy as np
+
+"""
+Compact in-memory trajectory store, behind GET /drones/{id}/track.
+
+Every drone snapshot loaded by the API (see `load_drones` in src.main) is appended to a
+per-drone ring buffer, so recent trajectories can be served without a database round-trip.
+All buffers live in preallocated fixed-width NumPy arrays, one row per tracked drone:
+	x, y, z:    float32   (max_drones, samples)
+	timestamp:  float64   (max_drones, samples), unix time of the snapshot
+i.e. 20 bytes per sample. The number of rows follows from the memory budget
+(`TRACK_MEMORY_MB`) and the samples kept per drone (`TRACK_SAMPLES`). A snapshot is written
+with a handful of vectorized assignments; only the drone id -> row lookup is per drone.
+
+Eviction:
+	- drones not reported for `TRACK_IDLE_TTL` seconds free their row,
+	- when all rows are taken, the drone reported least recently gives up its row.
+
+Speed and heading are derived from consecutive samples: speed in units per second on the
+x/y plane, heading in degrees clockwise from +y (0 = +y, 90 = +x), vertical speed from z.
+
+Classes:
+	TrackStore: The ring buffers, with record(...) and track(drone_id, limit).
+Functions:
+	run_track_sampler(load_snapshot, interval): Keeps loading snapshots so tracks fill up
+		even while nobody polls GET /drones.
+"""
+
+logger = logging.getLogger(__name__)
+
+BYTES_PER_SAMPLE = 3 * 4 + 8
+
+
+class TrackStore:
+    def __init__(self, samples: int, memory_mb: float, idle_ttl: float):
+        self.samples = samples
+        self.max_drones = max(1, int(memory_mb * 1024 * 1024 // (samples * BYTES_PER_SAMPLE)))
+        self.idle_ttl = idle_ttl
+
+        shape = (self.max_drones, samples)
+        self.x = np.zeros(shape, dtype=np.float32)
+        self.y = np.zeros(shape, dtype=np.float32)
+        self.z = np.zeros(shape, dtype=np.float32)
+        self.timestamp = np.zeros(shape, dtype=np.float64)
+        self.heads = np.zeros(self.max_drones, dtype=np.int32)   # next write position per row
+        self.counts = np.zeros(self.max_drones, dtype=np.int32)  # valid samples per row
+        self.last_seen = np.zeros(self.max_drones, dtype=np.float64)
+        self.occupied = np.zeros(self.max_drones, dtype=bool)
+
+        self.slots = {}                                          # drone id -> row
+        self.owners = [None] * self.max_drones                   # row -> drone id
+        self.free = list(range(self.max_drones - 1, -1, -1))
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    @property
+    def nbytes(self) -> int:
+        return self.x.nbytes + self.y.nbytes + self.z.nbytes + self.timestamp.nbytes
+
+    def _release(self, rows):
+        for row in rows:
+            del self.slots[self.owners[row]]
+            self.owners[row] = None
+            self.free.append(int(row))
+        self.occupied[rows] = False
+        self.counts[rows] = 0
+        self.heads[rows] = 0
+
+    def _expire(self, now: float):
+        idle = np.nonzero(self.occupied & (self.last_seen < now - self.idle_ttl))[0]
+        if len(idle):
+            self._release(idle)
+            self.evictions += len(idle)
+
+    def _make_room(self, drone_ids: list):
+        """ Evicts the least recently seen drones that are not in this snapshot, if rows run out """
+        new_ids = [drone_id for drone_id in dict.fromkeys(drone_ids) if drone_id not in self.slots]
+        shortage = len(new_ids) - len(self.free)
+        if shortage <= 0:
+            return
+        candidates = self.occupied.copy()
+        candidates[[self.slots[drone_id] for drone_id in drone_ids if drone_id in self.slots]] = False
+        candidates = np.nonzero(candidates)[0]
+        victims = candidates[np.argsort(self.last_seen[candidates], kind="stable")[:shortage]]
+        self._release(victims)
+        self.evictions += len(victims)
+
+    def _row(self, drone_id: str) -> int:
+        row = self.slots.get(drone_id)
+        if row is None:
+            row = self.free.pop()
+            self.slots[drone_id] = row
+            self.owners[row] = drone_id
+            self.occupied[row] = True
+        return row
+
+    def record(self, drone_ids: list, x, y, z, timestamp: float | None = None):
+        """ Appends one snapshot (drone ids plus their x/y/z columns) to the ring buffers """
+        now = time.time() if timestamp is None else timestamp
+        self._expire(now)
+
+        # a snapshot larger than the store only keeps the drones that fit
+        count = min(len(drone_ids), self.max_drones)
+        drone_ids = drone_ids[:count]
+        self._make_room(drone_ids)
+        rows = np.fromiter((self._row(drone_id) for drone_id in drone_ids), dtype=np.int64, count=count)
+
+        positions = self.heads[rows]
+        self.x[rows, positions] = np.asarray(x[:count], dtype=np.float32)
+        self.y[rows, positions] = np.asarray(y[:count], dtype=np.float32)
+        self.z[rows, positions] = np.asarray(z[:count], dtype=np.float32)
+        self.timestamp[rows, positions] = now
+        self.heads[rows] = (positions + 1) % self.samples
+        self.counts[rows] = np.minimum(self.counts[rows] + 1, self.samples)
+        self.last_seen[rows] = now
+
+    def track(self, drone_id: str, limit: int | None = None) -> dict | None:
+        """ The last `limit` samples of a drone, oldest first, with derived speed and heading """
+        row = self.slots.get(drone_id)
+        if row is None:
+            return None
+        available = int(self.counts[row])
+        count = available if limit is None else min(available, limit)
+        # one sample before the window, if kept, so the oldest returned sample has a speed too
+        extra = 1 if available > count else 0
+        order = (int(self.heads[row]) - count - extra + np.arange(count + extra)) % self.samples
+
+        t = self.timestamp[row, order]
+        x = self.x[row, order].astype(np.float64)
+        y = self.y[row, order].astype(np.float64)
+        z = self.z[row, order].astype(np.float64)
+
+        speed = np.full(count + extra, np.nan)
+        heading = np.full(count + extra, np.nan)
+        vertical_speed = np.full(count + extra, np.nan)
+        if count + extra > 1:
+            dt = np.diff(t)
+            dx, dy, dz = np.diff(x), np.diff(y), np.diff(z)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                speed[1:] = np.where(dt > 0, np.hypot(dx, dy) / dt, np.nan)
+                vertical_speed[1:] = np.where(dt > 0, dz / dt, np.nan)
+            heading[1:] = np.where((dx != 0) | (dy != 0), np.degrees(np.arctan2(dx, dy)) % 360, np.nan)
+
+        finite = lambda v: None if math.isnan(v) else float(v)
+        samples = [
+            {"timestamp": float(t[i]), "x": float(x[i]), "y": float(y[i]), "z": float(z[i]),
+             "speed": finite(speed[i]), "heading": finite(heading[i]), "vertical_speed": finite(vertical_speed[i])}
+            for i in range(extra, count + extra)
+        ]
+        latest = samples[-1] if samples else {}
+        return {
+            "drone_id": drone_id,
+            "samples": samples,
+            "speed": latest.get("speed"),
+            "heading": latest.get("heading"),
+            "vertical_speed": latest.get("vertical_speed"),
+        }
+
+
+async def run_track_sampler(load_snapshot, interval: float):
+    """ Loads a drone snapshot every `interval` seconds; loading it records it in the track store """
+    while True:
+        try:
+            await load_snapshot()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Track sampler could not load drones: {e!r}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,282 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import httpx
+
+from src import metrics
+from src.settings import settings
+
+"""
+Resilient client layer for the external drones / users API, shared by the API (src.main) and
+the violation workers (src.pipeline, src.owners).
+
+Every GET goes through an UpstreamClient, which keeps per-endpoint state ("drones", "users",
+the first path segment) so one slow dependency cannot eat the time budget of the others:
+	- timeout:         every attempt is bounded by `UPSTREAM_TIMEOUT` seconds.
+	- circuit breaker: after `UPSTREAM_BREAKER_FAILURES` consecutive failures (timeouts, network
+	                   errors, 5xx) the endpoint fails fast with CircuitOpenError for
+	                   `UPSTREAM_BREAKER_COOLDOWN` seconds, then one probe request decides
+	                   whether it closes again.
+	- retries:         failed attempts are retried up to `UPSTREAM_RETRIES` times with jittered
+	                   backoff, but only while the endpoint's retry budget allows it: every call
+	                   deposits `UPSTREAM_RETRY_BUDGET` tokens and every retry or hedge spends
+	                   one, so retries stay a bounded fraction of the traffic and cannot
+	                   multiply the load on an upstream that is already struggling.
+	- hedging:         when `UPSTREAM_HEDGE` is on and an attempt has not answered after the
+	                   endpoint's recent p95 latency (at least `UPSTREAM_HEDGE_MIN_DELAY`), a
+	                   second identical request is sent and the first answer wins, cutting the
+	                   tail latency of idempotent GETs. Hedges spend the retry budget too.
+Latencies, retries, hedges and breaker state are recorded in src.metrics per endpoint.
+
+Classes:
+	CircuitOpenError: Raised instead of calling an endpoint whose circuit is open.
+	LatencyWindow: Recent successful latencies of an endpoint, for the hedging delay.
+	CircuitBreaker: Closed / open / half-open state of an endpoint.
+	RetryBudget: Token bucket bounding retries and hedges.
+	UpstreamClient: Wraps a pooled httpx.AsyncClient, with get(path) and stream(path).
+"""
+
+logger = logging.getLogger(__name__)
+
+# answers worth another attempt; any 5xx counts as a failure of the endpoint, anything
+# below (including 404) is a valid answer
+RETRYABLE_STATUS = frozenset({502, 503, 504})
+
+
+class CircuitOpenError(httpx.RequestError):
+    pass
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 256, min_samples: int = 20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """ The q-quantile of the window, None until enough samples were seen """
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failures: int, cooldown: float):
+        self.name = name
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self._set(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            # exactly one probe at a time decides whether the endpoint recovered
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+        return self.state == self.CLOSED
+
+    def success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._set(self.CLOSED)
+
+    def failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            self._set(self.OPEN)
+
+    def abandon(self):
+        """ An attempt was cancelled before it answered: a probe counts as failed, anything else is unknown """
+        if self._probing:
+            self.failure()
+
+    def _set(self, state: str):
+        self.state = state
+        metrics.upstream_circuit_open.set(1 if state == self.OPEN else 0, endpoint=self.name)
+        if state == self.OPEN:
+            logger.warning(f"Circuit for upstream '{self.name}' opened after {self.failures} failure(s), "
+                           f"failing fast for {self.cooldown}s")
+        else:
+            logger.info(f"Circuit for upstream '{self.name}' is {state}")
+
+
+class RetryBudget:
+    def __init__(self, ratio: float, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def deposit(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+class _Endpoint:
+    __slots__ = ("name", "breaker", "budget", "latency")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(name, settings.UPSTREAM_BREAKER_FAILURES, settings.UPSTREAM_BREAKER_COOLDOWN)
+        self.budget = RetryBudget(settings.UPSTREAM_RETRY_BUDGET)
+        self.latency = LatencyWindow()
+
+
+class UpstreamClient:
+    def __init__(self, client: httpx.AsyncClient, timeout: float | None = None, retries: int | None = None,
+                 hedge: bool | None = None):
+        self.client = client
+        self.timeout = settings.UPSTREAM_TIMEOUT if timeout is None else timeout
+        self.retries = settings.UPSTREAM_RETRIES if retries is None else retries
+        self.hedge = settings.UPSTREAM_HEDGE if hedge is None else hedge
+        self.endpoints = {}
+
+    def _endpoint(self, path: str) -> _Endpoint:
+        name = path.strip("/").split("/", 1)[0] or "root"
+        endpoint = self.endpoints.get(name)
+        if endpoint is None:
+            endpoint = self.endpoints[name] = _Endpoint(name)
+        return endpoint
+
+    async def get(self, path: str, hedge: bool | None = None) -> httpx.Response:
+        """
+        GETs `path` with timeout, retries, hedging and the endpoint's circuit breaker.
+        Returns the last response (also a 5xx one: only 502 / 503 / 504 are retried), raises the
+        last httpx error, or CircuitOpenError without calling an endpoint that is failing.
+        """
+        endpoint = self._endpoint(path)
+        hedge = self.hedge if hedge is None else hedge
+        return await self._with_retries(endpoint, lambda: self._attempt(endpoint, path, hedge))
+
+    @asynccontextmanager
+    async def stream(self, path: str):
+        """
+        Streams a GET of `path`, for bodies too large to read at once:
+            async with upstream.stream("drones") as response:
+                async for chunk in response.aiter_bytes(): ...
+        Retries and the circuit breaker apply until the response headers arrived, the
+        timeout to every read; the body itself is never retried or hedged.
+        """
+        endpoint = self._endpoint(path)
+        started = time.perf_counter()
+
+        async def send():
+            request = self.client.build_request("GET", path, timeout=self.timeout)
+            return await self.client.send(request, stream=True)
+
+        response = await self._with_retries(endpoint, send, discard=True)
+        outcome = str(response.status_code)
+        try:
+            yield response
+        except httpx.TransportError as e:
+            # the body broke off: a failure of the endpoint like any other
+            outcome = "timeout" if isinstance(e, httpx.TimeoutException) else "error"
+            endpoint.breaker.failure()
+            raise
+        finally:
+            await response.aclose()
+            metrics.upstream_duration.observe(time.perf_counter() - started, endpoint=endpoint.name, outcome=outcome)
+
+    async def _with_retries(self, endpoint: _Endpoint, attempt_once, discard: bool = False) -> httpx.Response:
+        """ Runs attempts until one answers, retries are used up or the circuit opens """
+        endpoint.budget.deposit()
+        attempt = 0
+        while True:
+            if not endpoint.breaker.allow():
+                metrics.upstream_events.inc(endpoint=endpoint.name, event="rejected")
+                raise CircuitOpenError(f"Circuit open for upstream endpoint '{endpoint.name}'")
+
+            error = response = None
+            try:
+                response = await attempt_once()
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                # cancelled (e.g. by a caller's deadline): never leave the half-open probe taken
+                endpoint.breaker.abandon()
+                raise
+            if error is None and response.status_code < 500:
+                endpoint.breaker.success()
+                return response
+            endpoint.breaker.failure()
+
+            if error is None and response.status_code not in RETRYABLE_STATUS:
+                return response
+            if attempt >= self.retries or endpoint.breaker.state == CircuitBreaker.OPEN or not endpoint.budget.withdraw():
+                if error is not None:
+                    raise error
+                return response
+            if discard and response is not None:
+                # a streamed response that is not handed out must be closed
+                await response.aclose()
+            attempt += 1
+            metrics.upstream_events.inc(endpoint=endpoint.name, event="retry")
+            await asyncio.sleep(random.uniform(0, 0.05 * 2 ** attempt))
+
+    async def _send(self, endpoint: _Endpoint, path: str) -> httpx.Response:
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await self.client.get(path, timeout=self.timeout)
+            outcome = str(response.status_code)
+            if response.status_code < 500:
+                endpoint.latency.add(time.perf_counter() - started)
+            return response
+        except httpx.TimeoutException:
+            outcome = "timeout"
+            raise
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            metrics.upstream_duration.observe(time.perf_counter() - started, endpoint=endpoint.name, outcome=outcome)
+
+    async def _attempt(self, endpoint: _Endpoint, path: str, hedge: bool) -> httpx.Response:
+        """ One attempt, hedged with a second request once it is slower than the recent p95 """
+        p95 = endpoint.latency.quantile(0.95) if hedge else None
+        if p95 is None:
+            return await self._send(endpoint, path)
+
+        first = asyncio.create_task(self._send(endpoint, path))
+        pending = {first}
+        error = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=max(p95, settings.UPSTREAM_HEDGE_MIN_DELAY))
+            if done or not endpoint.budget.withdraw():
+                return await first
+
+            metrics.upstream_events.inc(endpoint=endpoint.name, event="hedge")
+            pending.add(asyncio.create_task(self._send(endpoint, path)))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,126 @@
+import asyncio
+import httpx
+import logging
+import os
+
+from celery.signals import worker_process_shutdown
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from src.settings import settings
+from src.upstream import UpstreamClient
+
+"""
+Long-lived async runtime for Celery worker processes.
+
+Celery task bodies are synchronous, but the violation pipeline (owner lookups, database writes)
+is async. Instead of `asyncio.run()` plus a fresh engine and connection pool on every tick, each
+worker process keeps one event loop and one async engine for its whole lifetime, so pooled
+connections (database, redis, http) are reused from tick to tick.
+The engine and http client are also usable from any other long-running async process (e.g. the
+ingestion service in src.ingest), as long as they are always used from the same event loop.
+
+The runtime is created lazily inside the process that runs the task, and rebuilt if the process
+id changes (prefork children never reuse the parent's loop or connections).
+
+Functions:
+	run(coro): Runs a coroutine to completion on the per-process event loop.
+	get_engine(): Returns the per-process async engine.
+	get_sessionmaker(): Returns the session maker bound to that engine.
+	get_http_client(): Returns the per-process pooled http client for the external API.
+	get_upstream(): Returns the resilient client over it (see src.upstream), for all API calls.
+	aclose(): Disposes the engine and closes the http client.
+	shutdown(): Runs aclose() and closes the loop (hooked to worker_process_shutdown).
+"""
+
+logger = logging.getLogger(__name__)
+
+_pid = None
+_loop = None
+_engine = None
+_sessionmaker = None
+_http_client = None
+_upstream = None
+
+
+def _ensure_process():
+    """ Drops any runtime state inherited from a parent process """
+    global _pid, _loop, _engine, _sessionmaker, _http_client, _upstream
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _loop = None
+        _engine = None
+        _sessionmaker = None
+        _http_client = None
+        _upstream = None
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    _ensure_process()
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+        logger.info(f"Created worker event loop for process {_pid}")
+    return _loop
+
+
+def run(coro):
+    return get_loop().run_until_complete(coro)
+
+
+def get_engine():
+    global _engine, _sessionmaker
+    _ensure_process()
+    if _engine is None:
+        _engine = create_async_engine(settings.DATABASE_URL, pool_pre_ping=True)
+        _sessionmaker = async_sessionmaker(bind=_engine, autoflush=False)
+        logger.info(f"Created worker database engine for process {_pid}")
+    return _engine
+
+
+def get_sessionmaker():
+    get_engine()
+    return _sessionmaker
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    _ensure_process()
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(base_url=settings.BASE_URL, timeout=settings.UPSTREAM_TIMEOUT)
+    return _http_client
+
+
+def get_upstream() -> UpstreamClient:
+    global _upstream
+    client = get_http_client()
+    if _upstream is None or _upstream.client is not client:
+        _upstream = UpstreamClient(client)
+    return _upstream
+
+
+async def aclose():
+    """ Releases the pooled connections, from within the loop that used them """
+    global _engine, _sessionmaker, _http_client, _upstream
+    if _http_client is not None:
+        await _http_client.aclose()
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = None
+    _sessionmaker = None
+    _http_client = None
+    _upstream = None
+
+
+def shutdown():
+    global _loop
+    if _pid != os.getpid() or _loop is None or _loop.is_closed():
+        return
+    _loop.run_until_complete(aclose())
+    _loop.close()
+    _loop = None
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs):
+    shutdown()
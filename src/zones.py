@@ -0,0 +1,319 @@
+import logging
+import math
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from src.detection import DroneSnapshot, validated_row
+from src.model import Zone
+from src.settings import settings
+
+"""
+Configurable no-fly zones with a uniform grid spatial index.
+
+Zones are rows of the 'zones' table (see model.Zone):
+	circle:  center (center_x, center_y) and radius,
+	polygon: vertices [[x, y], ...], tested with ray casting,
+	both optionally limited to an altitude band [min_z, max_z] (open-ended when NULL).
+While the table has no rows at all, the built-in NFZ is used: a circle of `pipeline.NFZ_RADIUS`
+around the origin without altitude band (zone_id None), i.e. the behaviour before zones existed.
+
+Every worker keeps a ZoneRegistry that re-reads the table every `ZONE_RELOAD_INTERVAL` seconds
+and rebuilds its index only when a zone changed, so zones are hot-reloaded without a restart.
+
+Spatial index:
+	The x/y plane is cut into square cells of `ZONE_GRID_CELL` units and every zone is listed in
+	the cells its bounding box overlaps, as a (cell key, zone) array sorted by cell key. A
+	snapshot is located in a few NumPy passes: drones outside the bounding box of all zones are
+	dropped -> drone cell keys -> `searchsorted` into the grid -> candidate (drone, zone) pairs
+	-> exact altitude / circle / polygon tests on the pairs.
+	A drone is only ever tested against the zones of its own cell, so the cost follows the
+	number of candidate pairs instead of drones x zones.
+
+A single circle (the built-in NFZ, or one configured circle) needs no index: loading the
+position columns would cost more than the whole check, so `detect_violations` then tests the
+drone dicts in one scalar loop and keeps the vectorized engine for larger zone sets.
+
+The `distance` of a hit is measured on the x/y plane to the zone's center (circle center or
+the mean of the polygon vertices).
+
+Classes:
+	ZoneShape: One validated zone.
+	ZoneIndex: The grid over a set of zones, with locate(x, y, z).
+	ZoneRegistry: Hot-reloaded ZoneIndex of a worker process.
+Functions:
+	default_zone(radius): The built-in NFZ.
+	detect_zone_violations(snapshot, index): Drones inside a zone, one item per (drone, zone).
+	detect_violations(drones, index): The same from the drone dicts, picking the cheapest path.
+"""
+
+logger = logging.getLogger(__name__)
+
+CIRCLE = 0
+POLYGON = 1
+
+# cell coordinates are packed into one int64 key
+_CELL_OFFSET = 1 << 30
+_CELL_SPAN = 1 << 31
+
+
+class ZoneShape:
+    __slots__ = ("id", "name", "kind", "center_x", "center_y", "radius", "vertices", "min_z", "max_z")
+
+    def __init__(self, id, name: str, kind: int, center_x: float, center_y: float, radius: float = 0.0,
+                 vertices: list | None = None, min_z: float | None = None, max_z: float | None = None):
+        self.id = id
+        self.name = name
+        self.kind = kind
+        self.center_x = center_x
+        self.center_y = center_y
+        self.radius = radius
+        self.vertices = vertices
+        self.min_z = -math.inf if min_z is None else min_z
+        self.max_z = math.inf if max_z is None else max_z
+
+    @classmethod
+    def from_row(cls, row) -> "ZoneShape":
+        """ Validates a zones table row, raises ValueError when it does not describe a zone """
+        if row.kind == "circle":
+            if row.center_x is None or row.center_y is None or not row.radius or row.radius <= 0:
+                raise ValueError("circle zones need center_x, center_y and a positive radius")
+            return cls(row.id, row.name, CIRCLE, float(row.center_x), float(row.center_y), float(row.radius),
+                       min_z=row.min_z, max_z=row.max_z)
+        if row.kind == "polygon":
+            vertices = [(float(x), float(y)) for x, y in (row.vertices or [])]
+            if len(vertices) < 3:
+                raise ValueError("polygon zones need at least 3 vertices")
+            center_x = sum(x for x, _ in vertices) / len(vertices)
+            center_y = sum(y for _, y in vertices) / len(vertices)
+            return cls(row.id, row.name, POLYGON, center_x, center_y, vertices=vertices,
+                       min_z=row.min_z, max_z=row.max_z)
+        raise ValueError(f"unknown zone kind {row.kind!r}")
+
+    def bounds(self) -> tuple:
+        if self.kind == CIRCLE:
+            return (self.center_x - self.radius, self.center_y - self.radius,
+                    self.center_x + self.radius, self.center_y + self.radius)
+        xs = [x for x, _ in self.vertices]
+        ys = [y for _, y in self.vertices]
+        return min(xs), min(ys), max(xs), max(ys)
+
+
+def default_zone(radius: float) -> ZoneShape:
+    return ZoneShape(None, "Default NFZ", CIRCLE, 0.0, 0.0, radius)
+
+
+def _cell(values, cell_size: float):
+    cells = np.floor(np.asarray(values, dtype=np.float64) / cell_size)
+    return np.clip(cells, -_CELL_OFFSET + 1, _CELL_OFFSET - 1).astype(np.int64)
+
+
+def _cell_key(cx, cy):
+    return (cx + _CELL_OFFSET) * _CELL_SPAN + (cy + _CELL_OFFSET)
+
+
+class ZoneIndex:
+    def __init__(self, zones: list, cell_size: float):
+        self.zones = zones
+        self.cell_size = cell_size
+        self.ids = [zone.id for zone in zones]
+        self.kind = np.array([zone.kind for zone in zones], dtype=np.int8)
+        self.center_x = np.array([zone.center_x for zone in zones], dtype=np.float64)
+        self.center_y = np.array([zone.center_y for zone in zones], dtype=np.float64)
+        self.radius_sq = np.array([zone.radius * zone.radius for zone in zones], dtype=np.float64)
+        self.min_z = np.array([zone.min_z for zone in zones], dtype=np.float64)
+        self.max_z = np.array([zone.max_z for zone in zones], dtype=np.float64)
+        self.polygons = {i: np.array(zone.vertices, dtype=np.float64)
+                         for i, zone in enumerate(zones) if zone.kind == POLYGON}
+
+        # (cell key, zone) pairs of every cell a zone's bounding box overlaps, sorted by key
+        keys, owners = [], []
+        for i, zone in enumerate(zones):
+            min_x, min_y, max_x, max_y = zone.bounds()
+            cx = np.arange(_cell(min_x, cell_size), _cell(max_x, cell_size) + 1)
+            cy = np.arange(_cell(min_y, cell_size), _cell(max_y, cell_size) + 1)
+            cell_keys = _cell_key(np.repeat(cx, len(cy)), np.tile(cy, len(cx)))
+            keys.append(cell_keys)
+            owners.append(np.full(len(cell_keys), i, dtype=np.int64))
+        keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+        owners = np.concatenate(owners) if owners else np.empty(0, dtype=np.int64)
+        # bounding box of all zones, drones outside it skip the grid lookup
+        boxes = np.array([zone.bounds() for zone in zones], dtype=np.float64).reshape(-1, 4)
+        self.extent = (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max()) if len(zones) else None
+
+        order = np.argsort(keys, kind="stable")
+        self.pair_zone = owners[order]
+        self.cell_keys, self.cell_start, self.cell_count = np.unique(keys[order], return_index=True, return_counts=True)
+
+    def __len__(self):
+        return len(self.zones)
+
+    def candidates(self, x, y) -> tuple:
+        """ (drone index, zone index) pairs of the drones and the zones listed in their cell """
+        empty = np.empty(0, dtype=np.int64)
+        if not len(self.cell_keys) or not len(x):
+            return empty, empty
+        min_x, min_y, max_x, max_y = self.extent
+        near = np.flatnonzero((x >= min_x) & (x <= max_x) & (y >= min_y) & (y <= max_y))
+        if not near.size:
+            return empty, empty
+        keys = _cell_key(_cell(x[near], self.cell_size), _cell(y[near], self.cell_size))
+        position = np.searchsorted(self.cell_keys, keys)
+        position = np.minimum(position, len(self.cell_keys) - 1)
+        counts = np.where(self.cell_keys[position] == keys, self.cell_count[position], 0)
+
+        drones = np.repeat(near, counts)
+        firsts = np.repeat(self.cell_start[position], counts)
+        within = np.arange(len(drones)) - np.repeat(np.cumsum(counts) - counts, counts)
+        return drones, self.pair_zone[firsts + within]
+
+    def locate(self, x, y, z) -> tuple:
+        """ Returns (drone indexes, zone indexes, distances) of every drone inside a zone """
+        drones, zones = self.candidates(x, y)
+        px, py, pz = x[drones], y[drones], z[drones]
+        dx = px - self.center_x[zones]
+        dy = py - self.center_y[zones]
+        squared = dx * dx + dy * dy
+
+        hit = (pz >= self.min_z[zones]) & (pz <= self.max_z[zones])
+        circles = self.kind[zones] == CIRCLE
+        hit &= ~circles | (squared <= self.radius_sq[zones])
+        # polygon candidates grouped by zone, then one ray casting pass per polygon
+        pending = np.flatnonzero(hit & ~circles)
+        pending = pending[np.argsort(zones[pending], kind="stable")]
+        bounds = np.flatnonzero(np.diff(zones[pending])) + 1
+        for selected in np.split(pending, bounds) if pending.size else ():
+            vertices = self.polygons[int(zones[selected[0]])]
+            hit[selected] = _inside_polygon(px[selected], py[selected], vertices)
+
+        hits = np.flatnonzero(hit)
+        return drones[hits], zones[hits], np.sqrt(squared[hits])
+
+
+def _inside_polygon(px, py, vertices) -> np.ndarray:
+    """ Even-odd ray casting of many points against one polygon, one vectorized pass per edge """
+    inside = np.zeros(len(px), dtype=bool)
+    previous = vertices[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for current in vertices:
+            (xi, yi), (xj, yj) = current, previous
+            crosses = (yi > py) != (yj > py)
+            crosses &= px < (xj - xi) * (py - yi) / (yj - yi) + xi
+            inside ^= crosses
+            previous = current
+    return inside
+
+
+def detect_zone_violations(snapshot: DroneSnapshot, index: ZoneIndex) -> list:
+    """
+    Returns one drone dict per (drone, zone) the drone is inside of, with extra `distance`
+    and `zone_id` keys, ordered by drone then zone.
+    """
+    if not len(snapshot) or not len(index):
+        return []
+    drones, zones, distances = index.locate(snapshot.x, snapshot.y, snapshot.z)
+    order = np.lexsort((zones, drones))
+
+    violators, skipped = [], set()
+    for i in order:
+        drone = snapshot.row(drones[i])
+        if drone is None:
+            skipped.add(int(drones[i]))
+            continue
+        drone["distance"] = float(distances[i])
+        drone["zone_id"] = index.ids[zones[i]]
+        violators.append(drone)
+    if skipped:
+        logger.error(f"Skipped {len(skipped)} drone record(s) inside a zone with a malformed id, owner_id or position")
+    return violators
+
+
+def _detect_in_circle(drones: list, zone: ZoneShape) -> list:
+    """ detect_zone_violations for one circle zone, straight from the drone dicts """
+    center_x, center_y, radius = zone.center_x, zone.center_y, zone.radius
+    min_x, max_x, radius_sq = center_x - radius, center_x + radius, radius * radius
+    violators, skipped = [], 0
+    for drone in drones:
+        try:
+            x = drone['x']
+            # most drones are already left of or right of the circle (NaN fails the test too)
+            if not min_x <= x <= max_x:
+                continue
+            dx = x - center_x
+            dy = drone['y'] - center_y
+            squared = dx * dx + dy * dy
+        except (TypeError, KeyError, OverflowError):
+            skipped += 1
+            continue
+        if not squared <= radius_sq:
+            continue
+        row = validated_row(drone)
+        if row is None:
+            skipped += 1
+            continue
+        if zone.min_z <= row["z"] <= zone.max_z:
+            row["distance"] = math.sqrt(squared)
+            row["zone_id"] = zone.id
+            violators.append(row)
+    if skipped:
+        logger.error(f"Skipped {skipped} malformed drone record(s) in snapshot")
+    return violators
+
+
+def detect_violations(drones: list, index: ZoneIndex) -> list:
+    """ detect_zone_violations of the drone dicts, without loading columns for a single circle """
+    if len(index) == 1 and index.kind[0] == CIRCLE:
+        return _detect_in_circle(drones, index.zones[0])
+    return detect_zone_violations(DroneSnapshot.from_records(drones), index)
+
+
+class ZoneRegistry:
+    def __init__(self, get_engine, default_radius: float, reload_interval: float | None = None,
+                 cell_size: float | None = None):
+        self.get_engine = get_engine
+        self.default_radius = default_radius
+        self.reload_interval = settings.ZONE_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        self.cell_size = settings.ZONE_GRID_CELL if cell_size is None else cell_size
+        self.index = None
+        self._fingerprint = None
+        self._loaded_at = -math.inf
+
+    async def _load_rows(self) -> list:
+        async with self.get_engine().connect() as conn:
+            result = await conn.execute(select(Zone.__table__).order_by(Zone.id))
+            return result.all()
+
+    def _build(self, rows: list) -> ZoneIndex:
+        if not rows:
+            return ZoneIndex([default_zone(self.default_radius)], self.cell_size)
+        zones = []
+        for row in rows:
+            if not row.active:
+                continue
+            try:
+                zones.append(ZoneShape.from_row(row))
+            except (ValueError, TypeError) as e:
+                logger.error(f"Skipping invalid zone {row.id} ({row.name}): {e}")
+        return ZoneIndex(zones, self.cell_size)
+
+    async def current(self) -> ZoneIndex:
+        """ The zone index, re-read from the database once the reload interval has passed """
+        now = time.monotonic()
+        if now - self._loaded_at < self.reload_interval and self.index is not None:
+            return self.index
+        self._loaded_at = now
+        try:
+            rows = await self._load_rows()
+        except Exception as e:
+            logger.warning(f"Could not load zones, keeping the current ones: {e}")
+            if self.index is None:
+                self.index = ZoneIndex([default_zone(self.default_radius)], self.cell_size)
+            return self.index
+
+        fingerprint = repr([tuple(row) for row in rows])
+        if fingerprint != self._fingerprint:
+            self.index = self._build(rows)
+            self._fingerprint = fingerprint
+            logger.info(f"Loaded {len(self.index)} active zone(s)" if rows else "No zones configured, using the default NFZ")
+        return self.index
@@ -0,0 +1,22 @@
+import os
+
+import fakeredis
+import pytest
+
+# settings are read at import time: point them at harmless values before src is imported
+os.environ.setdefault("NFZ_SECRET_KEY", "test-secret")
+os.environ.setdefault("BASE_URL", "http://upstream.test/")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+os.environ.setdefault("CELERY_BROKER_URL", "redis://localhost:6379/15")
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """ `fake_redis(*modules)` points the get_redis of the given modules at one shared fake redis server """
+    def use(*modules):
+        server = fakeredis.FakeServer()
+        for module in modules:
+            monkeypatch.setattr(module, "get_redis",
+                                lambda url=None: fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+        return server
+    return use
@@ -0,0 +1,60 @@
+import math
+import random
+
+import numpy as np
+
+from src.detection import DroneSnapshot
+from src.zones import CIRCLE, ZoneIndex, ZoneShape, default_zone, detect_violations, detect_zone_violations
+
+
+def drone(i, x, y, z=100, **extra):
+    return {"id": f"drone-{i}", "owner_id": i, "x": x, "y": y, "z": z} | extra
+
+
+def test_from_records_builds_position_columns():
+    snapshot = DroneSnapshot.from_records([drone(1, 10, 20, 30), drone(2, -1.5, 0, 5)])
+    assert len(snapshot) == 2
+    np.testing.assert_array_equal(snapshot.x, [10.0, -1.5])
+    np.testing.assert_array_equal(snapshot.z, [30.0, 5.0])
+    assert snapshot.row(1) == {"id": "drone-2", "owner_id": 2, "x": -1.5, "y": 0.0, "z": 5.0}
+
+
+def test_from_records_skips_malformed_positions():
+    drones = [drone(1, 10, 20), {"id": "no-x", "owner_id": 2, "y": 0, "z": 0},
+              drone(3, "far", 0), drone(4, None, 0), "not a dict", drone(5, 1, 2)]
+    snapshot = DroneSnapshot.from_records(drones)
+    assert [snapshot.row(i)["id"] for i in range(len(snapshot))] == ["drone-1", "drone-5"]
+
+
+def test_rows_with_malformed_ids_are_dropped_from_the_detection():
+    index = ZoneIndex([default_zone(1000.0)], 1000.0)
+    drones = [drone(1, 0, 0), {"id": "bad-owner", "owner_id": "x", "x": 1, "y": 1, "z": 0},
+              {"owner_id": 3, "x": 2, "y": 2, "z": 0}, drone(4, 5000, 5000)]
+    violators = detect_zone_violations(DroneSnapshot.from_records(drones), index)
+    assert [(v["id"], v["zone_id"]) for v in violators] == [("drone-1", None)]
+
+
+def test_numeric_strings_and_booleans_are_not_positions():
+    index = ZoneIndex([default_zone(1000.0)], 1000.0)
+    drones = [drone(1, 1, 1), drone(2, "5", 0), drone(3, 0, True), drone(4, 2, 2, z="7"),
+              drone(5, 3, 3, owner_id=True), drone(6, 4, 4, owner_id="6")]
+    expected = ["drone-1"]
+    assert [v["id"] for v in detect_zone_violations(DroneSnapshot.from_records(drones), index)] == expected
+    assert [v["id"] for v in detect_violations(drones, index)] == expected
+    # the item by item path applies the same rule to positions
+    snapshot = DroneSnapshot.from_records(drones + [drone(7, None, 0)])
+    assert [d["id"] for d in snapshot.records] == ["drone-1", "drone-5", "drone-6"]
+
+
+def test_single_circle_path_matches_the_engine():
+    rng = random.Random(7)
+    drones = [drone(i, rng.uniform(-3000, 3000), rng.uniform(-3000, 3000), rng.uniform(0, 500))
+              for i in range(5000)]
+    drones += [drone(9000, float("nan"), 0), {"id": "no-y", "owner_id": 1, "x": 0, "z": 0}, "not a dict"]
+    for zone in (default_zone(1000.0), ZoneShape(4, "band", CIRCLE, 500.0, -250.0, 800.0, min_z=100.0, max_z=300.0)):
+        index = ZoneIndex([zone], 1000.0)
+        engine = detect_zone_violations(DroneSnapshot.from_records(drones), index)
+        circle = detect_violations(drones, index)
+        assert [v["id"] for v in circle] == [v["id"] for v in engine] and circle
+        assert all(a["zone_id"] == b["zone_id"] == zone.id and math.isclose(a["distance"], b["distance"])
+                   for a, b in zip(circle, engine))
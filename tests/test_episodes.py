@@ -0,0 +1,138 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import fakeredis
+import pytest
+
+from src import episodes
+from src.episodes import (EpisodeChanges, InMemoryEpisodeStore, RedisEpisodeStore, diff_episodes, episode_key,
+                          new_episode)
+
+NOW = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def inside(drone_id: str, distance: float = 100.0, zone_id=None, owner_id: int = 1) -> dict:
+    return {"id": drone_id, "owner_id": owner_id, "x": distance, "y": 0.0, "z": 50.0,
+            "distance": distance, "zone_id": zone_id}
+
+
+def opened(drone: dict, at: datetime) -> dict:
+    return new_episode(drone, at)
+
+
+def diff(open_episodes, drones, now=NOW):
+    return diff_episodes(open_episodes, drones, now, exit_grace=10.0, flush_interval=30.0)
+
+
+def test_new_drone_opens_an_episode():
+    changes = diff({}, [inside("a", 120.0)])
+    assert [e["drone_id"] for e in changes.entered] == ["a"]
+    assert changes.entered[0]["closest"] == 120.0 and changes.entered[0]["samples"] == 1
+    assert not changes.updated and not changes.closed and not changes.flush
+
+
+def test_staying_drone_updates_its_episode_and_keeps_the_closest_approach():
+    episode = opened(inside("a", 300.0), NOW - timedelta(seconds=5))
+    changes = diff({"a": episode}, [inside("a", 100.0)])
+    assert not changes.entered
+    [updated] = changes.updated
+    assert updated["samples"] == 2 and updated["closest"] == 100.0 and updated["x"] == 100.0
+    assert updated["last_seen"] == NOW.isoformat() and updated["opened_at"] == episode["opened_at"]
+    assert episode["samples"] == 1  # the open episode itself is not modified
+
+    farther = diff({"a": updated}, [inside("a", 500.0)], NOW + timedelta(seconds=1)).updated[0]
+    assert farther["closest"] == 100.0 and farther["samples"] == 3
+
+
+def test_long_stays_are_flushed_once_per_interval():
+    episode = opened(inside("a"), NOW - timedelta(seconds=31))
+    changes = diff({"a": episode}, [inside("a")])
+    assert [e["drone_id"] for e in changes.flush] == ["a"]
+    assert changes.flush[0]["flushed_at"] == NOW.isoformat()
+
+    assert not diff({"a": changes.flush[0]}, [inside("a")], NOW + timedelta(seconds=5)).flush
+
+
+def test_episode_closes_only_after_the_exit_grace():
+    episode = opened(inside("a"), NOW - timedelta(seconds=5))
+    assert not diff({"a": episode}, []).closed
+    assert [e["drone_id"] for e in diff({"a": episode}, [], NOW + timedelta(seconds=5)).closed] == ["a"]
+
+
+def test_episodes_are_per_drone_and_zone():
+    episode = opened(inside("a", zone_id=None), NOW - timedelta(seconds=1))
+    drones = [inside("a", zone_id=None), inside("a", zone_id=7), inside("a", zone_id=7)]
+    changes = diff({episode_key("a"): episode}, drones)
+    assert [(e["drone_id"], e["zone_id"]) for e in changes.entered] == [("a", 7)]
+    assert [(e["drone_id"], e["zone_id"]) for e in changes.updated] == [("a", None)]
+    assert episode_key("a", 7) == "a@7" and episode_key("a") == "a"
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_store(request, fake_redis):
+    """ Builds stores of one backend; redis stores of a test share one fake server, like workers do """
+    if request.param == "memory":
+        store = InMemoryEpisodeStore()
+        return lambda: store
+    fake_redis(episodes)
+    return RedisEpisodeStore
+
+
+def keys_of(found) -> list:
+    return sorted(found) if isinstance(found, dict) else sorted(episode_key(e["drone_id"], e["zone_id"]) for e in found)
+
+
+def test_a_tick_only_reads_the_episodes_inside_and_the_ones_due_to_close(make_store):
+    store = make_store()
+    old = opened(inside("old"), NOW - timedelta(seconds=60))
+    recent = [opened(inside(f"d{i}"), NOW - timedelta(seconds=1)) for i in range(5)]
+    asyncio.run(store.apply(EpisodeChanges([old] + recent, [], [], [])))
+
+    found = asyncio.run(store.candidates({"d1", "new"}, NOW - timedelta(seconds=10)))
+    assert keys_of(found) == ["d1", "old"]
+    assert found["d1"] == recent[1]
+
+
+def test_a_stale_update_does_not_resurrect_or_overwrite_an_episode(make_store):
+    first, second = make_store(), make_store()
+    episode = opened(inside("a"), NOW - timedelta(seconds=60))
+    asyncio.run(first.apply(EpisodeChanges([episode], [], [], [])))
+
+    # both workers read the open episode, the second one closes it first
+    stale = diff({"a": episode}, [inside("a")], NOW)
+    closing = diff({"a": episode}, [], NOW)
+    assert keys_of(asyncio.run(second.apply(closing)).closed) == ["a"]
+    won = asyncio.run(first.apply(stale))
+    assert not won.updated and not won.flush
+    assert not asyncio.run(first.candidates({"a"}, NOW))
+
+    # the drone comes back: a stale close or update of the old episode leaves the new one alone
+    reopened = opened(inside("a"), NOW + timedelta(seconds=5))
+    asyncio.run(second.apply(EpisodeChanges([reopened], [], [], [])))
+    won = asyncio.run(first.apply(EpisodeChanges([], stale.updated, closing.closed, [])))
+    assert not won.updated and not won.closed
+    assert asyncio.run(second.candidates({"a"}, NOW))["a"]["opened_at"] == reopened["opened_at"]
+
+
+def test_only_one_worker_opens_or_closes_an_episode(make_store):
+    first, second = make_store(), make_store()
+    episode = opened(inside("a"), NOW - timedelta(seconds=60))
+    assert keys_of(asyncio.run(first.apply(EpisodeChanges([episode], [], [], []))).entered) == ["a"]
+    assert not asyncio.run(second.apply(EpisodeChanges([dict(episode)], [], [], []))).entered
+
+    assert keys_of(asyncio.run(first.apply(EpisodeChanges([], [], [episode], []))).closed) == ["a"]
+    assert not asyncio.run(second.apply(EpisodeChanges([], [], [episode], []))).closed
+
+    asyncio.run(second.restore([episode]))
+    assert keys_of(asyncio.run(first.candidates((), NOW))) == ["a"]
+    asyncio.run(first.discard(["a"]))
+    assert not asyncio.run(second.candidates({"a"}, NOW))
+
+
+def test_episodes_stored_before_the_last_seen_index_are_indexed(fake_redis):
+    server = fake_redis(episodes)
+    episode = opened(inside("a"), NOW - timedelta(seconds=60))
+    asyncio.run(fakeredis.FakeAsyncRedis(server=server).hset(RedisEpisodeStore.KEY, "a", json.dumps(episode)))
+
+    assert keys_of(asyncio.run(RedisEpisodeStore().candidates((), NOW))) == ["a"]
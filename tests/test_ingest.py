@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import time
+
+import httpx
+
+from src import ingest
+from src.ingest import IngestionService, LagTracker
+from src.pipeline import InvalidDroneData, TickResult
+
+
+class SlowTicks:
+    """ A run_tick taking `duration` seconds, recording overlaps and start times; `errors` are raised in turn """
+
+    def __init__(self, duration: float, lag: float = 0.2, errors=()):
+        self.duration = duration
+        self.lag = lag
+        self.errors = list(errors)
+        self.running = 0
+        self.overlaps = 0
+        self.started = []
+
+    async def run_tick(self, client):
+        self.started.append(time.monotonic())
+        self.running += 1
+        self.overlaps += self.running > 1
+        try:
+            await asyncio.sleep(self.duration)
+            if self.errors:
+                raise self.errors.pop(0)
+            observed_at = time.monotonic() - self.lag
+            return TickResult(10, 1, 1, 0, observed_at, observed_at + self.lag)
+        finally:
+            self.running -= 1
+
+
+def run_service(monkeypatch, ticks: SlowTicks, interval: float, count: int, report_every: int = 100):
+    monkeypatch.setattr(ingest, "run_tick", ticks.run_tick)
+    service = IngestionService(client=None, tick_interval=interval, report_every=report_every)
+
+    async def run():
+        task = asyncio.create_task(service.run())
+        while len(ticks.started) < count:
+            await asyncio.sleep(0.005)
+        service.stop()
+        await asyncio.wait_for(task, timeout=5)
+
+    asyncio.run(run())
+    return service
+
+
+def test_overrunning_ticks_never_overlap(monkeypatch):
+    ticks = SlowTicks(duration=0.05)
+    service = run_service(monkeypatch, ticks, interval=0.01, count=5)
+
+    assert ticks.overlaps == 0
+    assert service.ticks >= 5 and service.overruns == service.ticks
+    # an overrunning tick delays the next one instead of running it alongside
+    gaps = [b - a for a, b in zip(ticks.started, ticks.started[1:])]
+    assert min(gaps) >= 0.05
+
+
+def test_fast_ticks_keep_to_the_interval(monkeypatch):
+    ticks = SlowTicks(duration=0.0)
+    service = run_service(monkeypatch, ticks, interval=0.05, count=4)
+
+    assert service.overruns == 0
+    gaps = [b - a for a, b in zip(ticks.started, ticks.started[1:])]
+    assert min(gaps) >= 0.045
+
+
+def test_failed_ticks_do_not_stop_the_loop(monkeypatch, caplog):
+    errors = [httpx.ConnectError("refused"), InvalidDroneData("bad"), RuntimeError("boom")]
+    ticks = SlowTicks(duration=0.0, errors=errors)
+    with caplog.at_level(logging.ERROR, logger="src.ingest"):
+        service = run_service(monkeypatch, ticks, interval=0.001, count=5)
+
+    assert service.ticks >= 5 and len(service.lag.samples) == service.ticks - 3
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("external API" in m for m in messages) and any("boom" in m for m in messages)
+
+
+def test_lag_percentiles_are_logged_every_report(monkeypatch, caplog):
+    ticks = SlowTicks(duration=0.0, lag=0.25)
+    with caplog.at_level(logging.INFO, logger="src.ingest"):
+        service = run_service(monkeypatch, ticks, interval=0.001, count=6, report_every=3)
+
+    reports = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Ingestion: ")]
+    assert len(reports) == service.ticks // 3
+    assert reports[0].startswith("Ingestion: 3 ticks, ") and "'p50': '250ms'" in reports[0]
+
+
+def test_lag_tracker_percentiles_over_a_bounded_window():
+    tracker = LagTracker(window=100)
+    assert tracker.percentiles() == {}
+    for ms in range(1, 201):
+        tracker.add(ms / 1000)
+    assert len(tracker.samples) == 100
+    assert tracker.percentiles() == {"p50": 0.151, "p95": 0.196, "p99": 0.2, "max": 0.2}
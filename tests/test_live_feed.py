@@ -0,0 +1,80 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from src import main
+from src.live_feed import Broadcaster, Frame
+
+
+def connect(client, **kwargs):
+    main.live_feed.snapshot_frame = Frame("snapshot", 1, '{"seq":1,"drones":[]}')
+    return client.websocket_connect("/live/ws", **kwargs)
+
+
+def received_violations(websocket) -> bool:
+    # frames are published on the app's event loop, like the producers do
+    websocket.portal.call(main.live_feed.publish_violations, '[{"drone_id":"drone-1"}]')
+    websocket.portal.call(main.live_feed._broadcast, Frame("delta", 2, '{"seq":2,"changed":[],"removed":[]}'))
+    kinds = []
+    while "delta" not in kinds:
+        kinds.append(json.loads(websocket.receive_text())["type"])
+    return "violations" in kinds
+
+
+def test_live_ws_sends_violations_only_after_authentication():
+    client = TestClient(main.app)
+    with connect(client) as websocket:
+        assert json.loads(websocket.receive_text())["type"] == "snapshot"
+        assert not received_violations(websocket)
+
+        websocket.send_text(json.dumps({"secret": "wrong"}))
+        websocket.send_text("not json")
+        assert not received_violations(websocket)
+
+        websocket.send_text(json.dumps({"secret": main.settings.NFZ_SECRET_KEY}))
+        assert received_violations(websocket)
+
+
+def test_live_ws_accepts_the_secret_header_but_not_the_query_string():
+    client = TestClient(main.app)
+    with connect(client, headers={"X-Secret": main.settings.NFZ_SECRET_KEY}) as websocket:
+        websocket.receive_text()
+        assert received_violations(websocket)
+    with client.websocket_connect(f"/live/ws?secret={main.settings.NFZ_SECRET_KEY}") as websocket:
+        websocket.receive_text()
+        assert not received_violations(websocket)
+
+
+def drain(subscriber) -> list:
+    async def run():
+        frames = []
+        while subscriber.pending or subscriber.violations or subscriber.violations_dropped or subscriber.resync:
+            frames.append(await subscriber.next())
+        return frames
+    return asyncio.run(run())
+
+
+def test_slow_consumer_is_resynced_without_losing_violations_silently():
+    broadcaster = Broadcaster(max_pending=3)
+    subscriber = broadcaster.subscribe(with_violations=True)
+    anonymous = broadcaster.subscribe()
+    for i in range(10):
+        broadcaster.publish_drones([SimpleNamespace(id="drone-1", owner_id=1, x=i, y=0, z=0)], b"[]")
+        broadcaster.publish_violations(f'[{{"n":{i}}}]')
+
+    frames = drain(subscriber)
+    kinds = [frame.kind for frame in frames]
+    assert kinds[0] == "violations_dropped"
+    dropped = json.loads(frames[0].text)["dropped"]
+    delivered = [json.loads(frame.text)[0]["n"] for frame in frames if frame.kind == "violations"]
+    # every violations frame is either delivered in order or accounted for in the dropped count
+    assert delivered == list(range(dropped, 10))
+    # the drone backlog was replaced by the latest snapshot, followed by no stale delta
+    assert frames[len(delivered) + 1].kind == "snapshot"
+    assert frames[len(delivered) + 1].seq == broadcaster.seq
+    assert "delta" not in kinds and subscriber.dropped > 0
+
+    assert "violations" not in [frame.kind for frame in drain(anonymous)]
+    assert anonymous.violations_dropped == 0
@@ -0,0 +1,14 @@
+from src import metrics
+
+
+def test_forked_process_gets_its_own_worker_id_and_empty_metrics(monkeypatch):
+    parent = metrics.worker_id()
+    metrics.stage_items.inc(5, stage="detect")
+    metrics._last_push = 123.0
+
+    monkeypatch.setattr(metrics.os, "getpid", lambda: -1)
+    child = metrics.worker_id()
+    assert child != parent and child.endswith(":-1")
+    assert metrics.stage_items._values == {}
+    assert metrics._last_push == 0.0
+    assert metrics.worker_id() == child
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from redis.exceptions import ConnectionError
+
+from src import nfz_cache
+from src.nfz_cache import NfzCache, bump_version
+from src.serialization import VIOLATION_COLUMNS
+
+NOW = datetime(2025, 6, 1, 12, 0, 0)
+
+
+class Clock(datetime):
+    """ Stands in for nfz_cache.datetime, `Clock.current` is the wall clock """
+    current = NOW
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def row(index: int, when: datetime, first_name: str = "Åsa") -> tuple:
+    values = {"index": index, "id": str(index), "drone_id": f"d{index}", "timestamp": when, "position_x": 1.5,
+              "position_y": -2.0, "position_z": 100.0, "owner_first_name": first_name, "owner_last_name": "Ørn",
+              "owner_ssn": "s", "owner_phone": "p"}
+    return tuple(values.get(column) for column in VIOLATION_COLUMNS)
+
+
+class Table:
+    """ The violations table: `load_rows(since)` as GET /nfz queries it, counting the queries """
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.queries = 0
+
+    async def load_rows(self, since: datetime):
+        self.queries += 1
+        return [r for r in self.rows if r[VIOLATION_COLUMNS.index("timestamp")] >= since]
+
+
+def ids(body: bytes) -> list:
+    return [item["id"] for item in json.loads(body)]
+
+
+@pytest.fixture
+def redis_server(fake_redis, monkeypatch):
+    Clock.current = NOW
+    monkeypatch.setattr(nfz_cache, "datetime", Clock)
+    return fake_redis(nfz_cache)
+
+
+def test_a_version_bump_invalidates_every_worker(redis_server):
+    table = Table([row(1, NOW - timedelta(hours=1))])
+    first, second = NfzCache("version", 60), NfzCache("version", 60)
+
+    async def run():
+        bodies = [await first.get(table.load_rows), await second.get(table.load_rows),
+                  await first.get(table.load_rows)]
+        queries = table.queries
+        table.rows.append(row(2, NOW - timedelta(minutes=1)))
+        stale = await second.get(table.load_rows)
+        await bump_version()
+        return bodies, queries, stale, await second.get(table.load_rows), await first.get(table.load_rows)
+
+    bodies, queries, stale, second_body, first_body = asyncio.run(run())
+    # one query for both workers: the second one finds the response in redis, then both in memory
+    assert queries == 1 and [ids(body) for body in bodies] == [["1"]] * 3
+    assert ids(stale) == ["1"]
+    assert ids(second_body) == ids(first_body) == ["1", "2"] and table.queries == 2
+
+
+def test_sliding_mode_cuts_rows_off_at_the_24_hour_boundary(redis_server):
+    table = Table([row(1, NOW - timedelta(hours=23, minutes=59)), row(2, NOW - timedelta(hours=23)),
+                   row(3, NOW - timedelta(hours=1))])
+    sliding, version = NfzCache("sliding", 3600), NfzCache("version", 3600)
+
+    async def read(cache):
+        return ids(await cache.get(table.load_rows))
+
+    async def run():
+        seen = [await read(sliding), await read(version)]
+        for minutes in (1, 2, 61, 24 * 60):
+            Clock.current = NOW + timedelta(minutes=minutes)
+            seen.append((await read(sliding), await read(version)))
+        return seen
+
+    seen = asyncio.run(run())
+    assert seen[:2] == [["1", "2", "3"], ["1", "2", "3"]]
+    # a row exactly 24 hours old is still in the window, then the cached bytes are sliced
+    assert seen[2] == (["1", "2", "3"], ["1", "2", "3"])
+    assert seen[3] == (["2", "3"], ["1", "2", "3"])
+    assert seen[4] == (["3"], ["1", "2", "3"])
+    assert seen[5] == ([], ["1", "2", "3"])
+    assert table.queries == 1
+
+
+def test_entries_expire_after_the_ttl(redis_server, monkeypatch):
+    table = Table([row(1, NOW)])
+    cache = NfzCache("version", 60)
+    wall = [1000.0]
+    monkeypatch.setattr(nfz_cache.time, "time", lambda: wall[0])
+
+    async def run():
+        await cache.get(table.load_rows)
+        wall[0] += 59
+        await cache.get(table.load_rows)
+        wall[0] += 2
+        await cache.get(table.load_rows)
+
+    asyncio.run(run())
+    assert table.queries == 2
+
+
+def test_off_mode_is_disabled():
+    assert not NfzCache("off", 60).enabled
+    assert NfzCache("version", 60).enabled and NfzCache("sliding", 60).enabled
+
+
+def test_redis_round_trip_keeps_the_encoded_bytes(redis_server):
+    table = Table([row(1, NOW - timedelta(hours=2), "Zoë"), row(2, NOW - timedelta(hours=1), "名前")])
+
+    async def run():
+        built = await NfzCache("sliding", 60).get(table.load_rows)
+        Clock.current = NOW + timedelta(hours=22, minutes=30)
+        # a new worker reads the entry stored by the first one and slices it by its byte offsets
+        return built, await NfzCache("sliding", 60).get(table.load_rows)
+
+    built, trimmed = asyncio.run(run())
+    assert table.queries == 1
+    assert [item["owner_first_name"] for item in json.loads(built)] == ["Zoë", "名前"]
+    assert json.loads(trimmed) == json.loads(built)[1:]
+
+
+def test_the_cache_is_bypassed_without_redis(monkeypatch):
+    class Down:
+        async def get(self, key):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(nfz_cache, "get_redis", lambda url=None: Down())
+    table = Table([row(1, datetime.now())])
+    cache = NfzCache("sliding", 60)
+
+    async def run():
+        return [ids(await cache.get(table.load_rows)) for _ in range(2)]
+
+    assert asyncio.run(run()) == [["1"], ["1"]]
+    assert table.queries == 2 and cache._entry is None
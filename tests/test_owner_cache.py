@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from redis.exceptions import ConnectionError
+
+from src import owner_cache as owner_cache_module
+from src.owner_cache import NOT_FOUND, LRUCache, OwnerCache
+
+
+def owner(owner_id: int) -> dict:
+    return {"first_name": f"F{owner_id}", "last_name": "L", "social_security_number": "S", "phone_number": "P"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(owner_cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_lru_evicts_the_least_recently_used_entry(clock):
+    lru = LRUCache(2)
+    lru.set(1, "a", 60)
+    lru.set(2, "b", 60)
+    assert lru.get(1) == "a"  # 2 is now the least recently used
+    lru.set(3, "c", 60)
+    assert (lru.get(1), lru.get(2), lru.get(3)) == ("a", None, "c")
+    assert len(lru) == 2 and lru.evictions == 1
+
+
+def test_entries_expire_after_their_ttl(clock):
+    lru = LRUCache(10)
+    lru.set(1, "a", 60)
+    lru.set(2, NOT_FOUND, 5)
+    clock[0] += 5
+    assert lru.get(1) == "a" and lru.get(2) is None
+    clock[0] += 55
+    assert lru.get(1) is None and len(lru) == 0
+
+
+def test_redis_tier_is_shared_between_workers_with_negative_entries(fake_redis, clock):
+    server = fake_redis(owner_cache_module)
+    first = OwnerCache(maxsize=10, ttl=3600, negative_ttl=60, redis_url="redis://shared")
+    second = OwnerCache(maxsize=10, ttl=3600, negative_ttl=60, redis_url="redis://shared")
+
+    async def run():
+        await first.set_many({1: owner(1), 2: NOT_FOUND})
+        return await second.get_many([1, 2, 3]), await second.get_many([1, 2])
+
+    (cached, missing), (again, none_missing) = asyncio.run(run())
+    assert cached == {1: owner(1), 2: NOT_FOUND} and missing == [3]
+    assert again == cached and none_missing == []
+    assert second.counters == {"local_hits": 2, "redis_hits": 2, "negative_hits": 2, "misses": 1}
+
+    # the 404 expires from redis after the negative ttl, the record after the ttl
+    ttls = asyncio.run(_ttls(fakeredis.FakeAsyncRedis(server=server, decode_responses=True)))
+    assert 0 < ttls["owner:2"] <= 60 and 60 < ttls["owner:1"] <= 3600
+
+
+async def _ttls(client) -> dict:
+    return {key: await client.ttl(key) for key in ("owner:1", "owner:2")}
+
+
+def test_redis_failures_fall_back_to_the_api(monkeypatch):
+    class Down:
+        async def mget(self, keys):
+            raise ConnectionError("down")
+
+        def pipeline(self, transaction=True):
+            raise ConnectionError("down")
+
+    monkeypatch.setattr(owner_cache_module, "get_redis", lambda url=None: Down())
+    cache = OwnerCache(maxsize=10, ttl=3600, negative_ttl=60, redis_url="redis://down")
+
+    async def run():
+        cached, missing = await cache.get_many([1])
+        await cache.set_many({1: owner(1)})
+        return cached, missing, await cache.get_many([1])
+
+    assert asyncio.run(run()) == ({}, [1], ({1: owner(1)}, []))
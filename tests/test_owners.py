@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from src import owners
+from src.owner_cache import OwnerCache
+from src.upstream import UpstreamClient
+
+
+def owner(owner_id: int) -> dict:
+    return {"first_name": f"F{owner_id}", "last_name": "L", "social_security_number": "S", "phone_number": "P"}
+
+
+class UsersApi:
+    """ users/{id} answering from `responses` (id -> status, "slow", "garbage" or "list"), counting calls """
+
+    def __init__(self, **responses):
+        self.responses = {int(key.removeprefix("o")): value for key, value in responses.items()}
+        self.calls = []
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        owner_id = int(request.url.path.rsplit("/", 1)[1])
+        self.calls.append(owner_id)
+        answer = self.responses.get(owner_id, 200)
+        if answer == "slow":
+            await asyncio.sleep(5)
+        if answer == "garbage":
+            return httpx.Response(200, content=b"{not json")
+        if answer == "list":
+            return httpx.Response(200, json=[owner(owner_id)])
+        if answer in (200, "slow"):
+            return httpx.Response(200, json=owner(owner_id))
+        return httpx.Response(answer, json={"detail": "no"})
+
+    def client(self) -> UpstreamClient:
+        transport = httpx.MockTransport(self.handler)
+        return UpstreamClient(httpx.AsyncClient(base_url="http://upstream.test/", transport=transport),
+                              timeout=10.0, retries=0, hedge=False)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = OwnerCache(maxsize=100, ttl=3600, negative_ttl=60)
+    monkeypatch.setattr(owners, "owner_cache", cache)
+    return cache
+
+
+def test_lookups_still_running_at_the_deadline_are_cancelled(cache):
+    api = UsersApi(o2="slow")
+
+    async def run():
+        started = time.perf_counter()
+        found = await owners.fetch_owners([1, 2, 3], concurrency=3, deadline=0.2, client=api.client())
+        return found, time.perf_counter() - started
+
+    found, elapsed = asyncio.run(run())
+    assert found == {1: owner(1), 3: owner(3)}
+    assert elapsed < 2
+    # the cancelled lookup is not cached, it is retried on the next tick
+    assert asyncio.run(owners.fetch_owners([1, 2, 3], 3, 0.2, api.client())).keys() == {1, 3}
+    assert sorted(api.calls) == [1, 2, 2, 3]
+
+
+def test_failed_lookups_do_not_abort_the_batch(cache):
+    api = UsersApi(o2=500, o3="garbage", o4="list", o5=404)
+
+    found = asyncio.run(owners.fetch_owners([1, 2, 3, 4, 5, 1], concurrency=2, deadline=5, client=api.client()))
+    assert found == {1: owner(1)}
+    assert sorted(api.calls) == [1, 2, 3, 4, 5]
+
+    # owner 1 and the 404 come from the cache, the failures are asked again
+    api.calls.clear()
+    assert asyncio.run(owners.fetch_owners([1, 2, 3, 4, 5], 2, 5, api.client())) == {1: owner(1)}
+    assert sorted(api.calls) == [2, 3, 4]
+    assert cache.counters["negative_hits"] == 1 and cache.counters["local_hits"] == 2
+
+
+def test_concurrency_is_bounded(cache):
+    in_flight, peak = [0], [0]
+
+    async def handler(request):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return httpx.Response(200, json=owner(1))
+
+    client = UpstreamClient(httpx.AsyncClient(base_url="http://upstream.test/", transport=httpx.MockTransport(handler)),
+                            timeout=10.0, retries=0, hedge=False)
+    assert len(asyncio.run(owners.fetch_owners(range(20), concurrency=4, deadline=5, client=client))) == 20
+    assert peak[0] == 4
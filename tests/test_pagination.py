@@ -0,0 +1,99 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src import main, model
+from src.database import Base, get_db
+from src.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    stamp = datetime(2025, 1, 2, 3, 4, 5, 678901)
+    cursor = encode_cursor(stamp, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (stamp, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2025, 1, 1), 1)[:-3]])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def violation(index: int, timestamp: datetime) -> dict:
+    return {"index": index, "id": str(index), "drone_id": f"drone-{index}", "timestamp": timestamp,
+            "position_x": 0.0, "position_y": 0.0, "position_z": 0.0, "owner_first_name": "First",
+            "owner_last_name": "Last", "owner_ssn": "000000-000X", "owner_phone": "+358000"}
+
+
+@pytest.fixture
+def client(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'nfz.db'}", poolclass=NullPool)
+    now = datetime.now()
+    # indexes 3 and 4 share a timestamp, 6 is older than the 24 hour window
+    stamps = {1: now - timedelta(hours=5), 2: now - timedelta(hours=4), 3: now - timedelta(hours=3),
+              4: now - timedelta(hours=3), 5: now - timedelta(hours=1), 6: now - timedelta(hours=30)}
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            for index, stamp in stamps.items():
+                await conn.execute(insert(model.Violation.__table__).values(violation(index, stamp)))
+    asyncio.run(setup())
+
+    async def get_test_db():
+        async with AsyncSession(engine) as session:
+            yield session
+
+    main.app.dependency_overrides[get_db] = get_test_db
+    yield TestClient(main.app, headers={"X-Secret": main.settings.NFZ_SECRET_KEY})
+    main.app.dependency_overrides.pop(get_db, None)
+
+
+def test_nfz_pages_follow_the_cursor_without_gaps_or_duplicates(client):
+    indexes, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/nfz", params=params)
+        assert response.status_code == 200
+        indexes.extend(row["index"] for row in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        assert response.headers["Link"] == f'</nfz?limit=2&cursor={cursor}>; rel="next"'
+    assert indexes == [1, 2, 3, 4, 5]
+    assert pages == 3
+
+
+def test_nfz_rejects_a_malformed_cursor(client):
+    assert client.get("/nfz", params={"limit": 2, "cursor": "garbage"}).status_code == 400
+
+
+def test_nfz_ndjson_streams_pages_with_the_next_cursor(client):
+    indexes, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 2, "format": "ndjson", **({"cursor": cursor} if cursor else {})}
+        response = client.get("/nfz", params=params)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        indexes.extend(json.loads(line)["index"] for line in response.text.splitlines())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        assert response.headers["Link"] == f'</nfz?limit=2&format=ndjson&cursor={cursor}>; rel="next"'
+    assert indexes == [1, 2, 3, 4, 5]
+    assert pages == 3
+
+
+def test_nfz_ndjson_without_limit_streams_every_row(client):
+    response = client.get("/nfz", params={"format": "ndjson"})
+    assert [json.loads(line)["index"] for line in response.text.splitlines()] == [1, 2, 3, 4, 5]
+    assert "X-Next-Cursor" not in response.headers
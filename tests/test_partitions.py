@@ -0,0 +1,181 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src import partitions
+from src.model import Violation
+
+
+class FakeResult:
+    def __init__(self, value=None, rows=()):
+        self.value = value
+        self.rows = list(rows)
+        self.rowcount = 3
+
+    def scalar(self):
+        return self.value
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeConnection:
+    """ Records statements; `fail` makes statements containing one of its strings raise """
+
+    def __init__(self, existing=(), stray_days=(), fail=()):
+        self.existing = list(existing)
+        self.stray_days = {day.isoformat() for day in stray_days}
+        self.fail = fail
+        self.statements = []
+        self.rolled_back = 0
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        mark = len(self.statements)
+        try:
+            yield
+        except Exception:
+            self.rolled_back += 1
+            del self.statements[mark:]
+            raise
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        if any(part in sql for part in self.fail):
+            raise RuntimeError(f"refused: {sql}")
+        self.statements.append(sql)
+        if "FROM pg_inherits" in sql:
+            return FakeResult(rows=self.existing)
+        if sql.startswith(f"SELECT 1 FROM {partitions.DEFAULT_PARTITION}"):
+            return FakeResult(1 if any(f"'{day}'" in sql.split("AND")[0] for day in self.stray_days) else None)
+        return FakeResult()
+
+
+def test_rows_in_the_default_partition_are_moved_before_attaching():
+    conn = FakeConnection(stray_days=[date(2025, 1, 2)])
+    created = asyncio.run(partitions.ensure_partitions(conn, date(2025, 1, 1), 1))
+
+    assert created == ["violations_p20250101", "violations_p20250102"]
+    assert any(s.startswith("CREATE TABLE IF NOT EXISTS violations_p20250101 PARTITION OF") for s in conn.statements)
+    moved = [s for s in conn.statements if "violations_p20250102" in s]
+    assert moved[0].startswith("CREATE TABLE violations_p20250102 (LIKE violations")
+    assert "DELETE FROM violations_default" in moved[1] and "INSERT INTO violations_p20250102" in moved[1]
+    assert moved[2].startswith("ALTER TABLE violations ATTACH PARTITION violations_p20250102")
+
+
+def test_a_failing_partition_does_not_stop_the_maintenance_run():
+    conn = FakeConnection(existing=["violations_p20241201", "violations_p20241202", "violations_default"],
+                          fail=("violations_p20250101 PARTITION OF", "DETACH PARTITION violations_p20241201"))
+    created = asyncio.run(partitions.ensure_partitions(conn, date(2025, 1, 1), 1))
+    expired = asyncio.run(partitions.expire_partitions(conn, date(2025, 1, 1), 7, "drop"))
+
+    assert created == ["violations_p20250102"]
+    assert expired == ["violations_p20241202"]
+    assert conn.rolled_back == 2
+    assert "DROP TABLE violations_p20241202" in conn.statements
+
+
+# Against a real PostgreSQL: set TEST_POSTGRES_URL to a throwaway database (its violations tables are dropped)
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+postgres = pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL is not set")
+
+
+def violation_row(when: datetime, drone: str = "d1") -> dict:
+    return {"id": "1", "drone_id": drone, "timestamp": when, "position_x": 0.0, "position_y": 0.0,
+            "position_z": 0.0, "owner_first_name": "A", "owner_last_name": "B", "owner_ssn": "s",
+            "owner_phone": "p"}
+
+
+def run_on_postgres(steps):
+    """ Runs `steps(conn)` in a transaction on a database whose violations tables were dropped first """
+    async def run():
+        engine = create_async_engine(POSTGRES_URL, poolclass=NullPool)
+        try:
+            async with engine.begin() as conn:
+                tables = (await conn.execute(text(
+                    "SELECT tablename FROM pg_tables WHERE schemaname = 'public' AND tablename LIKE 'violations%'"
+                ))).scalars().all()
+                for table in tables:
+                    await conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+            async with engine.begin() as conn:
+                return await steps(conn)
+        finally:
+            await engine.dispose()
+    return asyncio.run(run())
+
+
+async def count(conn, table: str) -> int:
+    return (await conn.execute(text(f"SELECT count(*) FROM {table}"))).scalar()
+
+
+@postgres
+def test_postgres_stray_default_rows_are_moved_into_their_partition():
+    today = date(2025, 1, 1)
+
+    async def steps(conn):
+        await partitions.create_partitioned_table(conn)
+        await conn.execute(insert(Violation.__table__), [
+            violation_row(datetime(2025, 1, 1, 12)), violation_row(datetime(2025, 1, 3, 8), "d2")])
+        created = await partitions.ensure_partitions(conn, today, 2)
+        indexes = (await conn.execute(text(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = 'violations_p20250103'"))).scalars().all()
+        return (created, await count(conn, "violations_default"), await count(conn, "violations_p20250103"),
+                await count(conn, "violations"), indexes)
+
+    created, default_rows, moved_rows, total, indexes = run_on_postgres(steps)
+    assert created == ["violations_p20250101", "violations_p20250102", "violations_p20250103"]
+    assert (default_rows, moved_rows, total) == (0, 1, 2)
+    assert any("(\"timestamp\", index)" in index or "(\"timestamp\", \"index\")" in index for index in indexes)
+
+
+@postgres
+def test_postgres_expired_partitions_are_dropped_or_archived():
+    async def steps(conn):
+        await partitions.create_partitioned_table(conn)
+        for day in (date(2024, 12, 1), date(2024, 12, 2), date(2025, 1, 1)):
+            await partitions.create_partition(conn, day)
+        await conn.execute(insert(Violation.__table__), [violation_row(datetime(2024, 12, 2, 9))])
+        dropped = await partitions.expire_partitions(conn, date(2025, 1, 1), 7, "drop")
+        return dropped, await partitions.list_partitions(conn)
+
+    dropped, remaining = run_on_postgres(steps)
+    assert sorted(dropped) == ["violations_p20241201", "violations_p20241202"]
+    assert sorted(remaining) == ["violations_default", "violations_p20250101"]
+
+    async def archive(conn):
+        await partitions.create_partitioned_table(conn)
+        await partitions.create_partition(conn, date(2024, 12, 2))
+        await conn.execute(insert(Violation.__table__), [violation_row(datetime(2024, 12, 2, 9))])
+        await partitions.expire_partitions(conn, date(2025, 1, 1), 7, "detach")
+        return (await partitions.table_kind(conn, "violations_archive_20241202"),
+                await count(conn, "violations_archive_20241202"), await count(conn, "violations"))
+
+    assert run_on_postgres(archive) == ("r", 1, 0)
+
+
+@postgres
+def test_postgres_plain_table_is_converted_keeping_its_rows():
+    async def steps(conn):
+        await conn.run_sync(Violation.__table__.create)
+        await conn.execute(insert(Violation.__table__), [
+            violation_row(datetime(2025, 1, 1, 12)), violation_row(datetime(2025, 1, 2, 8), "d2")])
+        await partitions.convert_to_partitioned(conn)
+        await conn.execute(insert(Violation.__table__), [violation_row(datetime(2025, 1, 2, 9), "d3")])
+        indexes = (await conn.execute(text(
+            'SELECT "index" FROM violations ORDER BY "index"'))).scalars().all()
+        return (await partitions.table_kind(conn, "violations"), sorted(await partitions.list_partitions(conn)),
+                indexes)
+
+    kind, names, indexes = run_on_postgres(steps)
+    assert kind == "p"
+    assert names == ["violations_default", "violations_p20250101", "violations_p20250102"]
+    assert indexes == [1, 2, 3]
@@ -0,0 +1,50 @@
+import asyncio
+from datetime import datetime
+
+from src.persistence import _copy_records, _insert_columns
+
+
+class FakeDriverConnection:
+    def __init__(self):
+        self.copied = None
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copied = (table, records, columns)
+
+
+class FakeRawConnection:
+    def __init__(self):
+        self.driver_connection = FakeDriverConnection()
+
+
+class FakeConnection:
+    def __init__(self):
+        self.raw = FakeRawConnection()
+        self.statements = []
+
+    async def exec_driver_sql(self, statement):
+        self.statements.append(statement)
+
+    async def get_raw_connection(self):
+        return self.raw
+
+
+def make_row(i: int, **extra) -> dict:
+    return {"id": str(i), "drone_id": f"drone-{i}", "timestamp": datetime(2025, 1, 1, 12, i),
+            "position_x": 1.0, "position_y": 2.0, "position_z": 3.0, "owner_first_name": "First",
+            "owner_last_name": "Last", "owner_ssn": "000000-000X", "owner_phone": "+358000", **extra}
+
+
+def test_copy_records_fills_missing_columns_with_their_defaults():
+    conn = FakeConnection()
+    rows = [make_row(1), make_row(2, closest_distance=4.5, sample_count=7, zone_id=3)]
+    asyncio.run(_copy_records(conn, rows))
+
+    table, records, columns = conn.raw.driver_connection.copied
+    assert table == "violations"
+    assert columns == _insert_columns() and "index" not in columns
+    first, second = (dict(zip(columns, record)) for record in records)
+    assert first["last_seen"] is None and first["ended_at"] is None and first["zone_id"] is None
+    assert first["sample_count"] == 1
+    assert second["closest_distance"] == 4.5 and second["sample_count"] == 7 and second["zone_id"] == 3
+    assert first["drone_id"] == "drone-1" and first["timestamp"] == datetime(2025, 1, 1, 12, 1)
@@ -0,0 +1,64 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from src import pipeline
+from src.settings import settings
+from src.zones import ZoneIndex, default_zone
+
+
+class SlowBodyResponse:
+    """ Headers at once, then the body in parts with a pause before each """
+
+    def __init__(self, parts: list, pause: float):
+        self.parts = parts
+        self.pause = pause
+        self.headers_at = None
+
+    def raise_for_status(self):
+        pass
+
+    async def aiter_bytes(self):
+        for part in self.parts:
+            await asyncio.sleep(self.pause)
+            yield part
+
+
+class FakeUpstream:
+    def __init__(self, response):
+        self.response = response
+
+    @asynccontextmanager
+    async def stream(self, path: str):
+        self.response.headers_at = time.monotonic()
+        yield self.response
+
+
+class FakeZones:
+    async def current(self):
+        return ZoneIndex([default_zone(1000.0)], settings.ZONE_GRID_CELL)
+
+
+def test_detection_lag_counts_from_the_response_headers(monkeypatch):
+    recorded = []
+
+    async def record_tick(drones, inside, observed_at, shard):
+        recorded.append((drones, [d["id"] for d in inside], observed_at))
+        return pipeline.TickResult(drones, len(inside), len(inside), 0, observed_at, time.monotonic())
+
+    async def no_push():
+        pass
+
+    monkeypatch.setattr(pipeline, "zone_registry", FakeZones())
+    monkeypatch.setattr(pipeline, "_record_tick", record_tick)
+    monkeypatch.setattr(pipeline.metrics, "push_worker_metrics", no_push)
+    response = SlowBodyResponse([b'[{"id": "a", "owner_id": 1, "x": 1, "y": 1, "z": 1},',
+                                 b' {"id": "b", "owner_id": 2, "x": 5000, "y": 0, "z": 1}]'], pause=0.1)
+
+    result = asyncio.run(pipeline.run_tick(FakeUpstream(response)))
+
+    [(drones, inside, observed_at)] = recorded
+    assert (drones, inside) == (2, ["a"])
+    # the body took 0.2 s to arrive after the headers, that is lag too
+    assert observed_at - response.headers_at < 0.05
+    assert result.detection_lag >= 0.2
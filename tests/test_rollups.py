@@ -0,0 +1,168 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src import database, main, pipeline, rollups
+from src.database import Base, get_db
+from src.model import Violation, ViolationRollup
+
+NOW = datetime.now().replace(minute=30, second=0, microsecond=0)
+
+
+def violation(owner_id: int, drone: int, when: datetime) -> dict:
+    return {"id": str(owner_id), "drone_id": f"drone-{drone}", "timestamp": when, "position_x": 0.0,
+            "position_y": 0.0, "position_z": 0.0, "owner_first_name": "First", "owner_last_name": "Last",
+            "owner_ssn": "000000-000X", "owner_phone": "+358000"}
+
+
+def batch(hours_ago: float, *owner_drones) -> list:
+    when = NOW - timedelta(hours=hours_ago)
+    return [violation(owner_id, drone, when + timedelta(seconds=i)) for i, (owner_id, drone) in enumerate(owner_drones)]
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'rollups.db'}", poolclass=NullPool)
+
+    async def setup():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    asyncio.run(setup())
+
+    async def bump_version():
+        pass
+
+    monkeypatch.setattr(pipeline.worker_runtime, "get_engine", lambda: engine)
+    monkeypatch.setattr(pipeline, "bump_version", bump_version)
+    return engine
+
+
+async def raw_counts(conn, since: datetime | None = None) -> Counter:
+    """ (hour, owner, drone) -> count, straight from the violations """
+    rows = (await conn.execute(select(Violation.timestamp, Violation.id, Violation.drone_id))).all()
+    return Counter((rollups.hour_bucket(row.timestamp), row.id, row.drone_id) for row in rows
+                   if since is None or row.timestamp >= rollups.hour_bucket(since))
+
+
+async def rollup_counts(conn) -> Counter:
+    rows = (await conn.execute(select(ViolationRollup.bucket, ViolationRollup.owner_id, ViolationRollup.drone_id,
+                                      ViolationRollup.count))).all()
+    return Counter({(row.bucket, row.owner_id, row.drone_id): row.count for row in rows})
+
+
+def read(engine, query):
+    async def run():
+        async with engine.connect() as conn:
+            return await query(conn)
+    return asyncio.run(run())
+
+
+def write(engine, steps):
+    async def run():
+        async with engine.begin() as conn:
+            await steps(conn)
+    asyncio.run(run())
+
+
+def test_rollups_are_upserted_with_the_violations(engine):
+    asyncio.run(pipeline.save_violations_to_db(batch(3, (1, 1), (1, 1), (2, 2))))
+    asyncio.run(pipeline.save_violations_to_db(batch(3, (1, 1), (3, 3)) + batch(1, (1, 4))))
+
+    counts = read(engine, rollup_counts)
+    assert counts == read(engine, raw_counts)
+    assert counts[(rollups.hour_bucket(NOW - timedelta(hours=3)), "1", "drone-1")] == 3
+
+
+def test_a_failed_batch_stores_neither_violations_nor_rollups(engine, monkeypatch):
+    asyncio.run(pipeline.save_violations_to_db(batch(2, (1, 1))))
+
+    async def fail(conn, values):
+        raise RuntimeError("update failed")
+
+    monkeypatch.setattr(pipeline, "bulk_update_episodes", fail)
+    with pytest.raises(RuntimeError):
+        asyncio.run(pipeline.save_violations_to_db(batch(2, (1, 1), (2, 2))))
+
+    assert sum(read(engine, rollup_counts).values()) == 1
+    assert read(engine, rollup_counts) == read(engine, raw_counts)
+
+
+def test_backfill_since_hours_rebuilds_only_the_recent_buckets(engine, monkeypatch):
+    asyncio.run(pipeline.save_violations_to_db(batch(50, (1, 1)) + batch(5, (1, 1), (2, 2))))
+
+    async def tamper(conn):
+        # history written before the rollups existed, and a recent counter that drifted
+        await conn.execute(insert(Violation.__table__), batch(4, (3, 3), (3, 3)) + batch(60, (4, 4)))
+        await conn.execute(update(ViolationRollup.__table__).values(count=ViolationRollup.count + 7))
+
+    write(engine, tamper)
+
+    monkeypatch.setattr(database, "async_engine", engine)
+    asyncio.run(rollups.main(since_hours=48))
+
+    counts = read(engine, rollup_counts)
+    since = NOW - timedelta(hours=48)
+    recent = Counter({key: count for key, count in counts.items() if key[0] >= rollups.hour_bucket(since)})
+    assert recent == read(engine, lambda conn: raw_counts(conn, since))
+    # older buckets are left alone: the drifted one keeps its count, the 60 hours old history stays missing
+    assert counts[(rollups.hour_bucket(NOW - timedelta(hours=50)), "1", "drone-1")] == 8
+    assert (rollups.hour_bucket(NOW - timedelta(hours=60)), "4", "drone-4") not in counts
+
+    # rebuilt buckets still take upserts (the SQLite text buckets match the ORM ones)
+    asyncio.run(pipeline.save_violations_to_db(batch(4, (3, 3))))
+    assert read(engine, rollup_counts)[(rollups.hour_bucket(NOW - timedelta(hours=4)), "3", "drone-3")] == 3
+    asyncio.run(rollups.main(since_hours=None))
+    assert read(engine, rollup_counts) == read(engine, raw_counts)
+
+
+def stats(engine, hours: int) -> dict:
+    async def get_test_db():
+        async with AsyncSession(engine) as session:
+            yield session
+
+    main.app.dependency_overrides[get_db] = get_test_db
+    try:
+        client = TestClient(main.app, headers={"X-Secret": main.settings.NFZ_SECRET_KEY})
+        response = client.get("/nfz/stats", params={"hours": hours, "top": 100})
+    finally:
+        main.app.dependency_overrides.pop(get_db, None)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_nfz_stats_equal_the_raw_counts_after_inserts_and_backfill(engine, monkeypatch):
+    asyncio.run(pipeline.save_violations_to_db(
+        batch(30, (9, 9)) + batch(6, (1, 1), (1, 2), (2, 3)) + batch(2, (1, 1), (1, 1))))
+
+    async def expected(conn, hours: int):
+        counts = await raw_counts(conn, NOW - timedelta(hours=hours))
+        owners, drones = Counter(), Counter()
+        for (bucket, owner_id, drone_id), count in counts.items():
+            owners[owner_id] += count
+            drones[drone_id] += count
+        return sum(counts.values()), dict(owners), dict(drones)
+
+    def observed(body: dict):
+        return (body["total"], {row["owner_id"]: row["count"] for row in body["top_owners"]},
+                {row["drone_id"]: row["count"] for row in body["top_drones"]})
+
+    assert observed(stats(engine, 24)) == read(engine, lambda conn: expected(conn, 24))
+    assert observed(stats(engine, 24)) == (5, {"1": 4, "2": 1}, {"drone-1": 3, "drone-2": 1, "drone-3": 1})
+
+    async def wipe(conn):
+        await conn.execute(ViolationRollup.__table__.delete())
+
+    write(engine, wipe)
+    assert stats(engine, 48)["total"] == 0
+
+    monkeypatch.setattr(database, "async_engine", engine)
+    asyncio.run(rollups.main(since_hours=None))
+    assert observed(stats(engine, 48)) == read(engine, lambda conn: expected(conn, 48))
+    assert stats(engine, 48)["total"] == 6
+    assert [row["count"] for row in stats(engine, 24)["hourly"]] == [3, 2]
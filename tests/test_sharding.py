@@ -0,0 +1,124 @@
+import asyncio
+import copy
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import pipeline
+from src.episodes import InMemoryEpisodeStore, episode_key, new_episode
+from src.sharding import shard_of, split_by_owner
+from src.zones import CIRCLE, POLYGON, ZoneIndex, ZoneShape
+
+SHARDS = 4
+ZONES = ZoneIndex([ZoneShape(None, "NFZ", CIRCLE, 0.0, 0.0, 1000.0),
+                   ZoneShape(2, "box", POLYGON, 750.0, 750.0, vertices=[(500, 500), (1000, 500), (1000, 1000), (500, 1000)],
+                             min_z=0.0, max_z=200.0)], 500.0)
+
+
+class FakeZones:
+    async def current(self):
+        return ZONES
+
+
+def make_snapshot(seed: int = 3) -> list:
+    """ 40 owners with 1-4 drones each, about half of them inside a zone """
+    rng = random.Random(seed)
+    drones = []
+    for owner_id in range(1, 41):
+        for n in range(rng.randint(1, 4)):
+            spread = 1200 if rng.random() < 0.5 else 5000
+            drones.append({"id": f"drone-{owner_id}-{n}", "owner_id": owner_id, "x": rng.uniform(-spread, spread),
+                           "y": rng.uniform(-spread, spread), "z": rng.uniform(0, 300)})
+    return drones
+
+
+def seed_store(drones: list) -> InMemoryEpisodeStore:
+    """ Open episodes: some drones still inside, some gone for longer than the exit grace, some just gone """
+    store = InMemoryEpisodeStore()
+    now = datetime.now()
+    rng = random.Random(5)
+    episodes = []
+    for drone in drones[::3]:
+        seen = now - timedelta(seconds=rng.choice([2, 600]))
+        episode = new_episode({**drone, "distance": 500.0, "zone_id": None}, seen - timedelta(seconds=30))
+        episode["last_seen"] = seen.isoformat()
+        episodes.append(episode)
+    for episode in sorted(episodes, key=lambda e: e["last_seen"]):
+        store._open[episode_key(episode["drone_id"], episode["zone_id"])] = episode
+    return store
+
+
+@pytest.fixture
+def recorder(monkeypatch):
+    saved = {"violations": [], "updates": []}
+
+    async def fetch_owners(owner_ids):
+        return {owner_id: {"first_name": f"F{owner_id}", "last_name": "L", "social_security_number": "S",
+                           "phone_number": "P"} for owner_id in owner_ids}
+
+    async def save_violations_to_db(violations, updates=()):
+        saved["violations"].extend(violations)
+        saved["updates"].extend(updates)
+
+    async def publish_violations(violations):
+        pass
+
+    monkeypatch.setattr(pipeline, "zone_registry", FakeZones())
+    monkeypatch.setattr(pipeline, "fetch_owners", fetch_owners)
+    monkeypatch.setattr(pipeline, "save_violations_to_db", save_violations_to_db)
+    monkeypatch.setattr(pipeline, "publish_violations", publish_violations)
+    return saved
+
+
+def outcome(saved: dict, store: InMemoryEpisodeStore) -> tuple:
+    violations = sorted((v["drone_id"], v["zone_id"], v["id"], v["owner_first_name"], v["closest_distance"])
+                        for v in saved["violations"])
+    updates = sorted((u["b_drone_id"], str(u["b_zone_id"]), u["ended_at"], u["sample_count"]) for u in saved["updates"])
+    episodes = sorted((key, e["samples"], e["closest"]) for key, e in store._open.items())
+    return violations, updates, episodes
+
+
+def test_sharded_check_records_the_same_as_the_single_task(monkeypatch, recorder):
+    drones = make_snapshot()
+    observed_at = time.monotonic()
+
+    seeded = seed_store(drones)
+    monkeypatch.setattr(pipeline, "episode_store", copy.deepcopy(seeded))
+    single = asyncio.run(pipeline.process_snapshot(drones, observed_at))
+    expected = outcome(recorder, pipeline.episode_store)
+    recorder["violations"].clear()
+    recorder["updates"].clear()
+
+    # the shards run one after the other on one shared store, as workers on the redis store would
+    monkeypatch.setattr(pipeline, "episode_store", copy.deepcopy(seeded))
+    results = [asyncio.run(pipeline.process_snapshot(slice_, observed_at, (index, SHARDS)))
+               for index, slice_ in enumerate(split_by_owner(drones, SHARDS))]
+
+    assert outcome(recorder, pipeline.episode_store) == expected
+    assert expected[0] and expected[1]  # the snapshot does open and close episodes
+    assert sum(r.violators for r in results) == single.violators
+    assert sum(r.recorded for r in results) == single.recorded
+    assert sum(r.closed for r in results) == single.closed
+
+
+def test_an_owner_and_its_episodes_stay_in_one_shard():
+    drones = make_snapshot()
+    slices = split_by_owner(drones + [{"id": "bad", "owner_id": None}], SHARDS)
+
+    shards_of_owner = {}
+    for index, slice_ in enumerate(slices):
+        for drone in slice_:
+            shards_of_owner.setdefault(drone["owner_id"], set()).add(index)
+    assert all(len(shards) == 1 for shards in shards_of_owner.values())
+    assert shards_of_owner[None] == {0}
+    assert all(slices)  # the owners spread over every shard
+
+    # a stable mix, not Python's per-process string hash: every worker maps an owner alike
+    assert [shard_of(owner_id, SHARDS) for owner_id in (1, 2, 3, 12345)] == \
+           [shard_of(str(owner_id), SHARDS) for owner_id in (1, 2, 3, 12345)]
+    assert shard_of(7, 1) == 0
+    for owner_id, shards in shards_of_owner.items():
+        if owner_id is not None:
+            assert shards == {shard_of(owner_id, SHARDS)}
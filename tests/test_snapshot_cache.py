@@ -0,0 +1,143 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main, snapshot_cache
+from src.snapshot_cache import SnapshotCache
+
+
+class Upstream:
+    """ A loader returning 1, 2, 3... after `delay` seconds, or raising `error` """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = 0
+        self.error = None
+
+    async def load(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [{"n": self.calls}]
+
+
+def encode(items) -> bytes:
+    return json.dumps(items).encode()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    # only the cache's clock: the event loop keeps the real time.monotonic
+    monkeypatch.setattr(snapshot_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_concurrent_callers_share_one_upstream_fetch():
+    upstream = Upstream(delay=0.05)
+    cache = SnapshotCache(upstream.load, encode, max_age=60)
+
+    async def run():
+        return await asyncio.gather(*(cache.get() for _ in range(20)))
+
+    snapshots = asyncio.run(run())
+    assert upstream.calls == 1
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert cache.counters["loads"] == 1 and cache.counters["coalesced"] == 19
+
+
+def test_stale_snapshots_are_served_while_one_refresh_runs(clock):
+    upstream = Upstream(delay=0.05)
+    cache = SnapshotCache(upstream.load, encode, max_age=1, stale_while_revalidate=5)
+
+    async def run():
+        first = await cache.get()
+        clock[0] += 2
+        stale = await asyncio.gather(*(cache.get() for _ in range(5)))
+        await asyncio.sleep(0.1)
+        return first, stale, await cache.get()
+
+    first, stale, refreshed = asyncio.run(run())
+    assert all(snapshot is first for snapshot in stale)
+    assert upstream.calls == 2 and refreshed.items == [{"n": 2}]
+    assert cache.counters["stale_hits"] == 5 and cache.counters["fresh_hits"] == 1
+
+
+def test_expired_snapshots_wait_for_the_refresh(clock):
+    upstream = Upstream()
+    cache = SnapshotCache(upstream.load, encode, max_age=1, stale_while_revalidate=5)
+
+    async def run():
+        await cache.get()
+        clock[0] += 7
+        return await cache.get()
+
+    assert asyncio.run(run()).items == [{"n": 2}]
+
+
+def test_a_failed_refresh_reaches_the_waiting_callers_and_is_retried(clock):
+    upstream = Upstream(delay=0.01)
+    cache = SnapshotCache(upstream.load, encode, max_age=1, stale_while_revalidate=5)
+
+    async def run():
+        good = await cache.get()
+        upstream.error = httpx.ConnectTimeout("slow")
+        clock[0] += 2
+        # the failed background refresh keeps the stale snapshot in place
+        stale = await cache.get()
+        await asyncio.sleep(0.05)
+        clock[0] += 10
+        results = await asyncio.gather(cache.get(), cache.get(), return_exceptions=True)
+        upstream.error = None
+        return good, stale, results, await cache.get()
+
+    good, stale, results, recovered = asyncio.run(run())
+    assert stale is good
+    assert all(isinstance(result, httpx.ConnectTimeout) for result in results)
+    assert upstream.calls == 4 and recovered.items == [{"n": 4}]
+
+
+def test_etag_matching():
+    snapshot = snapshot_cache.Snapshot([], b"[1]", 0.0)
+    same = snapshot_cache.Snapshot([], b"[1]", 5.0)
+    assert snapshot.etag == same.etag != snapshot_cache.Snapshot([], b"[2]", 0.0).etag
+    assert snapshot.matches(snapshot.etag) and snapshot.matches(f'"other", W/{snapshot.etag}')
+    assert snapshot.matches("*")
+    assert not snapshot.matches(None) and not snapshot.matches('"other"')
+
+
+@pytest.fixture
+def drones_client(monkeypatch):
+    upstream = Upstream()
+
+    async def load():
+        return [{"id": f"drone-{n['n']}", "owner_id": 1, "x": 1.0, "y": 2.0, "z": 3.0} for n in await upstream.load()]
+
+    monkeypatch.setattr(main, "drone_snapshots", SnapshotCache(load, encode, max_age=60))
+    return TestClient(main.app), upstream
+
+
+def test_get_drones_answers_304_while_the_etag_matches(drones_client):
+    client, upstream = drones_client
+    response = client.get("/drones")
+    assert response.status_code == 200 and response.json()[0]["id"] == "drone-1"
+    etag = response.headers["ETag"]
+
+    not_modified = client.get("/drones", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304 and not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    assert client.get("/drones", headers={"If-None-Match": '"stale"'}).status_code == 200
+    assert upstream.calls == 1
+
+
+def test_get_drones_maps_upstream_failures(drones_client):
+    client, upstream = drones_client
+    upstream.error = httpx.ConnectTimeout("slow")
+    assert client.get("/drones").status_code == 504
+    upstream.error = httpx.ConnectError("refused")
+    assert client.get("/drones").status_code == 503
@@ -0,0 +1,98 @@
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import main
+from src.tracks import BYTES_PER_SAMPLE, TrackStore
+
+
+def record(store: TrackStore, positions: dict, timestamp: float):
+    """ Records one snapshot of drone id -> (x, y, z) """
+    ids = list(positions)
+    store.record(ids, [positions[i][0] for i in ids], [positions[i][1] for i in ids],
+                 [positions[i][2] for i in ids], timestamp)
+
+
+def test_the_ring_keeps_the_last_samples_in_order():
+    store = TrackStore(samples=4, memory_mb=1, idle_ttl=60)
+    for t in range(10):
+        record(store, {"a": (t, 0, 0)}, 100.0 + t)
+
+    track = store.track("a")
+    assert [s["x"] for s in track["samples"]] == [6.0, 7.0, 8.0, 9.0]
+    assert [s["timestamp"] for s in track["samples"]] == [106.0, 107.0, 108.0, 109.0]
+    # the oldest kept sample has no predecessor, unless the window leaves one out
+    assert track["samples"][0]["speed"] is None
+    assert [s["x"] for s in store.track("a", limit=2)["samples"]] == [8.0, 9.0]
+    assert store.track("a", limit=2)["samples"][0]["speed"] == 1.0
+    assert len(store.track("a", limit=100)["samples"]) == 4
+
+
+def test_the_memory_budget_sets_the_number_of_drones():
+    store = TrackStore(samples=100, memory_mb=1, idle_ttl=60)
+    assert store.max_drones == 1024 * 1024 // (100 * BYTES_PER_SAMPLE)
+    assert store.nbytes <= 1024 * 1024
+
+    small = TrackStore(samples=10, memory_mb=3 * 10 * BYTES_PER_SAMPLE / (1024 * 1024), idle_ttl=60)
+    assert small.max_drones == 3
+    record(small, {"a": (0, 0, 0), "b": (0, 0, 0), "c": (0, 0, 0)}, 100.0)
+    record(small, {"a": (1, 0, 0), "b": (1, 0, 0)}, 101.0)
+    # full: the drone reported least recently gives up its row
+    record(small, {"d": (5, 5, 5)}, 102.0)
+    assert small.track("c") is None and small.track("d")["samples"][0]["x"] == 5.0
+    assert len(small) == 3 and small.evictions == 1
+    # a snapshot larger than the store keeps the drones that fit, not the ones it reported
+    record(small, {name: (9, 9, 9) for name in "efghij"}, 103.0)
+    assert sorted(small.slots) == ["e", "f", "g"]
+
+
+def test_idle_drones_are_evicted_after_the_ttl():
+    store = TrackStore(samples=8, memory_mb=1, idle_ttl=10)
+    record(store, {"a": (0, 0, 0), "b": (0, 0, 0)}, 100.0)
+    record(store, {"a": (1, 0, 0)}, 110.0)
+    assert store.track("b") is not None
+    record(store, {"a": (2, 0, 0)}, 110.5)
+    assert store.track("b") is None and len(store) == 1
+    # a drone coming back after eviction starts a new track
+    record(store, {"b": (7, 7, 7)}, 111.0)
+    assert [s["x"] for s in store.track("b")["samples"]] == [7.0]
+
+
+@pytest.mark.parametrize("dx, dy, heading", [(0, 3, 0.0), (3, 0, 90.0), (0, -3, 180.0), (-3, 0, 270.0),
+                                             (3, 3, 45.0)])
+def test_speed_heading_and_vertical_speed(dx, dy, heading):
+    store = TrackStore(samples=8, memory_mb=1, idle_ttl=60)
+    record(store, {"a": (10, 20, 100)}, 100.0)
+    record(store, {"a": (10 + dx, 20 + dy, 94)}, 102.0)
+
+    track = store.track("a")
+    assert math.isclose(track["speed"], math.hypot(dx, dy) / 2, rel_tol=1e-6)
+    assert math.isclose(track["heading"], heading, abs_tol=1e-4)
+    assert math.isclose(track["vertical_speed"], -3.0)
+
+
+def test_hovering_and_same_timestamp_samples_have_no_heading_or_speed():
+    store = TrackStore(samples=8, memory_mb=1, idle_ttl=60)
+    record(store, {"a": (1, 1, 1)}, 100.0)
+    record(store, {"a": (1, 1, 3)}, 101.0)
+    hovering = store.track("a")
+    assert hovering["speed"] == 0.0 and hovering["heading"] is None and hovering["vertical_speed"] == 2.0
+
+    record(store, {"a": (5, 5, 3)}, 101.0)
+    assert store.track("a")["speed"] is None and store.track("a")["vertical_speed"] is None
+
+
+def test_track_endpoint_is_empty_until_a_snapshot_was_recorded(monkeypatch):
+    store = TrackStore(samples=8, memory_mb=1, idle_ttl=1e9)
+    monkeypatch.setattr(main, "tracks", store)
+    client = TestClient(main.app)
+
+    missing = client.get("/drones/a/track")
+    assert missing.status_code == 404 and "TRACK_SAMPLE_INTERVAL" in missing.json()["detail"]
+
+    record(store, {"a": (0, 0, 0)}, 100.0)
+    record(store, {"a": (0, 4, 0)}, 102.0)
+    body = client.get("/drones/a/track", params={"limit": 1}).json()
+    assert body["drone_id"] == "a" and len(body["samples"]) == 1
+    assert (body["speed"], body["heading"], body["vertical_speed"]) == (2.0, 0.0, 0.0)
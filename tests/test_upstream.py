@@ -0,0 +1,116 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src.upstream import CircuitBreaker, CircuitOpenError, UpstreamClient
+
+
+def make_client(handler, failures: int = 3, cooldown: float = 60.0, retries: int = 0) -> UpstreamClient:
+    client = httpx.AsyncClient(base_url="http://upstream.test/", transport=httpx.MockTransport(handler))
+    upstream = UpstreamClient(client, timeout=1.0, retries=retries, hedge=False)
+    upstream._endpoint("drones").breaker = CircuitBreaker("drones", failures, cooldown)
+    return upstream
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_after_cooldown():
+    breaker = CircuitBreaker("drones", failures=2, cooldown=0.0)
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()          # cooldown over: the probe
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()      # only one probe at a time
+    breaker.success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_success_resets_the_failure_count():
+    breaker = CircuitBreaker("drones", failures=2, cooldown=60.0)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_cancelled_probe_releases_the_half_open_breaker():
+    async def handler(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200, json=[])
+
+    async def scenario():
+        upstream = make_client(handler, failures=1, cooldown=0.0)
+        breaker = upstream._endpoint("drones").breaker
+        breaker.failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(upstream.get("drones"), timeout=0.05)
+        # the abandoned probe counts as failed instead of blocking the endpoint for good
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker._probing
+        assert breaker.allow()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_call_does_not_count_as_failure_when_closed():
+    async def handler(request):
+        await asyncio.sleep(10)
+        return httpx.Response(200, json=[])
+
+    async def scenario():
+        upstream = make_client(handler, failures=1)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(upstream.get("drones"), timeout=0.05)
+        assert upstream._endpoint("drones").breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_500_counts_as_failure_but_is_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    async def scenario():
+        upstream = make_client(handler, failures=3, retries=2)
+        for _ in range(3):
+            response = await upstream.get("drones")
+            assert response.status_code == 500
+        assert len(calls) == 3
+        with pytest.raises(CircuitOpenError):
+            await upstream.get("drones")
+        assert len(calls) == 3
+
+    asyncio.run(scenario())
+
+
+def test_503_is_retried_until_an_answer():
+    statuses = [503, 503, 200]
+
+    def handler(request):
+        return httpx.Response(statuses.pop(0), json=[])
+
+    async def scenario():
+        upstream = make_client(handler, failures=5, retries=2)
+        response = await upstream.get("drones")
+        assert response.status_code == 200
+        assert upstream._endpoint("drones").breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_4xx_is_a_valid_answer():
+    async def scenario():
+        upstream = make_client(lambda request: httpx.Response(404), failures=1)
+        for _ in range(3):
+            assert (await upstream.get("drones")).status_code == 404
+        assert upstream._endpoint("drones").breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
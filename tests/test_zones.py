@@ -0,0 +1,83 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.zones import CIRCLE, POLYGON, ZoneIndex, ZoneShape, _inside_polygon, default_zone
+
+SQUARE = [(0.0, 0.0), (100.0, 0.0), (100.0, 100.0), (0.0, 100.0)]
+
+
+def locate(index: ZoneIndex, points) -> set:
+    x, y, z = (np.array(column, dtype=np.float64) for column in zip(*points))
+    drones, zones, _ = index.locate(x, y, z)
+    return {(int(drone), index.ids[zone]) for drone, zone in zip(drones, zones)}
+
+
+def test_circle_polygon_and_altitude_band():
+    zones = [ZoneShape(1, "circle", CIRCLE, 0.0, 0.0, 50.0),
+             ZoneShape(2, "square", POLYGON, 50.0, 50.0, vertices=SQUARE, min_z=10.0, max_z=20.0)]
+    index = ZoneIndex(zones, cell_size=30.0)
+    points = [(0, 0, 0), (49, 0, 0), (51, 0, 0), (10, 10, 15), (10, 10, 25), (150, 50, 15), (-500, -500, 0)]
+    assert locate(index, points) == {(0, 1), (1, 1), (3, 1), (3, 2), (4, 1)}
+
+
+def test_distance_is_measured_to_the_zone_center():
+    index = ZoneIndex([ZoneShape(1, "circle", CIRCLE, 10.0, 0.0, 50.0)], cell_size=100.0)
+    _, _, distances = index.locate(np.array([13.0]), np.array([4.0]), np.array([0.0]))
+    assert distances.tolist() == [5.0]
+
+
+def test_default_zone_matches_the_builtin_nfz():
+    zone = default_zone(1000.0)
+    assert zone.id is None and zone.radius == 1000.0
+    index = ZoneIndex([zone], cell_size=1000.0)
+    assert locate(index, [(1000, 0, 0), (708, 708, 0), (0, -999, 5000)]) == {(0, None), (2, None)}
+
+
+def test_empty_index_and_empty_snapshot():
+    empty = np.empty(0)
+    assert all(len(a) == 0 for a in ZoneIndex([], 100.0).locate(np.ones(3), np.ones(3), np.ones(3)))
+    assert all(len(a) == 0 for a in ZoneIndex([default_zone(10.0)], 100.0).locate(empty, empty, empty))
+
+
+@pytest.mark.parametrize("cell_size", [50.0, 500.0, 5000.0])
+def test_index_matches_brute_force(cell_size):
+    rng = random.Random(7)
+    zones = []
+    for i in range(40):
+        cx, cy = rng.uniform(-2000, 2000), rng.uniform(-2000, 2000)
+        bounds = (rng.uniform(0, 100), rng.uniform(200, 400)) if i % 3 == 0 else (None, None)
+        if i % 2:
+            zones.append(ZoneShape(i, f"c{i}", CIRCLE, cx, cy, rng.uniform(50, 600), min_z=bounds[0], max_z=bounds[1]))
+        else:
+            vertices = [(cx + rng.uniform(-500, 500), cy + rng.uniform(-500, 500)) for _ in range(rng.randint(3, 7))]
+            zones.append(ZoneShape(i, f"p{i}", POLYGON, cx, cy, vertices=vertices, min_z=bounds[0], max_z=bounds[1]))
+    x = np.array([rng.uniform(-2500, 2500) for _ in range(3000)])
+    y = np.array([rng.uniform(-2500, 2500) for _ in range(3000)])
+    z = np.array([rng.uniform(0, 500) for _ in range(3000)])
+
+    expected = set()
+    for zone in zones:
+        hit = (z >= zone.min_z) & (z <= zone.max_z)
+        if zone.kind == CIRCLE:
+            hit &= (x - zone.center_x) ** 2 + (y - zone.center_y) ** 2 <= zone.radius ** 2
+        else:
+            hit &= _inside_polygon(x, y, np.array(zone.vertices))
+        expected.update((int(drone), zone.id) for drone in np.flatnonzero(hit))
+
+    drones, found, _ = ZoneIndex(zones, cell_size).locate(x, y, z)
+    assert {(int(d), zones[f].id) for d, f in zip(drones, found)} == expected
+    assert expected
+
+
+def test_zone_rows_are_validated():
+    row = SimpleNamespace(id=1, name="bad", kind="polygon", center_x=None, center_y=None, radius=None,
+                          vertices=[[0, 0], [1, 1]], min_z=None, max_z=None)
+    with pytest.raises(ValueError):
+        ZoneShape.from_row(row)
+    with pytest.raises(ValueError):
+        ZoneShape.from_row(SimpleNamespace(**{**vars(row), "kind": "circle", "radius": -1}))
+    shape = ZoneShape.from_row(SimpleNamespace(**{**vars(row), "vertices": SQUARE}))
+    assert (shape.center_x, shape.center_y) == (50.0, 50.0)